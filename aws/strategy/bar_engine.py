@@ -0,0 +1,214 @@
+"""
+Array-based bar loop for the Range Breakout + MACD strategy.
+
+Runs the same breakout / MACD entry / TP / SL / EOD state machine as
+CompleteFXSystem.run_backtest, but over plain NumPy arrays instead of
+DataFrame.iterrows(). When numba is installed the kernel is JIT-compiled,
+otherwise it falls back to a pure Python loop over native lists.
+"""
+
+import numpy as np
+import pandas as pd
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    njit = None
+    NUMBA_AVAILABLE = False
+
+# Position / exit codes used by the kernel
+LONG = 1
+SHORT = -1
+EXIT_TP = 1
+EXIT_SL = 2
+EXIT_EOD = 3
+EXIT_REASONS = {EXIT_TP: 'TP', EXIT_SL: 'SL', EXIT_EOD: 'EOD'}
+
+
+def minute_of_day(t):
+    """Convert a datetime.time to minutes after midnight"""
+    return t.hour * 60 + t.minute
+
+
+def _breakout_kernel(close, high, low, mod, has_range, range_high, range_low,
+                     buy_signal, sell_signal, last_of_day,
+                     window_start, window_end, sl_dist, tp_dist,
+                     out_entry, out_exit, out_side, out_entry_price,
+                     out_exit_price, out_reason):
+    """Bar loop state machine; fills the out_* arrays and returns the trade count"""
+    n = len(close)
+    count = 0
+    position = 0
+    looking_for = 0
+    entry_idx = -1
+    entry_price = 0.0
+    sl = 0.0
+    tp = 0.0
+
+    for i in range(n):
+        # Skip if we don't have range data for this day
+        if not has_range[i]:
+            continue
+
+        price = close[i]
+        m = mod[i]
+
+        if window_start < m < window_end:
+            # Check for breakouts (only if we haven't identified one yet today)
+            if looking_for == 0 and position == 0:
+                if price > range_high[i]:
+                    looking_for = SHORT
+                elif price < range_low[i]:
+                    looking_for = LONG
+
+            # Check for MACD entry signals
+            if looking_for == SHORT and sell_signal[i] and position == 0:
+                position = SHORT
+                entry_idx = i
+                entry_price = price
+                sl = entry_price + sl_dist
+                tp = entry_price - tp_dist
+            elif looking_for == LONG and buy_signal[i] and position == 0:
+                position = LONG
+                entry_idx = i
+                entry_price = price
+                sl = entry_price - sl_dist
+                tp = entry_price + tp_dist
+
+        elif m >= window_end:
+            # Missed the window
+            if looking_for != 0 and position == 0:
+                looking_for = 0
+
+        # Check for position exits
+        if position != 0:
+            reason = 0
+            exit_price = 0.0
+            if position == LONG:
+                if high[i] >= tp:
+                    reason = EXIT_TP
+                    exit_price = tp
+                elif low[i] <= sl:
+                    reason = EXIT_SL
+                    exit_price = sl
+            else:
+                if low[i] <= tp:
+                    reason = EXIT_TP
+                    exit_price = tp
+                elif high[i] >= sl:
+                    reason = EXIT_SL
+                    exit_price = sl
+
+            if reason != 0:
+                out_entry[count] = entry_idx
+                out_exit[count] = i
+                out_side[count] = position
+                out_entry_price[count] = entry_price
+                out_exit_price[count] = exit_price
+                out_reason[count] = reason
+                count += 1
+                position = 0
+
+        # Reset daily state at end of day, closing any open position
+        if last_of_day[i]:
+            looking_for = 0
+            if position != 0:
+                out_entry[count] = entry_idx
+                out_exit[count] = i
+                out_side[count] = position
+                out_entry_price[count] = entry_price
+                out_exit_price[count] = price
+                out_reason[count] = EXIT_EOD
+                count += 1
+                position = 0
+
+    return count
+
+
+if NUMBA_AVAILABLE:
+    _compiled_kernel = njit(cache=True, nogil=True)(_breakout_kernel)
+else:
+    _compiled_kernel = None
+
+
+def run_breakout_engine(close, high, low, mod, day, range_high, range_low,
+                        buy_signal, sell_signal, window_start, window_end,
+                        sl_dist, tp_dist, use_jit=True, close_at_end=False):
+    """
+    Run the breakout state machine over bar arrays.
+
+    range_high / range_low are per-bar (NaN on days without a range). Returns a
+    dict of equal-length arrays: entry_idx, exit_idx, side, entry_price,
+    exit_price and reason (see EXIT_REASONS). With close_at_end the final bar
+    is treated as an end of day, so a slice never leaves a position open.
+    """
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    high = np.ascontiguousarray(high, dtype=np.float64)
+    low = np.ascontiguousarray(low, dtype=np.float64)
+    mod = np.ascontiguousarray(mod, dtype=np.int32)
+    day = np.asarray(day)
+    range_high = np.ascontiguousarray(range_high, dtype=np.float64)
+    range_low = np.ascontiguousarray(range_low, dtype=np.float64)
+    buy_signal = np.ascontiguousarray(buy_signal, dtype=np.bool_)
+    sell_signal = np.ascontiguousarray(sell_signal, dtype=np.bool_)
+
+    n = len(close)
+    has_range = ~np.isnan(range_high)
+    last_of_day = np.zeros(n, dtype=np.bool_)
+    if n > 1:
+        last_of_day[:-1] = day[1:] != day[:-1]
+    if close_at_end and n:
+        last_of_day[-1] = True
+
+    # Entries only happen inside the window, EOD adds at most one exit per day
+    in_window = (mod > window_start) & (mod < window_end)
+    capacity = int(np.count_nonzero(in_window)) + 1
+
+    out_entry = np.empty(capacity, dtype=np.int64)
+    out_exit = np.empty(capacity, dtype=np.int64)
+    out_side = np.empty(capacity, dtype=np.int8)
+    out_entry_price = np.empty(capacity, dtype=np.float64)
+    out_exit_price = np.empty(capacity, dtype=np.float64)
+    out_reason = np.empty(capacity, dtype=np.int8)
+
+    args = (window_start, window_end, float(sl_dist), float(tp_dist),
+            out_entry, out_exit, out_side, out_entry_price, out_exit_price, out_reason)
+
+    if use_jit and _compiled_kernel is not None:
+        count = _compiled_kernel(close, high, low, mod, has_range, range_high, range_low,
+                                 buy_signal, sell_signal, last_of_day, *args)
+    else:
+        # Native lists are much cheaper to index from Python than numpy scalars
+        count = _breakout_kernel(close.tolist(), high.tolist(), low.tolist(), mod.tolist(),
+                                 has_range.tolist(), range_high.tolist(), range_low.tolist(),
+                                 buy_signal.tolist(), sell_signal.tolist(),
+                                 last_of_day.tolist(), *args)
+
+    return {
+        'entry_idx': out_entry[:count],
+        'exit_idx': out_exit[:count],
+        'side': out_side[:count],
+        'entry_price': out_entry_price[:count],
+        'exit_price': out_exit_price[:count],
+        'reason': out_reason[:count],
+    }
+
+
+def per_bar_ranges(day_codes, day_values, daily_ranges):
+    """Broadcast a {date: {'high', 'low'}} dict onto bars via factorized day codes"""
+    n_days = len(day_values)
+    day_high = np.full(n_days, np.nan)
+    day_low = np.full(n_days, np.nan)
+    for k, date in enumerate(day_values):
+        rng = daily_ranges.get(date)
+        if rng is not None:
+            day_high[k] = rng['high']
+            day_low[k] = rng['low']
+    return day_high[day_codes], day_low[day_codes]
+
+
+def factorize_days(dates):
+    """Return (codes, uniques) for a bar-level date column"""
+    codes, uniques = pd.factorize(dates, sort=False)
+    return codes.astype(np.int32), uniques
@@ -0,0 +1,274 @@
+"""
+Offline benchmark suite for the backtest entry points.
+
+Every benchmark runs on deterministic synthetic m1 data (synthetic_data.py)
+at 1 month, 1 year and 5 years, and reports rows/s (best of a few runs) and
+peak traced memory. Timing and memory are measured in separate runs, since
+tracing slows allocation down. Setup (data generation, preparing the frame)
+is not timed.
+
+Results are compared with a stored baseline; a benchmark that got slower or
+uses more memory than the baseline by more than the threshold fails the run
+(exit code 1). Baselines are machine-specific, so none is committed: record
+one on the machine that runs the gate (--save-baseline writes
+benchmark_baseline.json, merging into an existing file) and run the gate
+with --require-baseline, which also fails when the baseline file, or the
+entry for a benchmark/size being run, is missing.
+
+    python benchmark.py                      # all benchmarks, all sizes
+    python benchmark.py --sizes 1m,1y --only fxcm.calculate_macd
+    python benchmark.py --save-baseline      # record this machine's numbers
+    python benchmark.py --require-baseline   # CI gate: no baseline is a failure
+
+macd_backtest.run_backtest only keeps 2024-2025 rows, so its 5 year run
+reads the whole file but backtests two years of it. The pandas engine and
+macd_backtest still loop over rows in Python, so their 5 year runs take a while.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from synthetic_data import synthetic_m1, write_ohlc_csv
+
+SIZES = {'1m': 1, '1y': 12, '5y': 60}  # Months of m1 data
+BENCHMARK_START = '2024-01-01'
+BENCHMARK_SEED = 42
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+DEFAULT_THRESHOLD = 0.25  # Allowed relative slowdown / memory growth
+MEMORY_SLACK_MB = 1.0  # Memory growth below this is never a regression
+MIN_TIME = 2.0  # Stop repeating a benchmark once one run takes this long
+MIN_TOTAL_TIME = 0.5  # Keep repeating fast benchmarks (up to MAX_REPEAT) for a stable best time
+MAX_REPEAT = 50
+
+
+class BenchmarkData:
+    """Synthetic candles for one size, plus the CSV copy macd_backtest reads"""
+
+    def __init__(self, months, workdir):
+        self.months = months
+        self.workdir = workdir
+        self.frame = synthetic_m1(BENCHMARK_START, months, seed=BENCHMARK_SEED)
+        self._csv = None
+
+    def csv_path(self):
+        if self._csv is None:
+            self._csv = write_ohlc_csv(self.frame, os.path.join(self.workdir, f"synthetic_{self.months}m.csv"))
+        return self._csv
+
+
+def _system(data):
+    """CompleteFXSystem on a prepared copy of the data, with nothing written to disk"""
+    from fxcm import CompleteFXSystem
+
+    system = CompleteFXSystem()
+    system.use_store = False
+    system.use_cache = False
+    system.df = data.frame.copy()
+    system.prepare_data_for_backtest()
+    return system
+
+
+def _bench_calculate_macd(data):
+    system = _system(data)
+    return system.calculate_macd
+
+
+def _bench_calculate_15min_trend(data):
+    system = _system(data)
+
+    def run():
+        system.pyramid = None  # Measure the pyramid build, not the in-memory reuse
+        system.calculate_15min_trend()
+    return run
+
+
+def _bench_find_daily_ranges(data):
+    system = _system(data)
+    return system.find_daily_ranges
+
+
+def _bench_run_backtest(engine):
+    def setup(data):
+        system = _system(data)
+        return lambda: system.run_backtest(engine)
+    return setup
+
+
+def _bench_macd_backtest(data):
+    import macd_backtest
+
+    macd_backtest.PLOT_ENABLED = False
+    macd_backtest.CSV_CACHE = False  # Measure the CSV parse, not a sidecar reload
+    csv_path = data.csv_path()
+    return lambda: macd_backtest.run_backtest(csv_path)
+
+
+# name -> setup(data) returning the callable to measure
+BENCHMARKS = {
+    'fxcm.calculate_macd': _bench_calculate_macd,
+    'fxcm.calculate_15min_trend': _bench_calculate_15min_trend,
+    'fxcm.find_daily_ranges': _bench_find_daily_ranges,
+    'fxcm.run_backtest[numpy]': _bench_run_backtest('numpy'),
+    'fxcm.run_backtest[pandas]': _bench_run_backtest('pandas'),
+    'macd_backtest.run_backtest': _bench_macd_backtest,
+}
+
+
+def measure(run, rows, repeat=3, memory=True):
+    """Best-of-repeat timing plus (in a separate run) peak traced memory"""
+    times = []
+    while len(times) < repeat or (sum(times) < MIN_TOTAL_TIME and len(times) < MAX_REPEAT):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+        if times[-1] >= MIN_TIME:
+            break
+    seconds = min(times)
+    result = {'rows': rows, 'seconds': seconds, 'rows_per_s': rows / seconds}
+
+    if memory:
+        tracemalloc.start()
+        try:
+            run()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        result['peak_mb'] = peak / 1024 / 1024
+    return result
+
+
+def run_benchmarks(sizes=tuple(SIZES), names=tuple(BENCHMARKS), repeat=3, memory=True):
+    """Run the selected benchmarks; returns {'name/size': result}"""
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            data = BenchmarkData(SIZES[size], workdir)
+            rows = len(data.frame)
+            print(f"📊 {size}: {rows:,} synthetic m1 candles")
+            for name in names:
+                # Entry points print progress; keep the report readable
+                with contextlib.redirect_stdout(io.StringIO()):
+                    run = BENCHMARKS[name](data)
+                    result = measure(run, rows, repeat, memory)
+                results[f"{name}/{size}"] = result
+                memory_text = f"  peak {result['peak_mb']:8.1f} MB" if 'peak_mb' in result else ''
+                print(f"   {name:<28} {result['seconds']:8.3f}s  {result['rows_per_s']:>12,.0f} rows/s{memory_text}")
+            del data
+    return results
+
+
+def environment():
+    """Versions that matter when comparing against a baseline from another run"""
+    try:
+        import numba
+        numba_version = numba.__version__
+    except ImportError:
+        numba_version = None
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'numba': numba_version,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+    }
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(path, results):
+    """Merge results into the baseline file (other benchmarks/sizes are kept)"""
+    baseline = load_baseline(path) or {'results': {}}
+    baseline['environment'] = environment()
+    baseline['results'].update(results)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, indent=1, sort_keys=True)
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD, require=False):
+    """
+    Regression messages for results slower or bigger than the baseline beyond
+    threshold; with require, results missing from the baseline are failures too.
+    """
+    failures = []
+    for key, result in results.items():
+        base = baseline['results'].get(key)
+        if base is None:
+            if require:
+                failures.append(f"{key}: no baseline entry")
+            continue
+        floor = base['rows_per_s'] * (1 - threshold)
+        if result['rows_per_s'] < floor:
+            failures.append(f"{key}: {result['rows_per_s']:,.0f} rows/s < {floor:,.0f} "
+                            f"(baseline {base['rows_per_s']:,.0f})")
+        if 'peak_mb' in result and 'peak_mb' in base:
+            ceiling = max(base['peak_mb'] * (1 + threshold), base['peak_mb'] + MEMORY_SLACK_MB)
+            if result['peak_mb'] > ceiling:
+                failures.append(f"{key}: peak {result['peak_mb']:.1f} MB > {ceiling:.1f} MB "
+                                f"(baseline {base['peak_mb']:.1f} MB)")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the backtest entry points on synthetic data")
+    parser.add_argument('--sizes', default=','.join(SIZES), help=f"comma-separated subset of {list(SIZES)}")
+    parser.add_argument('--only', default=None, help="comma-separated benchmark names")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true', help="skip the traced-memory run")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--require-baseline', action='store_true',
+                        help="fail (exit 1) when there is no baseline to compare against")
+    args = parser.parse_args(argv)
+
+    sizes = args.sizes.split(',')
+    names = args.only.split(',') if args.only else list(BENCHMARKS)
+    unknown = [s for s in sizes if s not in SIZES] + [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown sizes/benchmarks: {unknown} (benchmarks: {list(BENCHMARKS)})")
+
+    results = run_benchmarks(sizes, names, args.repeat, not args.no_memory)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"💾 Baseline saved to {args.baseline}")
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        if args.require_baseline:
+            print(f"❌ No baseline at {args.baseline}; record one with --save-baseline on this machine")
+            return 1
+        print(f"ℹ️ No baseline at {args.baseline}; run with --save-baseline to record one")
+        return 0
+    if baseline.get('environment') != environment():
+        print("⚠ Baseline was recorded with different versions/hardware; comparing anyway")
+    failures = compare(results, baseline, args.threshold, args.require_baseline)
+    if failures:
+        print(f"❌ {len(failures)} regression(s) beyond {args.threshold:.0%}:")
+        for message in failures:
+            print(f"   {message}")
+        return 1
+    print(f"✅ No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+"""
+Partitioned columnar store for FXCM candles.
+
+Layout:
+    {root}/{symbol}/{periodicity}/{year}/{week:02d}/meta.json
+    {root}/{symbol}/{periodicity}/{year}/{week:02d}/{column}.npy
+
+Partitions follow the ISO (year, week) of each bar. Timestamps are stored as
+int32 seconds from the partition's first bar, and prices as int32 quote
+units (price * 10**decimals) whenever that round-trips exactly, otherwise as
+float64. Decoding is exact, so a reload gives back the same float64 prices
+that were written. Columns are plain .npy files, so the loader can memory-map
+them and only touch the rows and columns a backtest asks for. A write that
+covers only part of a stored week is merged into it rather than replacing it.
+"""
+
+import datetime
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+TIME_COLUMN = 'DateTime'
+MAX_DECIMALS = 6
+
+
+def price_decimals(values):
+    """Pick the smallest decimals that encode a float column exactly as int32"""
+    finite = values[np.isfinite(values)]
+    if len(finite) != len(values):
+        return None
+    for decimals in range(MAX_DECIMALS + 1):
+        scale = 10 ** decimals
+        scaled = np.rint(values * scale)
+        if np.abs(scaled).max(initial=0) >= 2 ** 31:
+            return None
+        if np.array_equal(scaled / scale, values):
+            return decimals
+    return None
+
+
+def _as_datetime(value, end=False):
+    """Normalise a date/datetime/string bound; a plain date as `end` covers the whole day"""
+    if value is None:
+        return None
+    if isinstance(value, datetime.date) and not isinstance(value, datetime.datetime):
+        ts = pd.Timestamp(value)
+        return ts + pd.Timedelta(days=1) if end else ts
+    return pd.Timestamp(value)
+
+
+class CandleStore:
+    def __init__(self, root='candle_store'):
+        self.root = root
+
+    def partition_dir(self, symbol, periodicity, year, week):
+        return os.path.join(self.root, symbol, periodicity, str(year), f"{week:02d}")
+
+    def partitions(self, symbol, periodicity):
+        """Sorted (year, week) pairs stored for a symbol/periodicity"""
+        base = os.path.join(self.root, symbol, periodicity)
+        found = []
+        if not os.path.isdir(base):
+            return found
+        for year in os.listdir(base):
+            year_dir = os.path.join(base, year)
+            if not year.isdigit() or not os.path.isdir(year_dir):
+                continue
+            for week in os.listdir(year_dir):
+                if week.isdigit() and os.path.exists(os.path.join(year_dir, week, 'meta.json')):
+                    found.append((int(year), int(week)))
+        return sorted(found)
+
+    # --------------------------- WRITE ---------------------------
+    def write(self, symbol, periodicity, df):
+        """Split a candle frame by ISO week and write each partition (see write_week); returns partitions written"""
+        times = pd.to_datetime(df[TIME_COLUMN])
+        iso = times.dt.isocalendar()
+        keys = iso['year'].to_numpy() * 100 + iso['week'].to_numpy()
+        written = []
+        for key in np.unique(keys):
+            mask = keys == key
+            year, week = int(key // 100), int(key % 100)
+            self.write_week(symbol, periodicity, year, week, df.loc[mask])
+            written.append((year, week))
+        return written
+
+    def _read_week(self, path):
+        """Every stored row of a partition as a frame, or None if there is none"""
+        meta_path = os.path.join(path, 'meta.json')
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        columns = [c for c in meta['columns'] if c != TIME_COLUMN]
+        data = self._read_partition(path, meta, columns, None, None, mmap=False)
+        if data is None:
+            return None
+        data[TIME_COLUMN] = data[TIME_COLUMN].view('datetime64[ns]')
+        return pd.DataFrame(data)
+
+    def write_week(self, symbol, periodicity, year, week, df):
+        """
+        Write one partition from a frame holding only that week's bars.
+
+        A frame that covers only part of an existing partition (an FXCM week
+        file starts Sunday 22:00, inside the previous ISO week) is merged
+        with the stored bars, the new rows winning on equal DateTime. The
+        partition is replaced outright only when the frame spans everything
+        already stored.
+        """
+        df = df.assign(**{TIME_COLUMN: pd.to_datetime(df[TIME_COLUMN])})
+        path = self.partition_dir(symbol, periodicity, year, week)
+        stored = self._read_week(path)
+        if stored is not None and len(df):
+            first, last = df[TIME_COLUMN].min(), df[TIME_COLUMN].max()
+            if first > stored[TIME_COLUMN].iloc[0] or last < stored[TIME_COLUMN].iloc[-1]:
+                df = pd.concat([stored, df], ignore_index=True)
+                df = df.drop_duplicates(TIME_COLUMN, keep='last')
+
+        df = df.sort_values(TIME_COLUMN)
+        times_ns = df[TIME_COLUMN].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        whole_seconds = not (times_ns % 1_000_000_000).any()
+        times = times_ns // 1_000_000_000
+        base = int(times[0]) if len(times) else 0
+
+        tmp_path = path + '.tmp'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        meta = {'rows': len(df), 'base_seconds': base,
+                'start': str(pd.Timestamp(base, unit='s')) if len(times) else None,
+                'end': str(pd.Timestamp(int(times[-1]), unit='s')) if len(times) else None,
+                'columns': {}}
+        if whole_seconds and (times - base).max(initial=0) < 2 ** 31:
+            np.save(os.path.join(tmp_path, f"{TIME_COLUMN}.npy"), (times - base).astype(np.int32))
+            meta['columns'][TIME_COLUMN] = {'encoding': 'seconds', 'dtype': 'int32'}
+        else:
+            # Sub-second timestamps: keep full nanosecond precision
+            np.save(os.path.join(tmp_path, f"{TIME_COLUMN}.npy"), times_ns)
+            meta['columns'][TIME_COLUMN] = {'encoding': 'nanoseconds', 'dtype': 'int64'}
+
+        for col in df.columns:
+            if col == TIME_COLUMN or not pd.api.types.is_numeric_dtype(df[col]):
+                continue
+            values = df[col].to_numpy(dtype=np.float64)
+            decimals = price_decimals(values)
+            if decimals is None:
+                np.save(os.path.join(tmp_path, f"{col}.npy"), values)
+                meta['columns'][col] = {'encoding': 'raw', 'dtype': 'float64'}
+            else:
+                encoded = np.rint(values * 10 ** decimals).astype(np.int32)
+                np.save(os.path.join(tmp_path, f"{col}.npy"), encoded)
+                meta['columns'][col] = {'encoding': 'scaled', 'dtype': 'int32', 'decimals': decimals}
+
+        with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=1)
+
+        # Swap the finished partition in place of any previous copy
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+
+    # --------------------------- READ ---------------------------
+    def _read_partition(self, path, meta, columns, start_s, end_s, mmap):
+        mmap_mode = 'r' if mmap else None
+        stamps = np.load(os.path.join(path, f"{TIME_COLUMN}.npy"), mmap_mode=mmap_mode)
+        if meta['columns'][TIME_COLUMN]['encoding'] == 'seconds':
+            base, unit = meta['base_seconds'], 1
+        else:
+            base, unit = 0, 1_000_000_000
+        lo = 0 if start_s is None else int(np.searchsorted(stamps, (start_s - base) * unit, side='left'))
+        hi = len(stamps) if end_s is None else int(np.searchsorted(stamps, (end_s - base) * unit, side='left'))
+        if hi <= lo:
+            return None
+
+        if unit == 1:
+            times = (stamps[lo:hi].astype(np.int64) + base) * 1_000_000_000
+        else:
+            times = np.array(stamps[lo:hi], dtype=np.int64)
+        out = {TIME_COLUMN: times}
+        for col in columns:
+            info = meta['columns'].get(col)
+            if info is None:
+                raise KeyError(f"Column {col!r} not in store (have {sorted(meta['columns'])})")
+            values = np.load(os.path.join(path, f"{col}.npy"), mmap_mode=mmap_mode)[lo:hi]
+            if info['encoding'] == 'scaled':
+                out[col] = values / float(10 ** info['decimals'])
+            else:
+                out[col] = np.array(values, dtype=np.float64)
+        return out
+
+    def load(self, symbol, periodicity, start=None, end=None, columns=None, mmap=True):
+        """
+        Load bars in [start, end) for the requested columns (all by default).
+
+        Only partitions overlapping the range are opened and, with mmap=True,
+        only the selected rows of each column file are read from disk. A plain
+        date as `end` includes that whole day.
+        """
+        start_ts = _as_datetime(start)
+        end_ts = _as_datetime(end, end=True)
+        start_s = int(start_ts.timestamp()) if start_ts is not None else None
+        end_s = int(end_ts.timestamp()) if end_ts is not None else None
+        first = tuple(start_ts.isocalendar()[:2]) if start_ts is not None else None
+        last = tuple(end_ts.isocalendar()[:2]) if end_ts is not None else None
+
+        parts = []
+        selected = None
+        for year, week in self.partitions(symbol, periodicity):
+            if (first and (year, week) < first) or (last and (year, week) > last):
+                continue
+            path = self.partition_dir(symbol, periodicity, year, week)
+            with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if selected is None:
+                selected = [c for c in (columns or meta['columns']) if c != TIME_COLUMN]
+            part = self._read_partition(path, meta, selected, start_s, end_s, mmap)
+            if part is not None:
+                parts.append(part)
+
+        if not parts:
+            return None
+
+        data = {col: np.concatenate([p[col] for p in parts]) for col in parts[0]}
+        data[TIME_COLUMN] = data[TIME_COLUMN].view('datetime64[ns]')
+        return pd.DataFrame(data, copy=False)
+
+    def nbytes(self, symbol, periodicity):
+        """On-disk size of a symbol/periodicity"""
+        base = os.path.join(self.root, symbol, periodicity)
+        total = 0
+        for dirpath, _, filenames in os.walk(base):
+            total += sum(os.path.getsize(os.path.join(dirpath, f)) for f in filenames)
+        return total
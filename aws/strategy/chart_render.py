@@ -0,0 +1,235 @@
+"""
+Decimated, headless rendering of the backtest dashboard.
+
+dashboard_data() reduces a backtest to what the charts actually draw: the
+equity curve and (optionally) the price series are min/max-decimated to the
+pixel width of their panel, and the histograms and bar charts are
+pre-aggregated. The result is a small dict, so it is cheap to hand to a
+background process.
+
+render_dashboard() draws it with matplotlib's object API on the Agg canvas
+(no pyplot state, no display needed). ChartRenderer runs renders in a
+background process pool so batch runs can write their trades and metrics
+and move on while charts are drawn.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+DASHBOARD_FILE = 'complete_backtest_results.png'
+DASHBOARD_INCHES = (16, 12)
+PRICE_PANEL_INCHES = 4  # Extra height when the price series is drawn
+DEFAULT_DPI = 300
+
+
+def decimate_minmax(values, buckets):
+    """
+    Indices (sorted) of the first, last, lowest and highest point of each of
+    `buckets` equal chunks of values. Drawn as a line, the kept points cover
+    the same pixels as the full series when buckets is the pixel width.
+    NaNs are never picked as extremes.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    buckets = max(int(buckets), 1)
+    if n <= 4 * buckets:
+        return np.arange(n)
+
+    size = -(-n // buckets)
+    padded = np.empty(size * buckets)
+    padded[:n] = np.where(np.isnan(values), np.inf, values)
+    padded[n:] = np.inf
+    lows = padded.reshape(buckets, size).argmin(axis=1)
+    padded[:n] = np.where(np.isnan(values), -np.inf, values)
+    padded[n:] = -np.inf
+    highs = padded.reshape(buckets, size).argmax(axis=1)
+
+    offsets = np.arange(buckets) * size
+    keep = np.concatenate([offsets, np.minimum(offsets + size, n) - 1, offsets + lows, offsets + highs])
+    return np.unique(keep[keep < n])
+
+
+def panel_pixels(dpi, columns=2, width_inches=DASHBOARD_INCHES[0]):
+    """Approximate pixel width of one dashboard panel"""
+    return int(width_inches * dpi / columns)
+
+
+def dashboard_data(trades_df, price_times=None, price=None, dpi=DEFAULT_DPI):
+    """Everything render_dashboard draws, reduced to screen resolution"""
+    pips = trades_df['pips'].to_numpy(dtype=np.float64)
+    equity = np.cumsum(pips)
+    keep = decimate_minmax(equity, panel_pixels(dpi))
+    results = trades_df['result'].value_counts()
+    positions = trades_df.groupby('position')['pips'].sum()
+    exits = trades_df['exit_reason'].value_counts()
+    range_pips = trades_df['range_size_pips'].to_numpy(dtype=np.float64)
+
+    data = {
+        'trades': len(trades_df),
+        'equity_x': keep,
+        'equity': equity[keep],
+        'results': (list(results.index), results.to_numpy()),
+        'pips_hist': np.histogram(pips, bins=30),
+        'pips_mean': pips.mean(),
+        'positions': (list(positions.index), positions.to_numpy()),
+        'exits': (list(exits.index), exits.to_numpy()),
+        'range_hist': np.histogram(range_pips, bins=20),
+        'range_mean': range_pips.mean(),
+        'dpi': dpi,
+    }
+    if price is not None:
+        price = np.asarray(price, dtype=np.float64)
+        keep = decimate_minmax(price, panel_pixels(dpi, columns=1))
+        data['price_times'] = np.asarray(price_times)[keep]
+        data['price'] = price[keep]
+        data['entry_times'] = trades_df['entry_time'].to_numpy()
+        data['entry_prices'] = trades_df['entry_price'].to_numpy()
+        data['entry_long'] = (trades_df['position'] == 'long').to_numpy()
+    return data
+
+
+def _bar_labels(ax, bars, labels):
+    for bar, label in zip(bars, labels):
+        ax.annotate(label,
+                    xy=(bar.get_x() + bar.get_width() / 2, bar.get_height()),
+                    xytext=(0, 3),
+                    textcoords="offset points",
+                    ha='center', va='bottom',
+                    fontweight='bold')
+
+
+def render_dashboard(data, out_file=DASHBOARD_FILE, dpi=None, show=False):
+    """
+    Draw the six-panel dashboard (plus the price panel, if present) to
+    out_file. Only show=True touches pyplot (and needs a display).
+    """
+    dpi = dpi or data['dpi']
+    has_price = 'price' in data
+    rows = 4 if has_price else 3
+    width, height = DASHBOARD_INCHES
+    figsize = (width, height + (PRICE_PANEL_INCHES if has_price else 0))
+    if show:
+        import matplotlib.pyplot as plt
+        fig = plt.figure(figsize=figsize)
+    else:
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        fig = Figure(figsize=figsize)
+        FigureCanvasAgg(fig)
+    grid = fig.add_gridspec(rows, 2)
+
+    # 1. Cumulative Pips Performance
+    ax1 = fig.add_subplot(grid[0, 0])
+    ax1.plot(data['equity_x'], data['equity'], linewidth=2, color='blue')
+    ax1.set_title('Cumulative Pips Performance', fontsize=13, fontweight='bold')
+    ax1.set_xlabel('Trade Number')
+    ax1.set_ylabel('Cumulative Pips')
+    ax1.grid(True, alpha=0.3)
+    ax1.axhline(y=0, color='red', linestyle='--', alpha=0.7)
+    final_pips = data['equity'][-1]
+    ax1.annotate(f'Final: {final_pips:+.1f} pips',
+                 xy=(data['trades'] - 1, final_pips),
+                 xytext=(data['trades'] * 0.7, final_pips + 20),
+                 arrowprops=dict(arrowstyle='->', color='red'),
+                 fontsize=12, fontweight='bold')
+
+    # 2. Win/Loss Pie Chart
+    ax2 = fig.add_subplot(grid[0, 1])
+    labels, counts = data['results']
+    ax2.pie(counts,
+            labels=[f'{x.title()} ({v})' for x, v in zip(labels, counts)],
+            autopct='%1.1f%%',
+            startangle=90,
+            colors=['green' if x == 'win' else 'red' for x in labels])
+    ax2.set_title('Win/Loss Distribution', fontsize=13, fontweight='bold')
+
+    # 3. Pips Distribution Histogram
+    ax3 = fig.add_subplot(grid[1, 0])
+    counts, edges = data['pips_hist']
+    ax3.stairs(counts, edges, fill=True, alpha=0.7, edgecolor='black', color='skyblue')
+    ax3.set_title('Pips Distribution per Trade', fontsize=13, fontweight='bold')
+    ax3.set_xlabel('Pips')
+    ax3.set_ylabel('Frequency')
+    ax3.axvline(x=0, color='red', linestyle='--', alpha=0.7, label='Break-even')
+    ax3.axvline(x=data['pips_mean'], color='green', linestyle='-', alpha=0.7, label=f"Mean: {data['pips_mean']:.1f}")
+    ax3.legend()
+    ax3.grid(True, alpha=0.3)
+
+    # 4. Long vs Short Performance
+    ax4 = fig.add_subplot(grid[1, 1])
+    labels, totals = data['positions']
+    x_pos = np.arange(len(labels))
+    bars = ax4.bar(x_pos, totals, color=['blue' if pos == 'long' else 'red' for pos in labels], alpha=0.7)
+    ax4.set_title('Long vs Short Performance (Total Pips)', fontsize=13, fontweight='bold')
+    ax4.set_xlabel('Position Type')
+    ax4.set_ylabel('Total Pips')
+    ax4.set_xticks(x_pos)
+    ax4.set_xticklabels([pos.title() for pos in labels])
+    ax4.grid(True, alpha=0.3)
+    _bar_labels(ax4, bars, [f'{total:+.1f}' for total in totals])
+
+    # 5. Exit Reason Analysis
+    ax5 = fig.add_subplot(grid[2, 0])
+    labels, counts = data['exits']
+    colors_exit = {'TP': 'green', 'SL': 'red', 'EOD': 'orange'}
+    bars = ax5.bar(labels, counts, color=[colors_exit.get(reason, 'gray') for reason in labels], alpha=0.7)
+    ax5.set_title('Exit Reasons', fontsize=13, fontweight='bold')
+    ax5.set_ylabel('Number of Trades')
+    _bar_labels(ax5, bars, [f'{count}\n({count / data["trades"] * 100:.1f}%)' for count in counts])
+
+    # 6. Daily Range Analysis
+    ax6 = fig.add_subplot(grid[2, 1])
+    counts, edges = data['range_hist']
+    ax6.stairs(counts, edges, fill=True, alpha=0.7, edgecolor='black', color='purple')
+    ax6.set_title('Daily Range Size Distribution (11:00-12:15)', fontsize=13, fontweight='bold')
+    ax6.set_xlabel('Range Size (Pips)')
+    ax6.set_ylabel('Frequency')
+    ax6.axvline(x=data['range_mean'], color='red', linestyle='--',
+                label=f"Mean: {data['range_mean']:.1f} pips")
+    ax6.legend()
+    ax6.grid(True, alpha=0.3)
+
+    # 7. Price with entries (min/max-decimated close)
+    if has_price:
+        ax7 = fig.add_subplot(grid[3, :])
+        ax7.plot(data['price_times'], data['price'], linewidth=0.6, color='gray')
+        long = data['entry_long']
+        ax7.scatter(data['entry_times'][long], data['entry_prices'][long], marker='^', s=18, color='green', label='Long entry')
+        ax7.scatter(data['entry_times'][~long], data['entry_prices'][~long], marker='v', s=18, color='red', label='Short entry')
+        ax7.set_title('Price and Entries', fontsize=13, fontweight='bold')
+        ax7.set_ylabel('Price')
+        ax7.legend()
+        ax7.grid(True, alpha=0.3)
+
+    fig.tight_layout()
+    fig.savefig(out_file, dpi=dpi, bbox_inches='tight')
+    if show:
+        plt.show()
+    return out_file
+
+
+class ChartRenderer:
+    def __init__(self, workers=1):
+        """Render dashboards in `workers` background processes"""
+        self.pool = ProcessPoolExecutor(max_workers=workers)
+        self.pending = []
+
+    def submit(self, data, out_file=DASHBOARD_FILE, dpi=None):
+        """Queue a render; returns a Future resolving to out_file"""
+        future = self.pool.submit(render_dashboard, data, out_file, dpi)
+        self.pending.append(future)
+        return future
+
+    def close(self, wait=True):
+        """Stop accepting renders; with wait, block until queued ones finish and return their errors"""
+        self.pool.shutdown(wait=wait)
+        errors = [f.exception() for f in self.pending if wait and f.exception() is not None]
+        self.pending = []
+        return errors
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,90 @@
+"""
+Compact in-memory layout for prepared FXCM frames.
+
+The regular prepared frame carries Date/Time as Python objects (50+ bytes a
+cell), Hour/Minute as int64 and float64 mids next to the eight bid/ask
+columns. The compact layout keeps only:
+
+    DateTime      datetime64[ns]
+    Day           int32 index into a small array of trading dates
+    MinuteOfDay   int32
+    Bid*/Ask*     float32 when the column's quotes decode back exactly, else float64
+
+Mids are rebuilt from bid/ask on demand. float32 columns are decoded by
+rounding to the column's quote decimals, so every price (and every mid)
+comes back as exactly the float64 the full layout would have held.
+"""
+
+import numpy as np
+import pandas as pd
+
+from candle_store import price_decimals
+
+MID_COLUMNS = ('Open', 'High', 'Low', 'Close')
+BID_ASK_COLUMNS = tuple(side + col for side in ('Bid', 'Ask') for col in MID_COLUMNS)
+PRICE_DTYPES = ('float32', 'float64')
+
+
+def encode_prices(values, price_dtype='float32'):
+    """Return (stored_array, decimals); decimals is None when the column stays float64"""
+    values = np.asarray(values, dtype=np.float64)
+    if price_dtype == 'float64':
+        return values, None
+    decimals = price_decimals(values)
+    if decimals is None:
+        return values, None
+    encoded = values.astype(np.float32)
+    if not np.array_equal(decode_prices(encoded, decimals), values):
+        return values, None
+    return encoded, decimals
+
+
+def decode_prices(values, decimals):
+    """float64 prices from a stored column (exact for columns from encode_prices)"""
+    if decimals is None:
+        return np.asarray(values, dtype=np.float64)
+    scale = float(10 ** decimals)
+    return np.rint(np.asarray(values, dtype=np.float64) * scale) / scale
+
+
+def compact_frame(df, price_dtype='float32'):
+    """
+    Build the compact layout from a raw FXCM frame sorted by DateTime.
+
+    Returns (frame, day_values, price_encoding): day_values holds the
+    datetime.date of each Day code and price_encoding maps every stored price
+    column to its decimals (None for float64 columns).
+    """
+    if price_dtype not in PRICE_DTYPES:
+        raise ValueError(f"price_dtype must be one of {PRICE_DTYPES}, got {price_dtype!r}")
+
+    times = pd.to_datetime(df['DateTime']).to_numpy(dtype='datetime64[ns]')
+    ns = times.view(np.int64)
+    day_ns = ns - ns % (86_400 * 1_000_000_000)
+    day_codes, day_starts = pd.factorize(day_ns, sort=False)
+    minute = (ns // 60_000_000_000) % 1440
+
+    frame = pd.DataFrame({
+        'DateTime': times,
+        'Day': day_codes.astype(np.int32),
+        'MinuteOfDay': minute.astype(np.int32),
+    })
+    price_encoding = {}
+    for col in BID_ASK_COLUMNS:
+        if col in df.columns:
+            frame[col], price_encoding[col] = encode_prices(df[col].to_numpy(), price_dtype)
+
+    day_values = pd.DatetimeIndex(day_starts.view('datetime64[ns]')).date
+    return frame, day_values, price_encoding
+
+
+def memory_footprint(df):
+    """Bytes per column (object cells included) plus the index, as a Series"""
+    return df.memory_usage(deep=True, index=True)
+
+
+def format_footprint(df):
+    """One-line memory summary: total MB and bytes per row"""
+    total = int(memory_footprint(df).sum())
+    per_row = total / len(df) if len(df) else 0.0
+    return f"{total / 1024 / 1024:.1f} MB ({per_row:.0f} bytes/candle)"
@@ -10,17 +10,50 @@ Complete Forex System: Data Download + Backtesting
 """
 
 import gzip
-import urllib.request as ur
-import urllib.error
 import datetime
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from io import BytesIO, StringIO
-import time
+from io import BytesIO
+import argparse
+import json
+import sys
 import os
 
+from bar_engine import (run_breakout_engine, per_bar_ranges, factorize_days,
+                        minute_of_day, LONG, SHORT, EXIT_EOD)
+import intrabar
+import param_sweep
+from fxcm_download import WeekDownloader
+from fxcm_cache import WeekCache
+from fxcm_parser import parse_weeks
+from candle_store import CandleStore
+from session_ranges import SessionRangeIndex
+from instruments import pip_size
+from indicators import MACD as MACDIndicator
+from compact_frame import compact_frame, decode_prices, format_footprint, memory_footprint, MID_COLUMNS
+from trade_ledger import TradeLedger, hourly_frame, stats_dict
+from ohlc_pyramid import OHLCPyramid, PYRAMID_COLUMNS, PYRAMID_DIR, data_fingerprint, prune_pyramids
+from instrumentation import RunInstrumentation, instrumented
+from chart_render import ChartRenderer, DASHBOARD_FILE, DEFAULT_DPI, dashboard_data, render_dashboard
+
+
+def _frame_rows(system):
+    return len(system.df) if system.df is not None else None
+
+
+def json_safe(value):
+    """value with numpy scalars as Python numbers and NaN/inf as None, so strict JSON parsers accept it"""
+    if isinstance(value, dict):
+        return {k: json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [json_safe(v) for v in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    return value
+
+
 class CompleteFXSystem:
     def __init__(self):
         # Data download settings
@@ -33,23 +66,59 @@ class CompleteFXSystem:
             'Accept-Encoding': 'gzip, deflate',
             'Connection': 'keep-alive',
         }
+        self.download_workers = 8       # Concurrent week downloads
+        self.download_rate_limit = 4.0  # Max requests per second to the host
+        self.download_retries = 4       # Retries on transient errors (exponential backoff)
+        self.downloader = None
+        self.use_cache = True
+        self.cache_dir = 'fxcm_cache'
+        self.cache_max_bytes = 2 * 1024 ** 3  # Evict least recently used weeks above 2 GB
+        self.cache = None
+        self.use_store = True
+        self.store_dir = 'candle_store'  # Partitioned columnar copy of every download
+        self.pyramid = None
+        self.pyramid_keep = 4  # Saved OHLC pyramids kept in the store (most recent first); None = don't prune
         
         # Backtest settings
         self.df = None
-        self.trades = []
+        self.trades = TradeLedger(0.0001)  # Reset with the symbol's pip size on every backtest run
         self.results = {}
+        self.engine = 'pandas'  # 'pandas' (iterrows loop) or 'numpy' (array engine, JIT if numba is installed)
+        self.compact = False  # Compact frame layout (numpy engine only): int32 day/minute, mids on demand
+        self.price_dtype = 'float32'  # Compact layout price storage; float32 only where quotes decode exactly
+        self.price_encoding = {}  # Stored price column -> quote decimals (None = float64), compact layout
+        self.day_values = None  # Trading date of each Day code, compact layout
         
         # Strategy parameters
         self.range_start = datetime.time(11, 0)  # 11:00
         self.range_end = datetime.time(12, 15)   # 12:15
+        self.trade_window_end = datetime.time(13, 0)  # No new entries from 13:00
         self.sl_pips = 10
         self.tp_pips = 10
-        self.pip_value = 0.0001  # For EUR/USD (4 decimal places)
+        self.pip_value = 0.0001  # For EUR/USD (4 decimal places); run_complete_system sets it per symbol
+        # Exit bars touching TP and SL: 'off' (TP first), 'flag' or 'resolve' (finer data after the entry
+        # fill; exits on the entry bar itself have none and always get ambiguity_fallback)
+        self.ambiguity_mode = 'off'
+        self.ambiguity_fallback = 'tp'  # Exit booked when 'flag'ged or finer data can't decide: 'tp' or 'sl'
+        self.fine_source = None  # intrabar FrameSource/StoreSource/CsvSource used by 'resolve'
         
         # MACD parameters
         self.macd_fast = 7
         self.macd_slow = 26
         self.macd_signal = 9
+        self.macd_stream = None  # Incremental MACD at the last prepared bar (set by calculate_macd)
+        
+        # Instrumentation: per-stage wall/CPU time, RSS and rows, reset by run_complete_system
+        self.instrument = RunInstrumentation()
+        self.run_report_file = 'backtest_run_report.json'  # Written next to backtest_summary.txt
+        self.profile_interval = None  # Seconds between sampling-profiler samples (e.g. 0.005); None = off
+        self.profile_file = 'backtest_run_profile.txt'  # Collapsed stacks when profiling
+        
+        # Output settings
+        self.output_dir = '.'  # Trades, summary, metrics, run report and charts are written here
+        self.chart_file = DASHBOARD_FILE
+        self.chart_dpi = DEFAULT_DPI
+        self.show_charts = True  # plt.show() after saving the dashboard (interactive runs only)
     
     def get_weeks_for_date_range(self, start_date, end_date):
         """Get all (year, week) tuples for the date range"""
@@ -69,42 +138,39 @@ class CompleteFXSystem:
         
         return weeks
     
+    def get_downloader(self):
+        """Shared keep-alive downloader built from the download settings"""
+        if self.downloader is None:
+            self.downloader = WeekDownloader(
+                self.base_url,
+                headers=self.headers,
+                max_workers=self.download_workers,
+                rate_limit=self.download_rate_limit,
+                max_retries=self.download_retries,
+                url_suffix=self.url_suffix,
+            )
+        return self.downloader
+    
+    def get_cache(self):
+        """Local cache of raw weekly files, or None when caching is disabled"""
+        if self.use_cache and self.cache is None:
+            self.cache = WeekCache(self.cache_dir, self.cache_max_bytes)
+        return self.cache if self.use_cache else None
+    
     def download_week_data(self, symbol, periodicity, year, week):
         """Download data for a specific week"""
-        url = f"{self.base_url}{periodicity}/{symbol}/{year}/{week}{self.url_suffix}"
+        compressed_data = self.get_downloader().fetch_week(symbol, periodicity, year, week)
+        if compressed_data is None:
+            return None
         
         try:
-            print(f"Downloading: Week {week}/{year}... ", end="")
-            
-            request = ur.Request(url)
-            for key, value in self.headers.items():
-                request.add_header(key, value)
-            
-            response = ur.urlopen(request, timeout=30)
-            compressed_data = response.read()
-            buf = BytesIO(compressed_data)
-            
-            with gzip.GzipFile(fileobj=buf) as f:
-                data = f.read().decode('utf-8')
-            
-            print(f"✓ {len(data)} bytes")
-            time.sleep(0.3)  # Be respectful to server
-            return data
-            
-        except urllib.error.HTTPError as e:
-            if e.code == 404:
-                print(f"⚠ Not found (may not exist yet)")
-                return None
-            elif e.code == 403:
-                print(f"✗ Access forbidden")
-                return None
-            else:
-                print(f"✗ HTTP Error {e.code}")
-                return None
+            with gzip.GzipFile(fileobj=BytesIO(compressed_data)) as f:
+                return f.read().decode('utf-8')
         except Exception as e:
             print(f"✗ Error: {str(e)}")
             return None
     
+    @instrumented('download', rows=_frame_rows)
     def download_and_clean_data(self, symbol='EURUSD', periodicity='m1', 
                                start_date=None, end_date=None):
         """Download historical data and clean it"""
@@ -126,62 +192,58 @@ class CompleteFXSystem:
         weeks = self.get_weeks_for_date_range(start_date, end_date)
         print(f"📅 Planning to download {len(weeks)} weeks of data\n")
         
-        all_data = []
-        successful_downloads = 0
-        
-        for i, (year, week) in enumerate(weeks, 1):
-            print(f"[{i:2d}/{len(weeks)}] ", end="")
-            
-            week_data = self.download_week_data(symbol, periodicity, year, week)
-            if week_data:
-                all_data.append(week_data)
-                successful_downloads += 1
-        
+        # Closed weeks come from the local cache; only open and missing weeks hit the network
+        week_files = {}
+        cache = self.get_cache()
+        if cache is not None:
+            for year, week in weeks:
+                week_files[(year, week)] = cache.get(symbol, periodicity, year, week)
+        to_fetch = [yw for yw in weeks if week_files.get(yw) is None]
+        if cache is not None:
+            print(f"🗄️ Cache: {len(weeks) - len(to_fetch)} weeks cached, {len(to_fetch)} to download\n")
+        
+        if to_fetch:
+            with self.instrument.stage('fetch') as record:
+                downloaded = self.get_downloader().fetch_weeks(symbol, periodicity, to_fetch)
+                for (year, week), compressed_data in downloaded.items():
+                    week_files[(year, week)] = compressed_data
+                    if cache is not None and compressed_data is not None:
+                        cache.put(symbol, periodicity, year, week, compressed_data)
+                record['weeks'] = len(to_fetch)
+                record['bytes'] = sum(len(data) for data in downloaded.values() if data is not None)
+        
+        if cache is not None:
+            cache.evict()
+            stats = cache.stats()
+            print(f"🗄️ Cache stats: {stats['entries']} weeks, {stats['bytes'] / 1024 / 1024:.1f} MB, "
+                  f"{stats['hits']} hits, {stats['misses']} misses, {stats['stale']} refreshed, "
+                  f"{stats['evictions']} evicted")
+        
+        successful_downloads = sum(1 for yw in weeks if week_files.get(yw) is not None)
         print(f"\n✅ Download complete: {successful_downloads}/{len(weeks)} weeks successful")
         
-        if not all_data:
+        if not successful_downloads:
             print("❌ No data was downloaded!")
             return None
         
-        # Clean and combine data
+        # Parse each week straight into typed columns, streaming the cleaned CSV to disk
         print("🧹 Cleaning and combining data...")
-        combined_data = ''.join(all_data)
-        
-        # Remove blank lines and duplicate headers
-        lines = combined_data.split('\n')
-        cleaned_lines = []
-        header_added = False
-        
-        for line in lines:
-            line = line.strip()
-            
-            if not line:
-                continue
-            
-            # Handle header
-            if line.startswith('DateTime') or line.startswith('Timestamp'):
-                if not header_added:
-                    cleaned_lines.append(line)
-                    header_added = True
-                continue
-            
-            # Add data lines
-            if line:
-                cleaned_lines.append(line)
-        
-        cleaned_data = '\n'.join(cleaned_lines)
-        
-        # Save cleaned data
         filename = f"{symbol}_{periodicity}_{start_date.strftime('%Y%m%d')}_to_{end_date.strftime('%Y%m%d')}_complete.csv"
         print(f"💾 Saving to {filename}...")
         
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(cleaned_data)
-        
-        # Load into DataFrame
         try:
-            self.df = pd.read_csv(StringIO(cleaned_data))
-            self.df = self.df.dropna(how='all')  # Remove any empty rows
+            with self.instrument.stage('clean') as record:
+                self.df = parse_weeks((week_files.get(yw) for yw in weeks), csv_file=filename)
+                if self.df is None:
+                    print("❌ Downloaded files contained no rows!")
+                    return None
+                self.df = self.df.dropna(how='all')  # Remove any empty rows
+                record['rows'] = len(self.df)
+            
+            if self.use_store:
+                with self.instrument.stage('store', rows=len(self.df)):
+                    partitions = CandleStore(self.store_dir).write(symbol, periodicity, self.df)
+                print(f"🗃️ Stored {len(partitions)} weekly partitions in {self.store_dir}/")
             
             print(f"📊 Data Summary:")
             print(f"   Total rows: {len(self.df):,}")
@@ -194,6 +256,19 @@ class CompleteFXSystem:
             print(f"❌ Error creating DataFrame: {e}")
             return None
     
+    def load_from_store(self, symbol='EURUSD', periodicity='m1', start_date=None, end_date=None,
+                        columns=None, mmap=True):
+        """Load previously downloaded candles from the columnar store instead of re-parsing a CSV"""
+        store = CandleStore(self.store_dir)
+        self.df = store.load(symbol, periodicity, start_date, end_date, columns=columns, mmap=mmap)
+        if self.df is None:
+            print(f"❌ No stored data for {symbol} {periodicity} in {self.store_dir}/")
+            return False
+        
+        print(f"🗃️ Loaded {len(self.df):,} rows of {symbol} {periodicity} from {self.store_dir}/")
+        return True
+    
+    @instrumented('prepare', rows=_frame_rows)
     def prepare_data_for_backtest(self):
         """Prepare downloaded data for backtesting"""
         print("\n🔧 PREPARING DATA FOR BACKTEST")
@@ -206,6 +281,16 @@ class CompleteFXSystem:
         # Convert DateTime column
         self.df['DateTime'] = pd.to_datetime(self.df['DateTime'])
         
+        if self.compact:
+            self.df = self.df.sort_values('DateTime').reset_index(drop=True)
+            self.df, self.day_values, self.price_encoding = compact_frame(self.df, self.price_dtype)
+            float32_cols = sum(1 for d in self.price_encoding.values() if d is not None)
+            print(f"✅ Data prepared for backtesting (compact layout, {float32_cols}/{len(self.price_encoding)} price columns float32)")
+            print(f"   Date range: {self.df['DateTime'].min()} to {self.df['DateTime'].max()}")
+            print(f"   Total candles: {len(self.df):,}")
+            print(f"   Memory: {format_footprint(self.df)}")
+            return True
+        
         # Extract date and time components
         self.df['Date'] = self.df['DateTime'].dt.date
         self.df['Time'] = self.df['DateTime'].dt.time
@@ -226,16 +311,47 @@ class CompleteFXSystem:
         print(f"✅ Data prepared for backtesting")
         print(f"   Date range: {self.df['DateTime'].min()} to {self.df['DateTime'].max()}")
         print(f"   Total candles: {len(self.df):,}")
+        print(f"   Memory: {format_footprint(self.df)}")
         
         return True
     
+    def prices(self, column):
+        """A price column as float64; in the compact layout mids are built from bid/ask on demand"""
+        if column in self.price_encoding:
+            return decode_prices(self.df[column].to_numpy(), self.price_encoding[column])
+        if column in self.df.columns:
+            return self.df[column].to_numpy(dtype=np.float64)
+        if column in MID_COLUMNS:
+            return (self.prices('Bid' + column) + self.prices('Ask' + column)) / 2
+        raise KeyError(f"No price column {column!r}")
+    
+    def day_index(self):
+        """(int32 day code per bar, trading date per code) for either frame layout"""
+        if 'Day' in self.df.columns:
+            return self.df['Day'].to_numpy(), self.day_values
+        return factorize_days(self.df['Date'])
+    
+    def minutes_of_day(self):
+        """int32 minute after midnight per bar for either frame layout"""
+        if 'MinuteOfDay' in self.df.columns:
+            return self.df['MinuteOfDay'].to_numpy()
+        return (self.df['Hour'].to_numpy() * 60 + self.df['Minute'].to_numpy()).astype(np.int32)
+    
+    def memory_report(self):
+        """Bytes per column of the prepared frame (plus a 'total' row)"""
+        usage = memory_footprint(self.df)
+        usage['total'] = usage.sum()
+        return usage
+    
+    @instrumented('macd', rows=_frame_rows)
     def calculate_macd(self):
         """Calculate MACD indicator"""
         print("📈 Calculating MACD...")
         
         # Calculate EMAs
-        ema_fast = self.df['Close'].ewm(span=self.macd_fast).mean()
-        ema_slow = self.df['Close'].ewm(span=self.macd_slow).mean()
+        close = pd.Series(self.prices('Close'), index=self.df.index)
+        ema_fast = close.ewm(span=self.macd_fast).mean()
+        ema_slow = close.ewm(span=self.macd_slow).mean()
         
         # MACD line
         self.df['MACD'] = ema_fast - ema_slow
@@ -246,6 +362,13 @@ class CompleteFXSystem:
         # Histogram
         self.df['MACD_Histogram'] = self.df['MACD'] - self.df['MACD_Signal']
         
+        # Carry the final EMA state forward so new candles can be added with
+        # self.macd_stream.update(close) instead of recomputing the whole column
+        self.macd_stream = MACDIndicator(self.macd_fast, self.macd_slow, self.macd_signal).prime(
+            ema_fast.iloc[-1], ema_slow.iloc[-1], self.df['MACD_Signal'].iloc[-1],
+            int(close.notna().sum())
+        )
+        
         # MACD signals
         self.df['MACD_Buy_Signal'] = (
             (self.df['MACD'] > self.df['MACD_Signal']) & 
@@ -257,116 +380,100 @@ class CompleteFXSystem:
             (self.df['MACD'].shift(1) >= self.df['MACD_Signal'].shift(1))
         )
     
+    @instrumented('trend_15min', rows=_frame_rows)
     def calculate_15min_trend(self):
         """Calculate 15-minute trend using EMA"""
         print("📊 Calculating 15-minute trend filter...")
         
-        # Create 15-minute bars from 1-minute data
-        self.df.set_index('DateTime', inplace=True)
-        df_15min = self.df.resample('15T').agg({
-            'Open': 'first',
-            'High': 'max', 
-            'Low': 'min',
-            'Close': 'last',
-            'BidOpen': 'first',
-            'BidHigh': 'max',
-            'BidLow': 'min', 
-            'BidClose': 'last',
-            'AskOpen': 'first',
-            'AskHigh': 'max',
-            'AskLow': 'min',
-            'AskClose': 'last'
-        }).dropna()
+        # 15-minute bars come from the cached OHLC pyramid; each 1-minute bar
+        # reads its 15-minute trend through the pyramid's parent index
+        pyramid = self.get_pyramid()
+        close_15min = pd.Series(pyramid.levels['m15']['columns']['Close'])
         
         # Calculate 50 EMA on 15-minute timeframe for trend
-        df_15min['EMA_50'] = df_15min['Close'].ewm(span=50).mean()
-        df_15min['Trend_Up'] = df_15min['Close'] > df_15min['EMA_50']
+        ema_50 = close_15min.ewm(span=50).mean()
+        trend_up = (close_15min > ema_50).to_numpy()
         
-        # Reset index to merge back
-        df_15min.reset_index(inplace=True)
-        self.df.reset_index(inplace=True)
-        
-        # Merge 15-min trend back to 1-min data
-        self.df['DateTime_15min'] = self.df['DateTime'].dt.floor('15T')
-        trend_data = df_15min[['DateTime', 'Trend_Up']].rename(columns={'DateTime': 'DateTime_15min'})
-        
-        self.df = self.df.merge(trend_data, on='DateTime_15min', how='left')
-        self.df['Trend_Up'] = self.df['Trend_Up'].fillna(method='ffill')
-        
-        # Clean up temporary column
-        self.df.drop('DateTime_15min', axis=1, inplace=True)
+        self.df['Trend_Up'] = pyramid.lookup('m15', trend_up)
         
         print(f"   15-min trend calculated. Trend up: {self.df['Trend_Up'].sum():,} candles, down: {(~self.df['Trend_Up']).sum():,} candles")
     
+    def get_pyramid(self):
+        """m5/m15/H1/H4/D1 bars for the prepared data, reused from the store while the data is unchanged"""
+        columns = [c for c in PYRAMID_COLUMNS if c in self.df.columns or c in MID_COLUMNS]
+        times = self.df['DateTime'].to_numpy(dtype='datetime64[ns]')
+        data = {c: self.prices(c) for c in columns}
+        fingerprint = data_fingerprint(times, data)
+        if self.pyramid is not None and self.pyramid.fingerprint == fingerprint:
+            return self.pyramid
+        
+        path = os.path.join(self.store_dir, PYRAMID_DIR, fingerprint[:16])
+        pyramid = OHLCPyramid.load(path, fingerprint) if self.use_store else None
+        if pyramid is None:
+            pyramid = OHLCPyramid.build(times, data, fingerprint=fingerprint)
+            if self.use_store:
+                pyramid.save(path)
+                if self.pyramid_keep is not None:
+                    prune_pyramids(os.path.join(self.store_dir, PYRAMID_DIR), keep=self.pyramid_keep)
+        self.pyramid = pyramid
+        return pyramid
+    
+    @instrumented('daily_ranges', rows=_frame_rows)
     def find_daily_ranges(self):
-        """Find high/low for each day between 11:00-12:15"""
-        print("📊 Finding daily ranges (11:00-12:15)...")
+        """Find high/low for each day inside the range window (default 11:00-12:15)"""
+        print(f"📊 Finding daily ranges ({self.range_start.strftime('%H:%M')}-{self.range_end.strftime('%H:%M')})...")
         
-        daily_ranges = {}
+        # One grouped pass over the bars instead of filtering the frame once per day
+        day_codes, day_values = self.day_index()
+        index = SessionRangeIndex(day_codes, self.minutes_of_day(), self.prices('High'), self.prices('Low'),
+                                  n_days=len(day_values))
+        day_high, day_low = index.query(minute_of_day(self.range_start), minute_of_day(self.range_end))
         
-        for date in self.df['Date'].unique():
-            # Filter data for this date and time range
-            day_data = self.df[self.df['Date'] == date].copy()
-            
-            # Filter for 11:00-12:15 range
-            range_mask = (
-                (day_data['Hour'] > 11) | 
-                ((day_data['Hour'] == 11) & (day_data['Minute'] >= 0))
-            ) & (
-                (day_data['Hour'] < 12) | 
-                ((day_data['Hour'] == 12) & (day_data['Minute'] <= 15))
-            )
-            
-            range_data = day_data[range_mask]
-            
-            if len(range_data) > 0:
-                daily_ranges[date] = {
-                    'high': range_data['High'].max(),
-                    'low': range_data['Low'].min(),
-                    'range_size': range_data['High'].max() - range_data['Low'].min()
-                }
+        daily_ranges = {}
+        for k in np.flatnonzero(~np.isnan(day_high)):
+            daily_ranges[day_values[k]] = {
+                'high': day_high[k],
+                'low': day_low[k],
+                'range_size': day_high[k] - day_low[k]
+            }
         
         print(f"   Found ranges for {len(daily_ranges)} trading days")
         return daily_ranges
     
-    def run_backtest(self):
+    @instrumented('backtest', rows=_frame_rows)
+    def run_backtest(self, engine=None):
         """Run the complete backtesting strategy"""
+        engine = engine or self.engine
         print("\n🎯 RUNNING BACKTEST")
         print("=" * 50)
-        print("Strategy: Range Breakout (11:00-12:15) + MACD Entry")
-        print(f"📊 Range Detection: 11:00 - 12:15")
-        print(f"⏰ Trading Window: 12:15 - 13:00 ONLY")
+        range_start, range_end = self.range_start.strftime('%H:%M'), self.range_end.strftime('%H:%M')
+        window_end = self.trade_window_end.strftime('%H:%M')
+        print(f"Strategy: Range Breakout ({range_start}-{range_end}) + MACD Entry")
+        print(f"📊 Range Detection: {range_start} - {range_end}")
+        print(f"⏰ Trading Window: {range_end} - {window_end} ONLY")
         print(f"📈 Entry Signal: MACD crossover after breakout")
         print(f"🛡️ Risk: {self.sl_pips} pips SL / {self.tp_pips} pips TP")
+        print(f"⚙️ Engine: {engine}")
         print()
 
-        self.df.set_index('DateTime', inplace=True)
-        df_5min = self.df.resample('5T').agg({
-            'Open': 'first',
-            'High': 'max', 
-            'Low': 'min',
-            'Close': 'last',
-            'BidOpen': 'first',
-            'BidHigh': 'max',
-            'BidLow': 'min', 
-            'BidClose': 'last',
-            'AskOpen': 'first',
-            'AskHigh': 'max',
-            'AskLow': 'min',
-            'AskClose': 'last'
-        }).dropna()
-        
-        # Reset index to merge back
-        df_5min.reset_index(inplace=True)
-        self.df.reset_index(inplace=True)
+        if engine == 'numpy':
+            return self.run_backtest_arrays()
+        if engine != 'pandas':
+            raise ValueError(f"Unknown engine: {engine}")
+        if 'Date' not in self.df.columns:
+            raise ValueError("The compact frame layout only supports engine='numpy'")
 
-        
+        self.trades = TradeLedger(self.pip_value)
         self.calculate_macd()
         self.calculate_15min_trend()
         daily_ranges = self.find_daily_ranges()
         
         print(f"📅 Processing {len(daily_ranges)} trading days...\n")
         
+        # Entry window in minutes of day, exclusive at both ends as in the numpy engine
+        window_start_minute = minute_of_day(self.range_end)
+        window_end_minute = minute_of_day(self.trade_window_end)
+        
         # Track positions
         current_position = None
         position_entry_price = None
@@ -377,6 +484,7 @@ class CompleteFXSystem:
         
         trades_count = 0
         
+        bar_loop = self.instrument.begin('bar_loop', rows=len(self.df))
         for i, row in self.df.iterrows():
             current_date = row['Date']
             current_price = row['Close']
@@ -389,15 +497,9 @@ class CompleteFXSystem:
             day_high = daily_ranges[current_date]['high']
             day_low = daily_ranges[current_date]['low']
             
-            # TRADING WINDOW: Only between 12:15 and 13:00
-            current_hour = row['Hour']
-            current_minute = row['Minute']
-            
-            # Check if we're in the trading window (after 12:15 but before 13:00)
-            in_trading_window = (
-                (current_hour == 12 and current_minute > 15) or  # After 12:15 same hour
-                (current_hour == 12 and current_minute == 59)    # Last minute of 12:xx
-            ) and current_hour < 13  # But before 13:00
+            # TRADING WINDOW: after range_end, before trade_window_end (default 12:15-13:00)
+            current_minute = row['Hour'] * 60 + row['Minute']
+            in_trading_window = window_start_minute < current_minute < window_end_minute
             
             if in_trading_window:
                 
@@ -429,10 +531,10 @@ class CompleteFXSystem:
                     position_tp = position_entry_price + (self.tp_pips * self.pip_value)
                     print(f"   📈 LONG ENTRY at {current_time.strftime('%H:%M')}: {current_price:.5f}")
             
-            # STOP looking for trades after 13:00 (miss the window)
-            elif current_hour >= 13:
+            # STOP looking for trades from trade_window_end on (miss the window)
+            elif current_minute >= window_end_minute:
                 if looking_for is not None and current_position is None:
-                    print(f"   ⏰ MISSED WINDOW: No MACD signal before 13:00 for {looking_for} setup")
+                    print(f"   ⏰ MISSED WINDOW: No MACD signal before {window_end} for {looking_for} setup")
                     looking_for = None  # Reset, missed the window
             
             # Check for position exits
@@ -464,28 +566,16 @@ class CompleteFXSystem:
                     else:  # short
                         pips_result = (position_entry_price - exit_price) / self.pip_value
                     
-                    trade = {
-                        'entry_time': position_entry_time,
-                        'exit_time': current_time,
-                        'position': current_position,
-                        'entry_price': position_entry_price,
-                        'exit_price': exit_price,
-                        'pips': pips_result,
-                        'result': 'win' if pips_result > 0 else 'loss',
-                        'exit_reason': exit_reason,
-                        'day_high': day_high,
-                        'day_low': day_low,
-                        'range_size_pips': (day_high - day_low) / self.pip_value,
-                        'entry_hour': position_entry_time.hour,
-                        'entry_minute': position_entry_time.minute,
-                        'trade_duration_minutes': int((current_time - position_entry_time).total_seconds() / 60),
-                        'trend_direction': 'UP' if row['Trend_Up'] else 'DOWN'
-                    }
-                    
-                    self.trades.append(trade)
+                    self.trades.append(
+                        position_entry_time, current_time,
+                        LONG if current_position == 'long' else SHORT,
+                        position_entry_price, exit_price, pips_result, exit_reason,
+                        day_high, day_low, row['Trend_Up']
+                    )
                     trades_count += 1
                     
-                    print(f"   🏁 TRADE CLOSED: {current_position.upper()} {pips_result:+.1f} pips ({exit_reason}) after {trade['trade_duration_minutes']} min")
+                    duration = int((current_time - position_entry_time).total_seconds() / 60)
+                    print(f"   🏁 TRADE CLOSED: {current_position.upper()} {pips_result:+.1f} pips ({exit_reason}) after {duration} min")
                     
                     # Reset position
                     current_position = None
@@ -508,25 +598,12 @@ class CompleteFXSystem:
                         else:
                             pips_result = (position_entry_price - exit_price) / self.pip_value
                         
-                        trade = {
-                            'entry_time': position_entry_time,
-                            'exit_time': current_time,
-                            'position': current_position,
-                            'entry_price': position_entry_price,
-                            'exit_price': exit_price,
-                            'pips': pips_result,
-                            'result': 'win' if pips_result > 0 else 'loss',
-                            'exit_reason': 'EOD',
-                            'day_high': day_high,
-                            'day_low': day_low,
-                            'range_size_pips': (day_high - day_low) / self.pip_value,
-                            'entry_hour': position_entry_time.hour,
-                            'entry_minute': position_entry_time.minute,
-                            'trade_duration_minutes': int((current_time - position_entry_time).total_seconds() / 60),
-                            'trend_direction': 'UP' if row['Trend_Up'] else 'DOWN'
-                        }
-                        
-                        self.trades.append(trade)
+                        self.trades.append(
+                            position_entry_time, current_time,
+                            LONG if current_position == 'long' else SHORT,
+                            position_entry_price, exit_price, pips_result, 'EOD',
+                            day_high, day_low, row['Trend_Up']
+                        )
                         trades_count += 1
                         
                         print(f"   🌅 EOD CLOSE: {current_position.upper()} {pips_result:+.1f} pips")
@@ -536,66 +613,185 @@ class CompleteFXSystem:
                         position_entry_time = None
                         position_sl = None
                         position_tp = None
+        self.instrument.end(bar_loop)
         
         print(f"🔄 Backtest completed. Generated {trades_count} trades")
+        self.resolve_ambiguous_exits()
+        return self.calculate_results()
+    
+    @instrumented('backtest_arrays', rows=_frame_rows)
+    def run_backtest_arrays(self, use_jit=True):
+        """Run the backtest on NumPy arrays instead of iterrows (same trades as the pandas loop)"""
+        self.calculate_macd()
+        self.calculate_15min_trend()
+        daily_ranges = self.find_daily_ranges()
+        
+        print(f"📅 Processing {len(daily_ranges)} trading days...\n")
+        
+        day_codes, day_values = self.day_index()
+        range_high, range_low = per_bar_ranges(day_codes, day_values, daily_ranges)
+        mod = self.minutes_of_day()
+        
+        with self.instrument.stage('bar_loop', rows=len(self.df)):
+            out = run_breakout_engine(
+                close=self.prices('Close'),
+                high=self.prices('High'),
+                low=self.prices('Low'),
+                mod=mod,
+                day=day_codes,
+                range_high=range_high,
+                range_low=range_low,
+                buy_signal=self.df['MACD_Buy_Signal'].to_numpy(),
+                sell_signal=self.df['MACD_Sell_Signal'].to_numpy(),
+                window_start=minute_of_day(self.range_end),
+                window_end=minute_of_day(self.trade_window_end),
+                sl_dist=self.sl_pips * self.pip_value,
+                tp_dist=self.tp_pips * self.pip_value,
+                use_jit=use_jit,
+            )
+        
+        self.trades = TradeLedger(self.pip_value)
+        self.trades.extend_from_engine(out, self.df['DateTime'].to_numpy(), range_high, range_low,
+                                       self.df['Trend_Up'].to_numpy())
+        
+        print(f"🔄 Backtest completed. Generated {len(out['entry_idx'])} trades")
+        self.resolve_ambiguous_exits()
         return self.calculate_results()
     
+    def resolve_ambiguous_exits(self):
+        """
+        Re-decide trades whose exit bar touched both TP and SL (see intrabar).
+        'flag' books them with ambiguity_fallback; 'resolve' replays the finer
+        bars of just those exit bars from fine_source, starting at the entry
+        fill (the entry bar's close), so trades exiting on their entry bar get
+        the fallback too. Returns the number of ambiguous trades.
+        """
+        if self.ambiguity_mode == 'off' or not self.trades:
+            return 0
+        if self.ambiguity_mode not in intrabar.AMBIGUITY_MODES:
+            raise ValueError(f"Unknown ambiguity_mode {self.ambiguity_mode!r} (use one of {intrabar.AMBIGUITY_MODES})")
+        source = self.fine_source if self.ambiguity_mode == 'resolve' else None
+        if self.ambiguity_mode == 'resolve' and source is None:
+            print("⚠️ ambiguity_mode 'resolve' without a fine_source: ambiguous exits get the fallback")
+        
+        with self.instrument.stage('intrabar', rows=len(self.trades)) as record:
+            times = self.df['DateTime'].to_numpy(dtype='datetime64[ns]')
+            exit_bar = np.searchsorted(times, self.trades.column('exit_time').astype('datetime64[ns]'))
+            side = self.trades.column('side')
+            tp, sl = intrabar.exit_levels(side, self.trades.column('entry_price'),
+                                          self.tp_pips * self.pip_value, self.sl_pips * self.pip_value)
+            bar_length = pd.Timedelta(np.median(np.diff(times[:1000])))
+            entry_bar = np.searchsorted(times, self.trades.column('entry_time').astype('datetime64[ns]'))
+            reason, exit_price, status = intrabar.resolve_exits(
+                side, times[entry_bar], times[exit_bar], self.prices('High')[exit_bar], self.prices('Low')[exit_bar],
+                tp, sl, bar_length, source=source, fallback=self.ambiguity_fallback)
+            
+            # EOD closes only happen on bars that touched neither level
+            rows = np.flatnonzero((status != intrabar.AMBIGUOUS_NONE) & (self.trades.column('reason') != EXIT_EOD))
+            self.trades.set_exits(rows, reason[rows], exit_price[rows], status[rows])
+            resolved = int((status[rows] == intrabar.AMBIGUOUS_RESOLVED).sum())
+            record['ambiguous'] = len(rows)
+            record['resolved'] = resolved
+        
+        print(f"🔍 Ambiguous exit bars: {len(rows)} ({resolved} resolved from finer data, "
+              f"{len(rows) - resolved} booked as {self.ambiguity_fallback.upper()})")
+        return len(rows)
+    
+    def run_parameter_sweep(self, space, n_samples=None, seed=None, workers=None,
+                            sort_by='total_pips', out_file='parameter_sweep_results.csv'):
+        """Sweep strategy parameters over the prepared data (grid, or random sample if n_samples is set)"""
+        if n_samples:
+            points = param_sweep.sample_grid(space, n_samples, seed)
+        else:
+            points = param_sweep.build_grid(space)
+        
+        results = param_sweep.run_sweep(self, points, workers=workers, sort_by=sort_by)
+        
+        if out_file:
+            results.to_csv(out_file, index=False)
+            print(f"💾 Sweep results saved to: {out_file}")
+        
+        return results
+
+    def run_walk_forward(self, space, n_samples=None, seed=None, train_days=60, test_days=20,
+                         step_days=None, objective='total_pips', min_trades=5, workers=None,
+                         out_file='walk_forward_folds.csv'):
+        """Optimize on rolling train windows and stitch the out-of-sample test windows together"""
+        import walk_forward
+
+        if n_samples:
+            points = param_sweep.sample_grid(space, n_samples, seed)
+        else:
+            points = param_sweep.build_grid(space)
+
+        result = walk_forward.run_walk_forward(self, points, train_days=train_days, test_days=test_days,
+                                               step_days=step_days, objective=objective,
+                                               min_trades=min_trades, workers=workers)
+
+        if out_file:
+            result['folds'].to_csv(out_file, index=False)
+            print(f"💾 Walk-forward folds saved to: {out_file}")
+
+        return result
+
+    def run_portfolio_backtest(self, symbols, periodicity='m1', start_date=None, end_date=None,
+                               max_concurrent=3, max_per_symbol=1, risk_per_trade=1.0, workers=None,
+                               out_file='portfolio_trades.csv'):
+        """Run this system's settings over a basket of symbols in parallel and merge them into one portfolio"""
+        import portfolio
+        
+        settings = {name: getattr(self, name) for name in portfolio.SYSTEM_SETTINGS}
+        result = portfolio.run_portfolio(symbols, periodicity, start_date, end_date,
+                                         max_concurrent=max_concurrent, max_per_symbol=max_per_symbol,
+                                         risk_per_trade=risk_per_trade, workers=workers, settings=settings)
+        
+        if result and out_file:
+            result['trades'].to_csv(out_file, index=False)
+            print(f"💾 Portfolio trades saved to: {out_file}")
+        
+        return result
+    
+    def run_robustness(self, n_sims=20_000, risk_per_trade=1.0, ruin_drawdown_pct=50.0, seed=None,
+                       out_file='robustness_summary.csv'):
+        """Bootstrap / permutation Monte Carlo of the last backtest's trades (see robustness.py)"""
+        import robustness
+        
+        if not len(self.trades):
+            print("❌ No trades to resample; run a backtest first")
+            return None
+        
+        r = robustness.trade_returns(self.trades, self.sl_pips)
+        report = robustness.run_robustness(r, n_sims, risk_per_trade, ruin_drawdown_pct, seed=seed)
+        
+        if out_file:
+            os.makedirs(self.output_dir, exist_ok=True)
+            out_file = os.path.join(self.output_dir, out_file)
+            tables = [report[m]['table'].assign(method=m).reset_index(names='statistic')
+                      for m in robustness.METHODS]
+            pd.concat(tables, ignore_index=True).to_csv(out_file, index=False)
+            print(f"💾 Robustness percentiles saved to: {out_file}")
+        
+        return report
+    
+    @instrumented('results', rows=lambda system: len(system.trades))
     def calculate_results(self):
         """Calculate backtest results"""
         if not self.trades:
             print("❌ No trades found!")
             return None
         
-        trades_df = pd.DataFrame(self.trades)
-        
-        # Basic stats
-        total_trades = len(trades_df)
-        winning_trades = len(trades_df[trades_df['result'] == 'win'])
-        losing_trades = len(trades_df[trades_df['result'] == 'loss'])
-        win_rate = (winning_trades / total_trades) * 100 if total_trades > 0 else 0
-        
-        # Pips results
-        total_pips = trades_df['pips'].sum()
-        avg_win_pips = trades_df[trades_df['result'] == 'win']['pips'].mean() if winning_trades > 0 else 0
-        avg_loss_pips = trades_df[trades_df['result'] == 'loss']['pips'].mean() if losing_trades > 0 else 0
-        
-        # Calculate profit factor
-        total_win_pips = trades_df[trades_df['result'] == 'win']['pips'].sum()
-        total_loss_pips = abs(trades_df[trades_df['result'] == 'loss']['pips'].sum())
-        profit_factor = total_win_pips / total_loss_pips if total_loss_pips > 0 else float('inf')
-        
-        # Position types
-        long_trades = len(trades_df[trades_df['position'] == 'long'])
-        short_trades = len(trades_df[trades_df['position'] == 'short'])
-        
-        # Exit reasons
-        tp_exits = len(trades_df[trades_df['exit_reason'] == 'TP'])
-        sl_exits = len(trades_df[trades_df['exit_reason'] == 'SL'])
-        eod_exits = len(trades_df[trades_df['exit_reason'] == 'EOD'])
-        
-        # Average range size
-        avg_range_pips = trades_df['range_size_pips'].mean()
-        
-        self.results = {
-            'total_trades': total_trades,
-            'winning_trades': winning_trades,
-            'losing_trades': losing_trades,
-            'win_rate': win_rate,
-            'total_pips': total_pips,
-            'avg_win_pips': avg_win_pips,
-            'avg_loss_pips': avg_loss_pips,
-            'profit_factor': profit_factor,
-            'long_trades': long_trades,
-            'short_trades': short_trades,
-            'tp_exits': tp_exits,
-            'sl_exits': sl_exits,
-            'eod_exits': eod_exits,
-            'avg_range_pips': avg_range_pips,
-            'trades_df': trades_df
-        }
+        # All statistics come from one pass over the ledger's columns
+        row, hourly = self.trades.stats()
+        trades_df = self.trades.to_frame()
+        
+        self.results = stats_dict(row)
+        self.results['avg_range_pips'] = trades_df['range_size_pips'].mean()
+        self.results['per_hour'] = hourly_frame(hourly)
+        self.results['trades_df'] = trades_df
         
         return self.results
     
+    @instrumented('print')
     def print_results(self):
         """Print comprehensive backtest results"""
         if not self.results:
@@ -606,11 +802,11 @@ class CompleteFXSystem:
         print("=" * 60)
         
         print(f"📊 STRATEGY OVERVIEW")
-        print(f"   Range Detection: 11:00 - 12:15")
+        print(f"   Range Detection: {self.range_start.strftime('%H:%M')} - {self.range_end.strftime('%H:%M')}")
         print(f"   Entry Signal: MACD Crossover")
         print(f"   Risk Management: {self.sl_pips} pips SL / {self.tp_pips} pips TP")
         print(f"   Data Period: {self.df['DateTime'].min().date()} to {self.df['DateTime'].max().date()}")
-        print(f"   Total Days: {len(self.df['Date'].unique())} trading days")
+        print(f"   Total Days: {len(self.day_index()[1])} trading days")
         
         print(f"\n📈 TRADE STATISTICS")
         print(f"   Total Trades: {self.results['total_trades']}")
@@ -622,6 +818,8 @@ class CompleteFXSystem:
         print(f"   Average Win: {self.results['avg_win_pips']:+.1f} pips")
         print(f"   Average Loss: {self.results['avg_loss_pips']:+.1f} pips")
         print(f"   Profit Factor: {self.results['profit_factor']:.2f}")
+        print(f"   Expectancy: {self.results['expectancy_pips']:+.2f} pips/trade (payoff ratio {self.results['payoff_ratio']:.2f})")
+        print(f"   Max Drawdown: {self.results['max_drawdown_pips']:.1f} pips")
         print(f"   Average Daily Range: {self.results['avg_range_pips']:.1f} pips")
         
         print(f"\n🎲 POSITION BREAKDOWN")
@@ -649,6 +847,12 @@ class CompleteFXSystem:
                   f"{trade['entry_price']:<8.5f} {trade['exit_price']:<8.5f} {trade['pips']:+8.1f} "
                   f"{duration:<8} {trend:<5} {trade['exit_reason']:<6} {trade['result'].upper():<6}")
                   
+        # Per-hour breakdown
+        print(f"\n🕐 RESULTS BY ENTRY HOUR")
+        for _, row in self.results['per_hour'].iterrows():
+            print(f"   {int(row['entry_hour']):02d}:00  {int(row['trades'])} trades, "
+                  f"{row['total_pips']:+.1f} pips, {row['win_rate']:.1f}% win rate")
+        
         # Show entry time distribution
         print(f"\n⏰ ENTRY TIME DISTRIBUTION")
         entry_times = trades_df.groupby(['entry_hour', 'entry_minute']).size().reset_index(name='count')
@@ -671,141 +875,52 @@ class CompleteFXSystem:
                 win_rate = (wins / count * 100) if count > 0 else 0
                 print(f"   {pos.upper()} in {trend} trend: {count} trades, {total_pips:+.1f} pips, {win_rate:.1f}% win rate")
     
-    def create_visualizations(self):
-        """Create comprehensive result visualizations"""
+    @instrumented('plot', rows=lambda system: len(system.trades))
+    def create_visualizations(self, renderer=None, show=None):
+        """
+        Create comprehensive result visualizations. The equity curve and price
+        series are decimated to the chart's pixel width first; with a
+        ChartRenderer the figure is drawn in the background (returns a Future).
+        """
         if not self.results:
             return
         
-        trades_df = self.results['trades_df']
+        data = dashboard_data(self.results['trades_df'], self.df['DateTime'].to_numpy(),
+                              self.prices('Close'), dpi=self.chart_dpi)
+        out_file = os.path.join(self.output_dir, self.chart_file)
+        if renderer is not None:
+            print(f"📊 Charts queued for '{out_file}'")
+            return renderer.submit(data, out_file)
         
-        # Create figure with subplots
-        fig = plt.figure(figsize=(16, 12))
-        
-        # 1. Cumulative Pips Performance
-        ax1 = plt.subplot(3, 2, 1)
-        trades_df['cumulative_pips'] = trades_df['pips'].cumsum()
-        ax1.plot(range(len(trades_df)), trades_df['cumulative_pips'], linewidth=2, color='blue')
-        ax1.set_title('Cumulative Pips Performance', fontsize=13, fontweight='bold')
-        ax1.set_xlabel('Trade Number')
-        ax1.set_ylabel('Cumulative Pips')
-        ax1.grid(True, alpha=0.3)
-        ax1.axhline(y=0, color='red', linestyle='--', alpha=0.7)
-        
-        # Add performance annotation
-        final_pips = trades_df['cumulative_pips'].iloc[-1]
-        ax1.annotate(f'Final: {final_pips:+.1f} pips', 
-                    xy=(len(trades_df)-1, final_pips),
-                    xytext=(len(trades_df)*0.7, final_pips + 20),
-                    arrowprops=dict(arrowstyle='->', color='red'),
-                    fontsize=12, fontweight='bold')
-        
-        # 2. Win/Loss Pie Chart
-        ax2 = plt.subplot(3, 2, 2)
-        win_loss_counts = trades_df['result'].value_counts()
-        colors = ['green' if x == 'win' else 'red' for x in win_loss_counts.index]
-        wedges, texts, autotexts = ax2.pie(win_loss_counts.values, 
-                                          labels=[f'{x.title()} ({v})' for x, v in zip(win_loss_counts.index, win_loss_counts.values)], 
-                                          autopct='%1.1f%%', 
-                                          startangle=90,
-                                          colors=colors)
-        ax2.set_title('Win/Loss Distribution', fontsize=13, fontweight='bold')
-        
-        # 3. Pips Distribution Histogram
-        ax3 = plt.subplot(3, 2, 3)
-        ax3.hist(trades_df['pips'], bins=30, alpha=0.7, edgecolor='black', color='skyblue')
-        ax3.set_title('Pips Distribution per Trade', fontsize=13, fontweight='bold')
-        ax3.set_xlabel('Pips')
-        ax3.set_ylabel('Frequency')
-        ax3.axvline(x=0, color='red', linestyle='--', alpha=0.7, label='Break-even')
-        ax3.axvline(x=trades_df['pips'].mean(), color='green', linestyle='-', alpha=0.7, label=f'Mean: {trades_df["pips"].mean():.1f}')
-        ax3.legend()
-        ax3.grid(True, alpha=0.3)
-        
-        # 4. Long vs Short Performance
-        ax4 = plt.subplot(3, 2, 4)
-        position_performance = trades_df.groupby('position')['pips'].agg(['sum', 'mean', 'count'])
-        x_pos = np.arange(len(position_performance))
-        bars = ax4.bar(x_pos, position_performance['sum'], 
-                      color=['blue' if pos == 'long' else 'red' for pos in position_performance.index],
-                      alpha=0.7)
-        ax4.set_title('Long vs Short Performance (Total Pips)', fontsize=13, fontweight='bold')
-        ax4.set_xlabel('Position Type')
-        ax4.set_ylabel('Total Pips')
-        ax4.set_xticks(x_pos)
-        ax4.set_xticklabels([pos.title() for pos in position_performance.index])
-        ax4.grid(True, alpha=0.3)
-        
-        # Add value labels on bars
-        for i, bar in enumerate(bars):
-            height = bar.get_height()
-            ax4.annotate(f'{height:+.1f}',
-                        xy=(bar.get_x() + bar.get_width() / 2, height),
-                        xytext=(0, 3),
-                        textcoords="offset points",
-                        ha='center', va='bottom',
-                        fontweight='bold')
-        
-        # 5. Exit Reason Analysis
-        ax5 = plt.subplot(3, 2, 5)
-        exit_reasons = trades_df['exit_reason'].value_counts()
-        colors_exit = {'TP': 'green', 'SL': 'red', 'EOD': 'orange'}
-        bar_colors = [colors_exit.get(reason, 'gray') for reason in exit_reasons.index]
-        bars = ax5.bar(exit_reasons.index, exit_reasons.values, color=bar_colors, alpha=0.7)
-        ax5.set_title('Exit Reasons', fontsize=13, fontweight='bold')
-        ax5.set_ylabel('Number of Trades')
-        
-        # Add percentage labels
-        total = len(trades_df)
-        for i, bar in enumerate(bars):
-            height = bar.get_height()
-            percentage = (height / total) * 100
-            ax5.annotate(f'{height}\n({percentage:.1f}%)',
-                        xy=(bar.get_x() + bar.get_width() / 2, height),
-                        xytext=(0, 3),
-                        textcoords="offset points",
-                        ha='center', va='bottom',
-                        fontweight='bold')
-        
-        # 6. Daily Range Analysis
-        ax6 = plt.subplot(3, 2, 6)
-        ax6.hist(trades_df['range_size_pips'], bins=20, alpha=0.7, edgecolor='black', color='purple')
-        ax6.set_title('Daily Range Size Distribution (11:00-12:15)', fontsize=13, fontweight='bold')
-        ax6.set_xlabel('Range Size (Pips)')
-        ax6.set_ylabel('Frequency')
-        ax6.axvline(x=trades_df['range_size_pips'].mean(), color='red', linestyle='--', 
-                   label=f'Mean: {trades_df["range_size_pips"].mean():.1f} pips')
-        ax6.legend()
-        ax6.grid(True, alpha=0.3)
-        
-        plt.tight_layout()
-        
-        # Save the plot
-        plt.savefig('complete_backtest_results.png', dpi=300, bbox_inches='tight')
-        print(f"📊 Charts saved as 'complete_backtest_results.png'")
-        
-        plt.show()
+        render_dashboard(data, out_file, show=self.show_charts if show is None else show)
+        print(f"📊 Charts saved as '{out_file}'")
+        return out_file
     
+    @instrumented('save', rows=lambda system: len(system.trades))
     def save_detailed_results(self):
         """Save detailed results to files"""
         if not self.results:
             return
         
+        os.makedirs(self.output_dir, exist_ok=True)
+        
         # Save trades to CSV
-        trades_file = "detailed_trades_analysis.csv"
+        trades_file = os.path.join(self.output_dir, "detailed_trades_analysis.csv")
         self.results['trades_df'].to_csv(trades_file, index=False)
         print(f"💾 Detailed trades saved to: {trades_file}")
         
         # Save summary statistics
-        summary_file = "backtest_summary.txt"
+        summary_file = os.path.join(self.output_dir, "backtest_summary.txt")
         with open(summary_file, 'w') as f:
             f.write("FOREX BACKTEST SUMMARY REPORT\n")
             f.write("=" * 50 + "\n\n")
             
-            f.write(f"Strategy: Range Breakout (11:00-12:15) + MACD Entry\n")
+            f.write(f"Strategy: Range Breakout ({self.range_start.strftime('%H:%M')}-"
+                    f"{self.range_end.strftime('%H:%M')}) + MACD Entry\n")
             f.write(f"Stop Loss: {self.sl_pips} pips\n")
             f.write(f"Take Profit: {self.tp_pips} pips\n")
             f.write(f"Data Period: {self.df['DateTime'].min().date()} to {self.df['DateTime'].max().date()}\n")
-            f.write(f"Total Days: {len(self.df['Date'].unique())} trading days\n\n")
+            f.write(f"Total Days: {len(self.day_index()[1])} trading days\n\n")
             
             f.write("PERFORMANCE METRICS:\n")
             f.write(f"Total Trades: {self.results['total_trades']}\n")
@@ -814,24 +929,100 @@ class CompleteFXSystem:
             f.write(f"Average Win: {self.results['avg_win_pips']:+.1f} pips\n")
             f.write(f"Average Loss: {self.results['avg_loss_pips']:+.1f} pips\n")
             f.write(f"Profit Factor: {self.results['profit_factor']:.2f}\n")
+            f.write(f"Expectancy: {self.results['expectancy_pips']:+.2f} pips/trade\n")
+            f.write(f"Max Drawdown: {self.results['max_drawdown_pips']:.1f} pips\n")
             f.write(f"Average Range: {self.results['avg_range_pips']:.1f} pips\n")
         
         print(f"📋 Summary report saved to: {summary_file}")
+        
+        # Machine-readable copy of the headline statistics
+        metrics_file = os.path.join(self.output_dir, "backtest_metrics.json")
+        metrics = {k: v for k, v in self.results.items() if k not in ('trades_df', 'per_hour')}
+        metrics['per_hour'] = self.results['per_hour'].to_dict(orient='records')
+        with open(metrics_file, 'w', encoding='utf-8') as f:
+            # profit_factor / risk_reward are inf without losing trades; written as null
+            json.dump(json_safe(metrics), f, indent=1, default=float, allow_nan=False)
+        print(f"📋 Metrics saved to: {metrics_file}")
     
-    def run_complete_system(self, symbol='EURUSD', periodicity='m1'):
-        """Run the complete system: download + backtest"""
+    def run_complete_system(self, symbol='EURUSD', periodicity='m1', start_date=None, end_date=None):
+        """Run the complete system: download + backtest, then write the run report"""
+        self.instrument = RunInstrumentation()
+        if self.profile_interval:
+            self.instrument.start_profiler(self.profile_interval)
+        try:
+            with self.instrument.stage('complete_system'):
+                return self._run_complete_system(symbol, periodicity, start_date, end_date)
+        finally:
+            self.write_run_report(symbol=symbol, periodicity=periodicity)
+    
+    def run_batch(self, symbol='EURUSD', periodicity='m1', start_date=None, end_date=None,
+                  output_dir=None, charts=True, renderer=None):
+        """
+        Non-interactive run for batch workers: data from download_and_clean_data
+        (closed weeks served by the week cache, the open week and missing weeks
+        downloaded, so the requested range is always covered and current),
+        backtest, then trades, summary, metrics and run report are written
+        before any chart is drawn. Charts go to renderer (a ChartRenderer
+        shared across runs) when given, else are drawn inline without
+        plt.show(); charts=False skips them. Returns the results or None.
+        """
+        if output_dir is not None:
+            self.output_dir = output_dir
+        self.show_charts = False
+        self.pip_value = pip_size(symbol)
+        self.instrument = RunInstrumentation()
+        if self.profile_interval:
+            self.instrument.start_profiler(self.profile_interval)
+        try:
+            with self.instrument.stage('batch'):
+                if not self.download_and_clean_data(symbol, periodicity, start_date, end_date):
+                    print("❌ No data for the batch run.")
+                    return None
+                if not self.prepare_data_for_backtest():
+                    return None
+                results = self.run_backtest()
+                if not results:
+                    print("❌ Backtest produced no trades.")
+                    return None
+                self.save_detailed_results()
+        finally:
+            self.write_run_report(symbol=symbol, periodicity=periodicity, mode='batch')
+        
+        if charts:
+            try:
+                self.create_visualizations(renderer=renderer)
+            except Exception as e:
+                print(f"⚠ Could not create visualizations: {e}")
+        return results
+    
+    def write_run_report(self, **extra):
+        """Save the stage timings (and profile, if sampling) as JSON next to backtest_summary.txt"""
+        profiler = self.instrument.stop_profiler()
+        self.instrument.print_summary()
+        os.makedirs(self.output_dir, exist_ok=True)
+        report_file = os.path.join(self.output_dir, self.run_report_file)
+        self.instrument.save(report_file, extra)
+        print(f"⏱️ Run report saved to: {report_file}")
+        if profiler is not None:
+            profile_file = os.path.join(self.output_dir, self.profile_file)
+            profiler.write_collapsed(profile_file)
+            print(f"🔬 Profile ({profiler.samples} samples) saved to: {profile_file}")
+    
+    def _run_complete_system(self, symbol, periodicity, start_date=None, end_date=None):
         print("🚀 COMPLETE FOREX ANALYSIS SYSTEM")
         print("=" * 60)
         print("This system will:")
-        print("1. 📥 Download FXCM historical data (2025-01-01 to today)")
+        print(f"1. 📥 Download FXCM historical data ({start_date or '2025-01-01'} to {end_date or 'today'})")
         print("2. 🧹 Clean and prepare the data")
         print("3. 🎯 Run backtest with Range Breakout + MACD strategy")
         print("4. 📊 Generate comprehensive results and visualizations")
         print("5. 💾 Save all results to files")
         print()
         
+        self.pip_value = pip_size(symbol)
+        
         # Step 1: Download and clean data
-        data_file = self.download_and_clean_data(symbol, periodicity)
+        data_file = self.download_and_clean_data(symbol, periodicity, start_date, end_date)
         if not data_file:
             print("❌ Failed to download data. Exiting.")
             return
@@ -865,7 +1056,9 @@ class CompleteFXSystem:
         print(f"  📄 {data_file} - Clean historical data")
         print("  📄 detailed_trades_analysis.csv - All trade details")
         print("  📄 backtest_summary.txt - Summary report")
-        print("  📄 complete_backtest_results.png - Performance charts")
+        print("  📄 backtest_metrics.json - Summary statistics (JSON)")
+        print(f"  📄 {self.chart_file} - Performance charts")
+        print(f"  📄 {self.run_report_file} - Stage timings and memory")
         print()
         
         # Final summary
@@ -876,15 +1069,49 @@ class CompleteFXSystem:
         
         return results
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="FXCM download + Range Breakout / MACD backtest")
+    parser.add_argument('--batch', action='store_true',
+                        help="run without prompts or plt.show() (implied when stdin is not a terminal)")
+    parser.add_argument('--symbol', default='EURUSD')
+    parser.add_argument('--periodicity', default='m1')
+    parser.add_argument('--start', type=datetime.date.fromisoformat, default=None, help="YYYY-MM-DD")
+    parser.add_argument('--end', type=datetime.date.fromisoformat, default=None, help="YYYY-MM-DD")
+    parser.add_argument('--engine', choices=('pandas', 'numpy'), default=None)
+    parser.add_argument('--out', default='.', help="directory for result files")
+    parser.add_argument('--no-charts', action='store_true', help="skip the dashboard")
+    parser.add_argument('--profile', type=float, default=None, metavar='SECONDS',
+                        help="sampling-profiler interval")
+    return parser.parse_args(argv)
+
+
+def batch_main(args):
+    """Batch entry point: results first, dashboard rendered in a background process; returns an exit code"""
+    fx_system = CompleteFXSystem()
+    if args.engine:
+        fx_system.engine = args.engine
+    fx_system.profile_interval = args.profile
+    
+    with ChartRenderer() as renderer:
+        results = fx_system.run_batch(args.symbol, args.periodicity, args.start, args.end,
+                                      output_dir=args.out, charts=not args.no_charts, renderer=renderer)
+    return 0 if results else 1
+
+
+def main(args=None):
     """Main function to run the complete system"""
+    args = args or parse_args([])
     
     # Create the system
     fx_system = CompleteFXSystem()
+    if args.engine:
+        fx_system.engine = args.engine
+    fx_system.output_dir = args.out
+    fx_system.profile_interval = args.profile
     
     # Run everything
     try:
-        results = fx_system.run_complete_system()
+        results = fx_system.run_complete_system(args.symbol, args.periodicity, args.start, args.end)
         
         if results:
             print("\n🎯 Quick Summary:")
@@ -901,9 +1128,14 @@ def main():
         traceback.print_exc()
 
 if __name__ == "__main__":
+    args = parse_args()
+    if args.batch or not sys.stdin.isatty():
+        sys.exit(batch_main(args))
+    
     # Show system requirements
     print("📋 SYSTEM REQUIREMENTS:")
-    print("   - pandas, numpy, matplotlib, seaborn")
+    print("   - pandas, numpy, matplotlib")
+    print("   - numba (optional, compiles the numpy backtest engine)")
     print("   - Internet connection for data download")
     print("   - Approximately 2-5 minutes for complete analysis")
     print()
@@ -911,6 +1143,6 @@ if __name__ == "__main__":
     # Ask user to confirm
     response = input("Ready to start? (y/n): ").lower().strip()
     if response in ['y', 'yes', '']:
-        main()
+        main(args)
     else:
         print("👋 Goodbye!")
\ No newline at end of file
@@ -0,0 +1,194 @@
+"""
+On-disk cache for raw FXCM weekly gz files.
+
+Blobs are stored content-addressed under objects/<sha256[:2]>/<sha256>.gz
+and an index.json maps symbol/periodicity/year/week keys to them. A week is
+marked closed once it was fetched after its ISO week ended; closed weeks are
+immutable and never re-fetched, while open (current) weeks are refreshed on
+every run. The cache is kept under a byte cap by evicting the least recently
+used entries. Several processes may share one cache directory: index
+updates are merged into the on-disk index under a file lock.
+"""
+
+import contextlib
+import datetime
+import hashlib
+import json
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking
+    fcntl = None
+
+
+def week_is_closed(year, week, today=None):
+    """True once the ISO week (Mon-Sun) is fully in the past"""
+    today = today or datetime.date.today()
+    return datetime.date.fromisocalendar(year, week, 7) < today
+
+
+class WeekCache:
+    def __init__(self, root='fxcm_cache', max_bytes=2 * 1024 ** 3):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.index_file = os.path.join(root, 'index.json')
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+        self.index = self._load_index()
+        self.dirty = set()
+        self.removed = set()
+
+    @staticmethod
+    def key(symbol, periodicity, year, week):
+        return f"{symbol}/{periodicity}/{year}/{week}"
+
+    def _load_index(self):
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @contextlib.contextmanager
+    def _locked(self):
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, 'index.lock'), 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _merge_index(self):
+        """Fold this process's changes into the on-disk index (caller holds the lock)"""
+        merged = self._load_index()
+        for key in self.removed:
+            merged.pop(key, None)
+        for key in self.dirty:
+            if key in self.index:
+                merged[key] = self.index[key]
+        self.index = merged
+        self.dirty = set()
+        self.removed = set()
+
+    def _write_index(self):
+        tmp_file = f"{self.index_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f)
+        os.replace(tmp_file, self.index_file)
+
+    def save_index(self):
+        with self._locked():
+            self._merge_index()
+            self._write_index()
+
+    def _object_path(self, digest):
+        return os.path.join(self.root, 'objects', digest[:2], digest + '.gz')
+
+    def get(self, symbol, periodicity, year, week):
+        """Cached bytes for a week, or None if missing, corrupt or still open"""
+        key = self.key(symbol, periodicity, year, week)
+        entry = self.index.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if not entry['closed']:
+            # Fetched while the week was open, so the file may have grown since
+            self.stale += 1
+            return None
+
+        try:
+            with open(self._object_path(entry['sha256']), 'rb') as f:
+                data = f.read()
+        except OSError:
+            data = None
+        if data is None or hashlib.sha256(data).hexdigest() != entry['sha256']:
+            del self.index[key]
+            self.removed.add(key)
+            self.misses += 1
+            return None
+
+        entry['last_access'] = time.time()
+        self.dirty.add(key)
+        self.hits += 1
+        return data
+
+    def put(self, symbol, periodicity, year, week, data, today=None):
+        """Store a downloaded week; returns its content hash"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_file = path + '.tmp'
+            with open(tmp_file, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_file, path)
+
+        now = time.time()
+        key = self.key(symbol, periodicity, year, week)
+        self.dirty.add(key)
+        self.removed.discard(key)
+        self.index[key] = {
+            'sha256': digest,
+            'size': len(data),
+            'closed': week_is_closed(year, week, today),
+            'fetched': now,
+            'last_access': now,
+        }
+        return digest
+
+    def total_bytes(self):
+        """Bytes held by distinct blobs"""
+        sizes = {entry['sha256']: entry['size'] for entry in self.index.values()}
+        return sum(sizes.values())
+
+    def evict(self, max_bytes=None):
+        """Drop least recently used entries until the cache fits max_bytes (also saves the index)"""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        with self._locked():
+            self._merge_index()
+            removed = self._evict(max_bytes) if max_bytes is not None else 0
+            self._write_index()
+        return removed
+
+    def _evict(self, max_bytes):
+        removed = 0
+        total = self.total_bytes()
+        by_age = sorted(self.index.items(), key=lambda item: item[1]['last_access'])
+        for key, entry in by_age:
+            if total <= max_bytes:
+                break
+            del self.index[key]
+            removed += 1
+            if all(other['sha256'] != entry['sha256'] for other in self.index.values()):
+                total -= entry['size']
+
+        # Remove blobs no longer referenced by any key
+        referenced = {entry['sha256'] for entry in self.index.values()}
+        objects_dir = os.path.join(self.root, 'objects')
+        if os.path.isdir(objects_dir):
+            for dirpath, _, filenames in os.walk(objects_dir):
+                for filename in filenames:
+                    if filename.endswith('.gz') and filename[:-3] not in referenced:
+                        os.remove(os.path.join(dirpath, filename))
+
+        self.evictions += removed
+        return removed
+
+    def stats(self):
+        return {
+            'entries': len(self.index),
+            'closed_weeks': sum(1 for entry in self.index.values() if entry['closed']),
+            'bytes': self.total_bytes(),
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'stale': self.stale,
+            'evictions': self.evictions,
+        }
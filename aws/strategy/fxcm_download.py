@@ -0,0 +1,204 @@
+"""
+Concurrent, retrying downloader for FXCM weekly candle files.
+
+Files live at {base_url}{periodicity}/{symbol}/{year}/{week}.csv.gz. Weeks are
+fetched by a bounded thread pool; each worker thread keeps its own
+keep-alive HTTP(S) connection, requests to a host are spaced by a shared
+rate limiter, and transient failures (connection errors, 429 and 5xx) are
+retried with exponential backoff. A week whose payload is not valid gzip
+(a truncated transfer) is retried the same way. A 404 means the week does
+not exist (yet) and is returned as None, as are other permanent HTTP errors
+and weeks still failing after the last retry, so they are never cached.
+"""
+
+import gzip
+import http.client
+import random
+import socket
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+TRANSIENT_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    """Thread-safe per-host limiter spacing requests at most `rate` per second"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self.lock = threading.Lock()
+        self.next_slot = {}
+
+    def wait(self, host):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class TransientError(Exception):
+    """Raised for failures worth retrying"""
+
+
+def _gunzip(data):
+    """gzip.decompress, with a corrupt or truncated payload raised as TransientError"""
+    try:
+        return gzip.decompress(data)
+    except (gzip.BadGzipFile, EOFError, zlib.error) as e:
+        raise TransientError(f"bad gzip payload: {e}")
+
+
+class WeekDownloader:
+    def __init__(self, base_url, headers=None, max_workers=8, rate_limit=4.0,
+                 max_retries=4, backoff=0.5, max_backoff=8.0, timeout=30, url_suffix='.csv.gz'):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme or 'https'
+        self.host = parts.hostname
+        self.port = parts.port
+        self.prefix = parts.path if parts.path.endswith('/') else parts.path + '/'
+        self.url_suffix = url_suffix
+        self.headers = dict(headers or {})
+        self.max_workers = max_workers
+        self.limiter = RateLimiter(rate_limit)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.local = threading.local()
+        self.stats_lock = threading.Lock()
+        self.stats = {'requests': 0, 'retries': 0, 'connections': 0, 'bytes': 0,
+                      'not_found': 0, 'failed': 0}
+
+    def _count(self, key, amount=1):
+        with self.stats_lock:
+            self.stats[key] += amount
+
+    def week_path(self, symbol, periodicity, year, week):
+        return f"{self.prefix}{periodicity}/{symbol}/{year}/{week}{self.url_suffix}"
+
+    def _connection(self):
+        """Per-thread keep-alive connection, opened lazily"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            cls = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+            conn = cls(self.host, self.port, timeout=self.timeout)
+            self.local.conn = conn
+            self._count('connections')
+        return conn
+
+    def _drop_connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self.local.conn = None
+
+    def _request(self, path):
+        """Single GET on the thread's connection; returns (status, body, headers)"""
+        self.limiter.wait(self.host)
+        self._count('requests')
+        conn = self._connection()
+        try:
+            conn.request('GET', path, headers=self.headers)
+            response = conn.getresponse()
+            body = response.read()
+        except (http.client.HTTPException, socket.timeout, ConnectionError, OSError) as e:
+            self._drop_connection()
+            raise TransientError(str(e) or type(e).__name__)
+
+        if response.will_close:
+            self._drop_connection()
+        if response.getheader('Content-Encoding', '').lower() == 'gzip':
+            body = _gunzip(body)
+        return response.status, body, response
+
+    def _retry_delay(self, attempt, response=None):
+        retry_after = response.getheader('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.max_backoff)
+        delay = min(self.backoff * (2 ** attempt), self.max_backoff)
+        return delay * (0.5 + random.random() / 2)  # jitter
+
+    def fetch(self, path, validate=None):
+        """
+        GET a path with retries; returns (status, body), body is None unless
+        status is 200. validate(body) may raise TransientError to have a 200
+        response retried.
+        """
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self._count('retries')
+            retry = attempt < self.max_retries
+            response = None
+            try:
+                status, body, response = self._request(path)
+                if status == 200 and validate is not None:
+                    validate(body)
+            except TransientError as e:
+                last_error = e
+                if retry:
+                    time.sleep(self._retry_delay(attempt, response))
+                continue
+
+            if status == 200:
+                self._count('bytes', len(body))
+                return status, body
+            if status in TRANSIENT_STATUS:
+                last_error = TransientError(f"HTTP Error {status}")
+                if retry:
+                    time.sleep(self._retry_delay(attempt, response))
+                continue
+            return status, None
+
+        raise TransientError(f"giving up after {self.max_retries + 1} attempts: {last_error}")
+
+    def fetch_week(self, symbol, periodicity, year, week):
+        """Compressed bytes for one week (checked to decompress), or None if it is missing/unavailable"""
+        try:
+            status, body = self.fetch(self.week_path(symbol, periodicity, year, week), validate=_gunzip)
+        except TransientError as e:
+            self._count('failed')
+            print(f"Week {week}/{year}: ✗ Error: {e}")
+            return None
+
+        if status == 200:
+            return body
+        if status == 404:
+            self._count('not_found')
+            print(f"Week {week}/{year}: ⚠ Not found (may not exist yet)")
+        elif status == 403:
+            self._count('failed')
+            print(f"Week {week}/{year}: ✗ Access forbidden")
+        else:
+            self._count('failed')
+            print(f"Week {week}/{year}: ✗ HTTP Error {status}")
+        return None
+
+    def fetch_weeks(self, symbol, periodicity, weeks):
+        """Fetch many (year, week) pairs concurrently; returns {(year, week): bytes or None}"""
+        weeks = list(weeks)
+        total = len(weeks)
+        done = [0]
+        done_lock = threading.Lock()
+
+        def task(year_week):
+            year, week = year_week
+            data = self.fetch_week(symbol, periodicity, year, week)
+            with done_lock:
+                done[0] += 1
+                if data is not None:
+                    print(f"[{done[0]:2d}/{total}] Week {week}/{year} ✓ {len(data)} bytes")
+            return year_week, data
+
+        workers = max(1, min(self.max_workers, total))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = dict(pool.map(task, weeks))
+        return {yw: results[yw] for yw in weeks}
@@ -0,0 +1,318 @@
+"""
+Streaming parser for FXCM weekly gz candle files.
+
+Each week is decompressed and parsed straight into typed column arrays
+(datetime64 DateTime, float64 prices) and only those arrays are kept. At the
+end each column is concatenated once and its week parts released before the
+next column, and the frame wraps the concatenated arrays without copying, so
+peak memory stays close to the size of the final frame (plus one column).
+Optionally the cleaned rows are streamed to a CSV file on the way through.
+
+Run this module directly for a parse-throughput benchmark:
+    python fxcm_parser.py [weeks]
+"""
+
+import gzip
+import sys
+import time
+import tracemalloc
+import zlib
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+FXCM_DATETIME_FORMAT = '%m/%d/%Y %H:%M:%S.%f'
+HEADER_PREFIXES = ('DateTime', 'Timestamp')
+UNREADABLE_WEEK = (gzip.BadGzipFile, EOFError, zlib.error, UnicodeDecodeError)
+
+
+def _days_from_civil(year, month, day):
+    """Vectorized days since 1970-01-01 for proleptic Gregorian dates"""
+    year = year - (month <= 2)
+    era = np.floor_divide(year, 400)
+    yoe = year - era * 400
+    mp = (month + 9) % 12
+    doy = (153 * mp + 2) // 5 + day - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+
+def _parse_fixed_bytes(b):
+    """datetime64[ns] from an (n, 23) uint8 matrix of 'MM/DD/YYYY HH:MM:SS.fff' rows, None if any row doesn't match"""
+    separators = {2: b'/', 5: b'/', 10: b' ', 13: b':', 16: b':', 19: b'.'}
+    for pos, sep in separators.items():
+        if not (b[:, pos] == ord(sep)).all():
+            return None
+    digit_cols = [i for i in range(23) if i not in separators]
+    digits = b.astype(np.int32) - ord('0')  # int32 for the fields; widened for the nanosecond total
+    if ((digits[:, digit_cols] < 0) | (digits[:, digit_cols] > 9)).any():
+        return None
+
+    month = digits[:, 0] * 10 + digits[:, 1]
+    day = digits[:, 3] * 10 + digits[:, 4]
+    year = digits[:, 6] * 1000 + digits[:, 7] * 100 + digits[:, 8] * 10 + digits[:, 9]
+    hour = digits[:, 11] * 10 + digits[:, 12]
+    minute = digits[:, 14] * 10 + digits[:, 15]
+    second = digits[:, 17] * 10 + digits[:, 18]
+    millis = digits[:, 20] * 100 + digits[:, 21] * 10 + digits[:, 22]
+    if ((month < 1) | (month > 12) | (day < 1) | (day > 31) | (hour > 23) | (minute > 59) | (second > 60)).any():
+        return None
+
+    days = _days_from_civil(year, month, day).astype(np.int64)
+    seconds = days * 86400 + (hour * 3600 + minute * 60 + second)
+    return (seconds * 1_000_000_000 + millis.astype(np.int64) * 1_000_000).view('datetime64[ns]')
+
+
+def parse_fixed_datetimes(values):
+    """
+    Parse 'MM/DD/YYYY HH:MM:SS.fff' strings by byte position.
+
+    Returns a datetime64[ns] array, or None if any value does not match the
+    fixed-width layout.
+    """
+    raw = np.asarray(values, dtype='S')
+    if raw.size == 0 or raw.dtype.itemsize != 23:
+        return None
+    return _parse_fixed_bytes(raw.view(np.uint8).reshape(-1, 23))
+
+
+def leading_datetimes(raw):
+    """
+    Fixed-width timestamps at the start of every data line of a decompressed
+    week, read straight from the bytes (lines not starting with a digit, such
+    as headers and blank lines, are skipped). None unless every data line
+    starts with a 23-byte timestamp followed by a comma.
+    """
+    buf = np.frombuffer(raw, dtype=np.uint8)
+    starts = np.concatenate([[0], np.flatnonzero(buf == ord('\n')) + 1])
+    starts = starts[starts < len(buf)]
+    first = buf[starts]
+    starts = starts[(first >= ord('0')) & (first <= ord('9'))]
+    if not len(starts) or starts[-1] + 24 > len(buf) or not (buf[starts + 23] == ord(',')).all():
+        return None
+    return _parse_fixed_bytes(buf[starts[:, None] + np.arange(23)])
+
+
+def parse_datetimes(values):
+    """Parse FXCM timestamps: fixed-width fast path, then explicit format, then inference"""
+    parsed = parse_fixed_datetimes(values)
+    if parsed is not None:
+        return pd.DatetimeIndex(parsed)
+    try:
+        return pd.to_datetime(values, format=FXCM_DATETIME_FORMAT)
+    except (ValueError, TypeError):
+        return pd.to_datetime(values)
+
+
+def clean_lines(text):
+    """Yield stripped, non-blank data lines (header lines removed)"""
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith(HEADER_PREFIXES):
+            yield line
+
+
+def _price_arrays(frame, names):
+    """{name: float64 array} for a read_csv frame's columns, each in its own buffer"""
+    arrays = {}
+    for name, col in zip(names, frame.columns):
+        values = pd.to_numeric(frame[col], errors='coerce').to_numpy(dtype=np.float64)
+        # A row of the week's 2-D price block would keep the whole block alive
+        arrays[name] = values.copy() if values.base is not None else values
+    return arrays
+
+
+def _parse_clean_week(raw, columns=None):
+    """
+    Fast path for a well-formed week: timestamps taken by byte position
+    (leading_datetimes) and only the price columns converted by read_csv.
+    Returns (arrays, header_line), or None to fall back to the general parse.
+    """
+    end = raw.find(b'\n')
+    if end < 0:
+        return None
+    names = [c.strip() for c in raw[:end].decode('utf-8').split(',')]
+    if not names[0].startswith(HEADER_PREFIXES) or len(names) < 2:
+        return None
+    times = leading_datetimes(raw)
+    if times is None:
+        return None
+    frame = pd.read_csv(BytesIO(raw), usecols=range(1, len(names)), skip_blank_lines=True)
+    if len(frame) != len(times) or not all(pd.api.types.is_numeric_dtype(frame[c]) for c in frame.columns):
+        return None
+
+    header = ','.join(names)
+    if columns is not None:
+        names = list(columns[:len(names)])
+    arrays = {names[0]: times}
+    arrays.update(_price_arrays(frame, names[1:]))
+    return arrays, header
+
+
+def parse_week(compressed, columns=None):
+    """
+    Parse one compressed week into ({column: array}, header_line, raw_text).
+
+    columns forces the output column names (positionally), so weeks with a
+    'Timestamp' header line up with weeks using 'DateTime'.
+    """
+    raw = gzip.decompress(compressed)
+    if not raw.strip():
+        return None, None, raw
+
+    fast = _parse_clean_week(raw, columns)
+    if fast is not None:
+        return fast[0], fast[1], raw
+
+    frame = pd.read_csv(BytesIO(raw), skip_blank_lines=True)
+    if frame.empty:
+        return None, None, raw
+    header = ','.join(str(c).strip() for c in frame.columns)
+    if columns is not None:
+        frame.columns = columns[:len(frame.columns)]
+    else:
+        frame.columns = [str(c).strip() for c in frame.columns]
+
+    time_col = frame.columns[0]
+    # Repeated header rows turn the price columns into strings; drop them
+    if not all(pd.api.types.is_numeric_dtype(frame[col]) for col in frame.columns[1:]):
+        frame = frame[~frame[time_col].astype(str).str.strip().str.startswith(HEADER_PREFIXES)]
+    frame = frame.dropna(how='all')
+
+    arrays = {time_col: parse_datetimes(frame[time_col]).to_numpy()}
+    arrays.update(_price_arrays(frame[frame.columns[1:]], frame.columns[1:]))
+    return arrays, header, raw
+
+
+def parse_weeks(compressed_weeks, csv_file=None):
+    """
+    Parse an iterable of compressed week files into one DataFrame.
+
+    Each week's typed column arrays are kept; at the end every column is
+    concatenated once and its week parts freed before the next column, and
+    the frame is built on those arrays without copying (one block per
+    column). Weeks that don't decompress or decode are skipped with a
+    warning. If csv_file is given, the cleaned rows (single header, no blank
+    lines) are streamed to it.
+    """
+    if not isinstance(compressed_weeks, (list, tuple)):
+        compressed_weeks = list(compressed_weeks)
+
+    columns = None
+    parts = None
+    out = None
+    try:
+        for number, compressed in enumerate(compressed_weeks, 1):
+            if compressed is None:
+                continue
+            try:
+                arrays, header, raw = parse_week(compressed, columns)
+                text = raw.decode('utf-8') if csv_file and arrays is not None else None
+            except UNREADABLE_WEEK as e:
+                print(f"⚠ Skipping unreadable week {number}/{len(compressed_weeks)}: {type(e).__name__}: {e}")
+                continue
+            if arrays is None:
+                continue
+            if columns is None:
+                columns = list(arrays)
+                parts = {col: [] for col in columns}
+                if csv_file:
+                    out = open(csv_file, 'w', encoding='utf-8')
+                    out.write(header)
+            if out is not None:
+                for line in clean_lines(text):
+                    out.write('\n')
+                    out.write(line)
+            del raw, text
+
+            for col in columns:
+                parts[col].append(arrays[col])
+            del arrays
+    finally:
+        if out is not None:
+            out.close()
+
+    if columns is None:
+        return None
+
+    data = {}
+    for col in columns:
+        data[col] = np.concatenate(parts[col]) if len(parts[col]) > 1 else parts[col][0]
+        del parts[col]  # Free this column's week parts before concatenating the next
+    return pd.DataFrame(data, copy=False)
+
+
+def parse_weeks_legacy(compressed_weeks):
+    """Original string-join parse path, kept for benchmarking"""
+    from io import StringIO
+    all_data = [gzip.decompress(c).decode('utf-8') for c in compressed_weeks if c is not None]
+    lines = ''.join(all_data).split('\n')
+    cleaned_lines = []
+    header_added = False
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith(HEADER_PREFIXES):
+            if not header_added:
+                cleaned_lines.append(line)
+                header_added = True
+            continue
+        cleaned_lines.append(line)
+    return pd.read_csv(StringIO('\n'.join(cleaned_lines)))
+
+
+def synthetic_week(year, week, seed=0):
+    """One week of m1 bid/ask candles in FXCM's CSV format, gzip-compressed"""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp.fromisocalendar(year, week, 1) - pd.Timedelta(hours=2)
+    times = pd.date_range(start, periods=5 * 1440, freq='1min')
+    mid = 1.08 + np.cumsum(rng.normal(0, 0.0001, len(times)))
+    bid_open = np.round(mid, 5)
+    bid_close = np.round(mid + rng.normal(0, 0.00003, len(times)), 5)
+    bid_high = np.round(np.maximum(bid_open, bid_close) + 0.00005, 5)
+    bid_low = np.round(np.minimum(bid_open, bid_close) - 0.00005, 5)
+    frame = pd.DataFrame({
+        'DateTime': times.strftime('%m/%d/%Y %H:%M:%S.000'),
+        'BidOpen': bid_open, 'BidHigh': bid_high, 'BidLow': bid_low, 'BidClose': bid_close,
+        'AskOpen': bid_open + 0.00008, 'AskHigh': bid_high + 0.00008,
+        'AskLow': bid_low + 0.00008, 'AskClose': bid_close + 0.00008,
+    })
+    return gzip.compress(frame.to_csv(index=False, float_format='%.5f').encode('utf-8'))
+
+
+def benchmark_parse(n_weeks=26):
+    """Compare streaming vs legacy parse throughput (rows/s) and peak traced memory"""
+    weeks = [synthetic_week(2025, w, seed=w) for w in range(1, n_weeks + 1)]
+    results = {}
+    for name, parse in (('streaming', parse_weeks), ('legacy', parse_weeks_legacy)):
+        # Timing and memory are measured in separate runs; tracing slows allocation down
+        start = time.perf_counter()
+        df = parse(weeks)
+        elapsed = time.perf_counter() - start
+        frame_bytes = df.memory_usage(deep=True).sum()
+        del df
+
+        tracemalloc.start()
+        df = parse(weeks)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = {
+            'rows': len(df),
+            'seconds': elapsed,
+            'rows_per_s': len(df) / elapsed,
+            'peak_mb': peak / 1024 / 1024,
+            'frame_mb': frame_bytes / 1024 / 1024,
+        }
+        del df
+
+    print(f"📊 PARSE BENCHMARK ({n_weeks} weeks of m1 bid/ask)")
+    for name, r in results.items():
+        print(f"   {name:<10} {r['rows']:>9,} rows  {r['seconds']:6.2f}s  {r['rows_per_s']:>12,.0f} rows/s  "
+              f"peak {r['peak_mb']:7.1f} MB  frame {r['frame_mb']:6.1f} MB")
+    return results
+
+
+if __name__ == "__main__":
+    benchmark_parse(int(sys.argv[1]) if len(sys.argv) > 1 else 26)
@@ -0,0 +1,111 @@
+"""
+Local stand-in for the FXCM candle server, for offline runs of the downloader.
+
+Serves gzip week files from memory over HTTP/1.1 keep-alive at
+/{periodicity}/{symbol}/{year}/{week}.csv.gz. Unknown weeks return 404, and
+individual paths can be told to fail a number of times (503 or dropped
+connection) before succeeding, so retry behavior can be exercised.
+
+    with StubCandleServer() as server:
+        server.add_week('EURUSD', 'm1', 2025, 3, csv_text)
+        downloader = WeekDownloader(server.base_url)
+"""
+
+import gzip
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        self.server.stub.record('connections')
+
+    def do_GET(self):
+        stub = self.server.stub
+        stub.record('requests')
+        if stub.latency:
+            threading.Event().wait(stub.latency)
+
+        failure = stub.take_failure(self.path)
+        if failure == 'drop':
+            self.close_connection = True
+            self.connection.close()
+            return
+        if failure is not None:
+            self._reply(failure, b'')
+            return
+
+        body = stub.files.get(self.path)
+        if body is None:
+            self._reply(404, b'')
+        else:
+            self._reply(200, body, 'application/x-gzip')
+
+    def _reply(self, status, body, content_type='text/plain'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StubCandleServer:
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0):
+        self.files = {}
+        self.failures = {}
+        self.latency = latency
+        self.counts = {'requests': 0, 'connections': 0}
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.stub = self
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def record(self, key):
+        with self.lock:
+            self.counts[key] += 1
+
+    def add_file(self, path, payload):
+        """Serve raw (already compressed) bytes at path"""
+        self.files['/' + path.lstrip('/')] = payload
+
+    def add_week(self, symbol, periodicity, year, week, csv_text):
+        """Serve csv_text gzip-compressed as one FXCM week file"""
+        self.add_file(f"{periodicity}/{symbol}/{year}/{week}.csv.gz", gzip.compress(csv_text.encode('utf-8')))
+
+    def fail(self, path, times, mode=503):
+        """Make the next `times` requests for path fail with an HTTP status or 'drop'"""
+        self.failures['/' + path.lstrip('/')] = [mode] * times
+
+    def take_failure(self, path):
+        with self.lock:
+            pending = self.failures.get(path)
+            if pending:
+                return pending.pop()
+        return None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
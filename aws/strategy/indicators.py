@@ -0,0 +1,334 @@
+"""
+Incremental EMA / MACD / crossover indicators.
+
+Each indicator keeps O(1) state and can be advanced one bar at a time
+(update) or by a batch of bars (update_many), and its state can be saved and
+restored (state / from_state) so a live process can pick up where it left
+off. The recurrences mirror pandas' ewm().mean() step for step, so the
+output is bit-identical to the batch versions:
+
+    style='pandas'  ewm(span=n).mean()                         (fxcm.py)
+    style='ta'      ewm(span=n, min_periods=n, adjust=False)   (ta.trend.MACD)
+
+Run this module directly to check both styles against their batch versions:
+    python indicators.py [rows]
+"""
+
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    njit = None
+    NUMBA_AVAILABLE = False
+
+MACD_STYLES = ('pandas', 'ta')
+
+MACDValue = namedtuple('MACDValue', ['macd', 'signal', 'hist', 'buy', 'sell'])
+
+
+def _ewm_kernel(values, out, weighted, old_wt, nobs, old_wt_factor, new_wt, adjust, min_periods):
+    """pandas' ewm mean recurrence (ignore_na=False); returns the updated (weighted, old_wt, nobs)"""
+    nan = float('nan')
+    for i in range(len(values)):
+        cur = values[i]
+        is_observation = cur == cur
+        if is_observation:
+            nobs += 1
+        if weighted == weighted:
+            old_wt *= old_wt_factor
+            if is_observation:
+                # Same guard as pandas: a constant series stays exactly constant
+                if weighted != cur:
+                    weighted = old_wt * weighted + new_wt * cur
+                    weighted /= (old_wt + new_wt)
+                if adjust:
+                    old_wt += new_wt
+                else:
+                    old_wt = 1.0
+        elif is_observation:
+            weighted = cur
+        out[i] = weighted if nobs >= min_periods else nan
+    return weighted, old_wt, nobs
+
+
+if NUMBA_AVAILABLE:
+    _compiled_ewm = njit(cache=True, nogil=True)(_ewm_kernel)
+else:
+    _compiled_ewm = None
+
+
+class EMA:
+    """Exponential moving average with pandas ewm(span=...) semantics"""
+
+    def __init__(self, span, adjust=True, min_periods=0):
+        self.span = span
+        self.adjust = adjust
+        self.min_periods = min_periods
+        # Same derivation as pandas: span -> center of mass -> alpha
+        com = (span - 1) / 2.0
+        alpha = 1.0 / (1.0 + com)
+        self._old_wt_factor = 1.0 - alpha
+        self._new_wt = 1.0 if adjust else alpha
+        self._min_periods = max(int(min_periods), 1)
+        self.reset()
+
+    def reset(self):
+        self.weighted = float('nan')
+        self.old_wt = 1.0
+        self.nobs = 0
+
+    @property
+    def value(self):
+        """Current EMA value (NaN until min_periods observations have been seen)"""
+        return self.weighted if self.nobs >= self._min_periods else float('nan')
+
+    def update(self, x):
+        """Advance one bar and return the new value"""
+        out = [0.0]
+        self.weighted, self.old_wt, self.nobs = _ewm_kernel(
+            (float(x),), out, self.weighted, self.old_wt, self.nobs,
+            self._old_wt_factor, self._new_wt, self.adjust, self._min_periods)
+        return out[0]
+
+    def update_many(self, values):
+        """Advance over a batch of bars and return their values as an array"""
+        values = np.ascontiguousarray(values, dtype=np.float64)
+        out = np.empty(len(values), dtype=np.float64)
+        args = (self.weighted, self.old_wt, self.nobs, self._old_wt_factor, self._new_wt,
+                self.adjust, self._min_periods)
+        if _compiled_ewm is not None:
+            state = _compiled_ewm(values, out, *args)
+        else:
+            buf = [0.0] * len(values)
+            state = _ewm_kernel(values.tolist(), buf, *args)
+            out[:] = buf
+        self.weighted, self.old_wt, self.nobs = float(state[0]), float(state[1]), int(state[2])
+        return out
+
+    def prime(self, last_value, n_obs):
+        """
+        Set the state from a batch result instead of replaying the bars.
+
+        last_value is the batch EMA at its final bar and n_obs the number of
+        non-NaN inputs it saw. Only valid when any NaN inputs came before the
+        first observation (true for prices and for MACD lines).
+        """
+        self.reset()
+        self.nobs = int(n_obs)
+        if n_obs == 0:
+            return self
+        self.weighted = float(last_value)
+        if self.adjust:
+            # The weight sum depends only on the observation count; it reaches
+            # a fixed point quickly, so stop replaying once it stops changing
+            for _ in range(int(n_obs) - 1):
+                old_wt = self.old_wt * self._old_wt_factor + self._new_wt
+                if old_wt == self.old_wt:
+                    break
+                self.old_wt = old_wt
+        return self
+
+    def state(self):
+        return {'span': self.span, 'adjust': self.adjust, 'min_periods': self.min_periods,
+                'weighted': self.weighted, 'old_wt': self.old_wt, 'nobs': self.nobs}
+
+    @classmethod
+    def from_state(cls, state):
+        ema = cls(state['span'], state['adjust'], state['min_periods'])
+        ema.weighted, ema.old_wt, ema.nobs = state['weighted'], state['old_wt'], state['nobs']
+        return ema
+
+
+class Crossover:
+    """Cross-up / cross-down of line a over line b, matching the shift(1) comparisons in fxcm.py"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.prev_a = float('nan')
+        self.prev_b = float('nan')
+
+    def update(self, a, b):
+        """Return (crossed_up, crossed_down) for one bar"""
+        up = a > b and self.prev_a <= self.prev_b
+        down = a < b and self.prev_a >= self.prev_b
+        self.prev_a, self.prev_b = float(a), float(b)
+        return up, down
+
+    def update_many(self, a, b):
+        """Return (crossed_up, crossed_down) boolean arrays for a batch"""
+        a = np.asarray(a, dtype=np.float64)
+        b = np.asarray(b, dtype=np.float64)
+        if len(a) == 0:
+            return np.zeros(0, dtype=bool), np.zeros(0, dtype=bool)
+        prev_a = np.concatenate(([self.prev_a], a[:-1]))
+        prev_b = np.concatenate(([self.prev_b], b[:-1]))
+        up = (a > b) & (prev_a <= prev_b)
+        down = (a < b) & (prev_a >= prev_b)
+        self.prev_a, self.prev_b = float(a[-1]), float(b[-1])
+        return up, down
+
+    def prime(self, last_a, last_b):
+        self.prev_a, self.prev_b = float(last_a), float(last_b)
+        return self
+
+    def state(self):
+        return {'prev_a': self.prev_a, 'prev_b': self.prev_b}
+
+    @classmethod
+    def from_state(cls, state):
+        return cls().prime(state['prev_a'], state['prev_b'])
+
+
+class MACD:
+    """
+    MACD line, signal line, histogram and MACD/signal crossovers.
+
+    style='pandas' reproduces CompleteFXSystem.calculate_macd, style='ta'
+    reproduces ta.trend.MACD as used by macd_backtest.compute_macd (NaN until
+    each EMA has seen its full window).
+    """
+
+    def __init__(self, fast=12, slow=26, signal=9, style='pandas'):
+        if style not in MACD_STYLES:
+            raise ValueError(f"Unknown MACD style {style!r}; expected one of {MACD_STYLES}")
+        self.fast, self.slow, self.signal, self.style = fast, slow, signal, style
+        adjust = style == 'pandas'
+        self.ema_fast = EMA(fast, adjust, 0 if adjust else fast)
+        self.ema_slow = EMA(slow, adjust, 0 if adjust else slow)
+        self.ema_signal = EMA(signal, adjust, 0 if adjust else signal)
+        self.cross = Crossover()
+
+    def reset(self):
+        for part in (self.ema_fast, self.ema_slow, self.ema_signal, self.cross):
+            part.reset()
+
+    def update(self, close):
+        """Advance one bar; returns a MACDValue"""
+        macd = self.ema_fast.update(close) - self.ema_slow.update(close)
+        signal = self.ema_signal.update(macd)
+        buy, sell = self.cross.update(macd, signal)
+        return MACDValue(macd, signal, macd - signal, buy, sell)
+
+    def update_many(self, close):
+        """Advance over a batch; returns a dict of arrays keyed like MACDValue's fields"""
+        close = np.asarray(close, dtype=np.float64)
+        macd = self.ema_fast.update_many(close) - self.ema_slow.update_many(close)
+        signal = self.ema_signal.update_many(macd)
+        buy, sell = self.cross.update_many(macd, signal)
+        return {'macd': macd, 'signal': signal, 'hist': macd - signal, 'buy': buy, 'sell': sell}
+
+    def prime(self, ema_fast, ema_slow, signal, n_obs):
+        """
+        Continue from batch results: the last fast/slow EMA and signal values
+        and the number of closes they were computed from.
+        """
+        macd = ema_fast - ema_slow
+        self.ema_fast.prime(ema_fast, n_obs)
+        self.ema_slow.prime(ema_slow, n_obs)
+        if self.style == 'pandas':
+            signal_obs = n_obs
+        else:
+            # The MACD line is NaN until the slow EMA has a full window
+            signal_obs = max(n_obs - self.slow + 1, 0)
+        self.ema_signal.prime(signal, signal_obs)
+        self.cross.prime(macd, signal)
+        return self
+
+    def state(self):
+        return {'fast': self.fast, 'slow': self.slow, 'signal': self.signal, 'style': self.style,
+                'ema_fast': self.ema_fast.state(), 'ema_slow': self.ema_slow.state(),
+                'ema_signal': self.ema_signal.state(), 'cross': self.cross.state()}
+
+    @classmethod
+    def from_state(cls, state):
+        macd = cls(state['fast'], state['slow'], state['signal'], state['style'])
+        macd.ema_fast = EMA.from_state(state['ema_fast'])
+        macd.ema_slow = EMA.from_state(state['ema_slow'])
+        macd.ema_signal = EMA.from_state(state['ema_signal'])
+        macd.cross = Crossover.from_state(state['cross'])
+        return macd
+
+
+# --------------------------- SELF-CHECK ---------------------------
+def batch_macd(close, fast=12, slow=26, signal=9, style='pandas'):
+    """Reference batch MACD (pandas ewm, or ta.trend.MACD for style='ta')"""
+    close = pd.Series(close)
+    if style == 'ta':
+        from ta.trend import MACD as TAMACD
+        ind = TAMACD(close=close, window_slow=slow, window_fast=fast, window_sign=signal)
+        macd, macd_signal = ind.macd(), ind.macd_signal()
+    else:
+        macd = close.ewm(span=fast).mean() - close.ewm(span=slow).mean()
+        macd_signal = macd.ewm(span=signal).mean()
+    buy = (macd > macd_signal) & (macd.shift(1) <= macd_signal.shift(1))
+    sell = (macd < macd_signal) & (macd.shift(1) >= macd_signal.shift(1))
+    return {'macd': macd.to_numpy(), 'signal': macd_signal.to_numpy(),
+            'hist': (macd - macd_signal).to_numpy(), 'buy': buy.to_numpy(), 'sell': sell.to_numpy()}
+
+
+def _identical(a, b):
+    a, b = np.asarray(a), np.asarray(b)
+    if a.dtype.kind == 'f':
+        return a.shape == b.shape and np.array_equal(a, b, equal_nan=True)
+    return np.array_equal(a, b)
+
+
+def check_against_batch(n_rows=100_000, seed=0):
+    """Compare bar-by-bar, chunked and primed runs with the batch versions; returns {style: bool}"""
+    rng = np.random.default_rng(seed)
+    close = np.round(1.08 + np.cumsum(rng.normal(0, 0.0001, n_rows)), 5)
+    split = n_rows // 2
+    tail = min(1000, split)
+    results = {}
+    for style in MACD_STYLES:
+        try:
+            expected = batch_macd(close, style=style)
+        except ImportError:
+            print(f"   {style:<7} skipped (ta not installed)")
+            continue
+
+        MACD(style=style).update_many(close[:10])  # JIT warm-up
+        start = time.perf_counter()
+        batch = MACD(style=style).update_many(close)
+        batch_s = time.perf_counter() - start
+
+        # Two chunks with a checkpoint round-trip in between
+        first = MACD(style=style)
+        part1 = first.update_many(close[:split])
+        second = MACD.from_state(first.state())
+        part2 = second.update_many(close[split:])
+        chunked = {k: np.concatenate([part1[k], part2[k]]) for k in part1}
+
+        # Prime from a batch run over the head, then step bar by bar over the tail
+        head_close = pd.Series(close[:-tail])
+        adjust = style == 'pandas'
+        single = MACD(style=style).prime(
+            head_close.ewm(span=12, adjust=adjust).mean().iloc[-1],
+            head_close.ewm(span=26, adjust=adjust).mean().iloc[-1],
+            batch_macd(close[:-tail], style=style)['signal'][-1], n_rows - tail)
+        start = time.perf_counter()
+        rows = [single.update(x) for x in close[-tail:].tolist()]
+        per_bar_us = (time.perf_counter() - start) / tail * 1e6
+        stepped = {k: np.array([getattr(r, k) for r in rows]) for k in MACDValue._fields}
+
+        ok = all(_identical(batch[k], expected[k]) and _identical(chunked[k], expected[k])
+                 and _identical(stepped[k], expected[k][-tail:]) for k in expected)
+        results[style] = ok
+        print(f"   {style:<7} {'identical' if ok else 'MISMATCH'}  batch {n_rows / batch_s:>12,.0f} bars/s  "
+              f"update {per_bar_us:6.1f} us/bar")
+    return results
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print(f"📈 INCREMENTAL MACD CHECK ({rows:,} bars, numba {'on' if NUMBA_AVAILABLE else 'off'})")
+    check_against_batch(rows)
@@ -0,0 +1,248 @@
+"""
+Lightweight per-stage instrumentation for backtest runs.
+
+RunInstrumentation records wall time, CPU time, RSS and rows processed for
+named stages. Stages nest ('backtest/macd'), can be opened with a context
+manager, the @instrumented method decorator or begin()/end() around a loop,
+and cost a few microseconds each, so they stay on all the time. report()
+returns a JSON-ready dict of the run.
+
+SamplingProfiler is the opt-in profiler hook: a daemon thread that samples
+the instrumented thread's Python stack at a fixed interval and aggregates
+collapsed stacks ('outer;inner;leaf count', the flame graph input format).
+"""
+
+import collections
+import contextlib
+import datetime
+import functools
+import json
+import os
+import platform
+import sys
+import threading
+import time
+
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:  # Windows
+    resource = None
+    RESOURCE_AVAILABLE = False
+
+MB = 1024 * 1024
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def current_rss():
+    """Resident set size in bytes, or None where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss():
+    """Peak resident set size of the process so far in bytes, or None"""
+    if not RESOURCE_AVAILABLE:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # Linux reports KiB
+
+
+def _mb(value):
+    return None if value is None else round(value / MB, 2)
+
+
+class SamplingProfiler:
+    def __init__(self, interval=0.005, thread_id=None, max_depth=64):
+        """Sample thread_id (default: the calling thread) every `interval` seconds"""
+        self.interval = interval
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.max_depth = max_depth
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        stack = []
+        while frame is not None and len(stack) < self.max_depth:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        if stack:
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        return self
+
+    def top(self, n=20):
+        """(function, self share, total share) for the n functions with the most self samples"""
+        own = collections.Counter()
+        total = collections.Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')
+            own[frames[-1]] += count
+            for name in set(frames):
+                total[name] += count
+        samples = max(self.samples, 1)
+        return [(name, own[name] / samples, total[name] / samples) for name, _ in own.most_common(n)]
+
+    def summary(self, n=20):
+        return {
+            'interval_s': self.interval,
+            'samples': self.samples,
+            'top': [{'function': name, 'self': round(own, 4), 'total': round(total, 4)}
+                    for name, own, total in self.top(n)],
+        }
+
+    def write_collapsed(self, path):
+        """Collapsed stacks, one 'frame;frame;frame count' line each (flamegraph.pl / speedscope input)"""
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+class RunInstrumentation:
+    def __init__(self):
+        self.started = datetime.datetime.now()
+        self._wall0 = time.perf_counter()
+        self._cpu0 = time.process_time()
+        self.stages = []
+        self._open = []
+        self.profiler = None
+
+    def begin(self, name, rows=None):
+        """Open a stage nested in the currently open one; returns its record"""
+        path = '/'.join([r['name'] for r in self._open[-1:]] + [name])
+        record = {
+            'name': path,
+            'depth': len(self._open),
+            'rows': rows,
+            '_wall': time.perf_counter(),
+            '_cpu': time.process_time(),
+            '_peak': peak_rss(),
+        }
+        self.stages.append(record)
+        self._open.append(record)
+        return record
+
+    def end(self, record=None, rows=None):
+        """Close record (default: the innermost open stage) and any stage still open inside it"""
+        if record is None:
+            record = self._open[-1]
+        while self._open:
+            inner = self._open.pop()
+            if inner is not record:
+                inner['aborted'] = True
+            self._close(inner)
+            if inner is record:
+                break
+        if rows is not None:
+            record['rows'] = rows
+        if record['rows'] is not None and record['wall_s'] > 0:
+            record['rows_per_s'] = round(record['rows'] / record['wall_s'], 1)
+        return record
+
+    @staticmethod
+    def _close(record):
+        peak_before = record.pop('_peak')
+        peak_after = peak_rss()
+        record['wall_s'] = round(time.perf_counter() - record.pop('_wall'), 6)
+        record['cpu_s'] = round(time.process_time() - record.pop('_cpu'), 6)
+        record['rss_mb'] = _mb(current_rss())
+        record['peak_rss_mb'] = _mb(peak_after)
+        # Non-zero only if the process reached a new high-water mark during the stage
+        record['peak_rss_growth_mb'] = (_mb(peak_after - peak_before)
+                                        if peak_after is not None and peak_before is not None else None)
+
+    @contextlib.contextmanager
+    def stage(self, name, rows=None):
+        """Context manager around one stage; yields the record so rows can be set inside"""
+        record = self.begin(name, rows)
+        try:
+            yield record
+        finally:
+            if any(r is record for r in self._open):
+                self.end(record)
+
+    # --------------------------- PROFILER HOOK ---------------------------
+    def start_profiler(self, interval=0.005):
+        """Start sampling the calling thread's stack every `interval` seconds"""
+        self.profiler = SamplingProfiler(interval).start()
+        return self.profiler
+
+    def stop_profiler(self):
+        if self.profiler is not None:
+            self.profiler.stop()
+        return self.profiler
+
+    # --------------------------- REPORTING ---------------------------
+    def report(self):
+        """JSON-ready run report"""
+        stages = [{k: v for k, v in r.items() if not k.startswith('_')} for r in self.stages]
+        report = {
+            'started': self.started.isoformat(timespec='seconds'),
+            'finished': datetime.datetime.now().isoformat(timespec='seconds'),
+            'wall_s': round(time.perf_counter() - self._wall0, 6),
+            'cpu_s': round(time.process_time() - self._cpu0, 6),
+            'peak_rss_mb': _mb(peak_rss()),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'stages': stages,
+        }
+        if self.profiler is not None:
+            report['profile'] = self.profiler.summary()
+        return report
+
+    def save(self, path, extra=None):
+        """Write report() (plus any extra top-level fields) as JSON"""
+        report = self.report()
+        if extra:
+            report.update(extra)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1, default=str)
+        return path
+
+    def print_summary(self):
+        print("\n⏱️ STAGE TIMINGS")
+        for r in self.stages:
+            if 'wall_s' not in r:
+                continue
+            rows = f"{r['rows']:>12,} rows" if r['rows'] is not None else ' ' * 17
+            peak = f"  peak {r['peak_rss_mb']:,.0f} MB" if r['peak_rss_mb'] is not None else ''
+            print(f"   {'  ' * r['depth']}{r['name'].rsplit('/', 1)[-1]:<{24 - 2 * r['depth']}} "
+                  f"{r['wall_s']:9.3f}s wall {r['cpu_s']:9.3f}s cpu {rows}{peak}")
+
+
+def instrumented(name, rows=None):
+    """Record a method as a stage of self.instrument; rows(self) is evaluated when it returns"""
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.instrument.stage(name) as record:
+                result = method(self, *args, **kwargs)
+                if rows is not None:
+                    record['rows'] = rows(self)
+            return result
+        return wrapper
+    return decorate
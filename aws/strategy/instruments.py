@@ -0,0 +1,22 @@
+"""
+Per-symbol instrument settings for FXCM symbols.
+"""
+
+# Price increment of one pip. JPY crosses quote to 2-3 decimals, metals and
+# indices use their own conventions; everything else is a 4th-decimal pip.
+PIP_SIZE_OVERRIDES = {
+    'XAUUSD': 0.1,
+    'XAGUSD': 0.01,
+}
+DEFAULT_PIP_SIZE = 0.0001
+JPY_PIP_SIZE = 0.01
+
+
+def pip_size(symbol):
+    """Pip size for an FXCM symbol such as 'EURUSD' or 'USDJPY'"""
+    symbol = symbol.upper().replace('/', '')
+    if symbol in PIP_SIZE_OVERRIDES:
+        return PIP_SIZE_OVERRIDES[symbol]
+    if symbol.endswith('JPY'):
+        return JPY_PIP_SIZE
+    return DEFAULT_PIP_SIZE
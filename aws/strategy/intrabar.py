@@ -0,0 +1,187 @@
+"""
+Intra-bar drill-down for exits on bars that touch both TP and SL.
+
+Both backtests test the take-profit level before the stop on every bar, so
+a bar whose range covers both levels is always booked as a win. Which level
+was really hit first is only knowable from finer data. resolve_exits() flags
+those bars and, for just those bars, asks a finer-data source for the
+sub-bars (or ticks) inside the bar and replays them in time order.
+
+The exit bar is the same whichever level was hit first, so only the exit
+reason and price of a flagged trade change; the rest of the backtest is
+unaffected and nothing is loaded when no bar is ambiguous.
+
+Entries fill at the entry bar's close, so only finer bars at or after the
+fill are replayed. A trade that exits on its own entry bar has no finer
+bars after the fill inside that bar; it is booked with the fallback
+(AMBIGUOUS_FALLBACK) rather than decided from prices before the entry.
+
+Sources return (high, low) arrays for [start, end), oldest first:
+    FrameSource  - an in-memory frame of finer bars or ticks
+    StoreSource  - the candle store, loading only the partitions it needs
+    CsvSource    - a Date/Time/High/Low CSV (macd_backtest layout), read on first use
+"""
+
+import numpy as np
+import pandas as pd
+
+from bar_engine import LONG, EXIT_TP, EXIT_SL
+
+AMBIGUITY_MODES = ('off', 'flag', 'resolve')
+FALLBACKS = ('tp', 'sl')  # Exit booked when finer data can't decide: TP (legacy order) or SL (conservative)
+
+# Per-trade status
+AMBIGUOUS_NONE = 0
+AMBIGUOUS_RESOLVED = 1  # Decided from finer data
+AMBIGUOUS_FALLBACK = 2  # No finer data after the fill, or the first finer bar touches both levels too
+
+
+def exit_levels(side, entry_price, tp_dist, sl_dist):
+    """(tp, sl) prices per trade"""
+    side = np.asarray(side)
+    entry_price = np.asarray(entry_price, dtype=np.float64)
+    direction = np.where(side == LONG, 1.0, -1.0)
+    return entry_price + direction * tp_dist, entry_price - direction * sl_dist
+
+
+def touches(side, high, low, tp, sl):
+    """(touches TP, touches SL) for bars against a long or short position's levels"""
+    if side == LONG:
+        return high >= tp, low <= sl
+    return low <= tp, high >= sl
+
+
+def ambiguous_bars(side, bar_high, bar_low, tp, sl):
+    """True for exit bars whose range covers both the TP and the SL level"""
+    side = np.asarray(side)
+    bar_high = np.asarray(bar_high, dtype=np.float64)
+    bar_low = np.asarray(bar_low, dtype=np.float64)
+    long = side == LONG
+    hit_tp = np.where(long, bar_high >= tp, bar_low <= tp)
+    hit_sl = np.where(long, bar_low <= sl, bar_high >= sl)
+    return hit_tp & hit_sl
+
+
+def first_touch(side, high, low, tp, sl):
+    """EXIT_TP / EXIT_SL for the first finer bar touching exactly one level, 0 if undecidable"""
+    hit_tp, hit_sl = touches(side, np.asarray(high), np.asarray(low), tp, sl)
+    either = np.flatnonzero(hit_tp | hit_sl)
+    if not len(either):
+        return 0
+    k = either[0]
+    if hit_tp[k] and hit_sl[k]:
+        return 0
+    return EXIT_TP if hit_tp[k] else EXIT_SL
+
+
+def resolve_exits(side, entry_time, exit_time, bar_high, bar_low, tp, sl, bar_length, source=None,
+                  fallback='tp'):
+    """
+    Decide the exit of every trade whose exit bar touched both levels.
+
+    entry_time and exit_time are the entry and exit bars' open times and
+    bar_length a Timedelta; the entry fills at entry_time + bar_length, and
+    only finer bars from then to the exit bar's close are replayed. Returns
+    (reason, exit_price, status) arrays covering every trade; trades that are
+    not ambiguous keep reason 0 and status AMBIGUOUS_NONE. source may be None
+    (flag only, every ambiguous exit gets the fallback).
+    """
+    if fallback not in FALLBACKS:
+        raise ValueError(f"Unknown fallback {fallback!r} (use one of {FALLBACKS})")
+    side = np.asarray(side)
+    tp = np.asarray(tp, dtype=np.float64)
+    sl = np.asarray(sl, dtype=np.float64)
+    n = len(side)
+    reason = np.zeros(n, dtype=np.int8)
+    status = np.full(n, AMBIGUOUS_NONE, dtype=np.int8)
+    exit_price = np.full(n, np.nan)
+
+    flagged = np.flatnonzero(ambiguous_bars(side, bar_high, bar_low, tp, sl))
+    entry_time = pd.DatetimeIndex(np.asarray(entry_time, dtype='datetime64[ns]'))
+    exit_time = pd.DatetimeIndex(np.asarray(exit_time, dtype='datetime64[ns]'))
+    default = EXIT_TP if fallback == 'tp' else EXIT_SL
+    for k in flagged:
+        decided = 0
+        start = max(exit_time[k], entry_time[k] + bar_length)
+        end = exit_time[k] + bar_length
+        if source is not None and start < end:
+            high, low = source.bars(start, end)
+            decided = first_touch(side[k], high, low, tp[k], sl[k])
+        reason[k] = decided or default
+        status[k] = AMBIGUOUS_RESOLVED if decided else AMBIGUOUS_FALLBACK
+        exit_price[k] = tp[k] if reason[k] == EXIT_TP else sl[k]
+    return reason, exit_price, status
+
+
+class FrameSource:
+    def __init__(self, times, high, low=None):
+        """Finer bars (or ticks: pass one price as high, low=None) in time order"""
+        self.times = np.asarray(times, dtype='datetime64[ns]')
+        self.high = np.asarray(high, dtype=np.float64)
+        self.low = self.high if low is None else np.asarray(low, dtype=np.float64)
+
+    @classmethod
+    def from_frame(cls, df, time_col='DateTime', price='mid'):
+        """Bars or ticks from a frame with High/Low, Bid*/Ask* OHLC or Bid/Ask tick columns"""
+        df = df.sort_values(time_col, kind='mergesort')
+        high, low = _frame_prices(df, price)
+        return cls(df[time_col].to_numpy(), high, low)
+
+    def bars(self, start, end):
+        lo, hi = np.searchsorted(self.times, [np.datetime64(start, 'ns'), np.datetime64(end, 'ns')])
+        return self.high[lo:hi], self.low[lo:hi]
+
+
+def _frame_prices(df, price='mid'):
+    """(high, low) for price 'mid', 'Bid' or 'Ask' from whichever columns the frame has (else High/Low)"""
+    if price == 'mid' and 'BidHigh' in df.columns:
+        return (df['BidHigh'].to_numpy() + df['AskHigh'].to_numpy()) / 2, \
+               (df['BidLow'].to_numpy() + df['AskLow'].to_numpy()) / 2
+    if price == 'mid' and 'Bid' in df.columns:
+        mid = (df['Bid'].to_numpy() + df['Ask'].to_numpy()) / 2
+        return mid, mid
+    if price in ('Bid', 'Ask') and f'{price}High' in df.columns:
+        return df[f'{price}High'].to_numpy(), df[f'{price}Low'].to_numpy()
+    if price in ('Bid', 'Ask') and price in df.columns:
+        return df[price].to_numpy(), df[price].to_numpy()
+    return df['High'].to_numpy(), df['Low'].to_numpy()
+
+
+class StoreSource:
+    def __init__(self, store, symbol, periodicity, price='mid'):
+        """Finer data from a CandleStore (or its root path); each request reads only its own rows"""
+        if isinstance(store, str):
+            from candle_store import CandleStore
+            store = CandleStore(store)
+        self.store = store
+        self.symbol = symbol
+        self.periodicity = periodicity
+        self.price = price
+        self.loads = 0
+
+    def bars(self, start, end):
+        df = self.store.load(self.symbol, self.periodicity, pd.Timestamp(start), pd.Timestamp(end))
+        self.loads += 1
+        if df is None or df.empty:
+            return np.zeros(0), np.zeros(0)
+        return _frame_prices(df, self.price)
+
+
+class CsvSource:
+    def __init__(self, path, date_col='Date', time_col='Time'):
+        """Finer bars from a Date/Time/High/Low CSV, parsed the first time bars() is called"""
+        self.path = path
+        self.date_col = date_col
+        self.time_col = time_col
+        self._frame = None
+
+    def bars(self, start, end):
+        if self._frame is None:
+            df = pd.read_csv(self.path, usecols=[self.date_col, self.time_col, 'High', 'Low'])
+            times = pd.to_datetime(df[self.date_col].astype(str) + " " + df[self.time_col].astype(str),
+                                   errors='coerce')
+            keep = times.notna().to_numpy()
+            self._frame = FrameSource.from_frame(pd.DataFrame({
+                'DateTime': times[keep], 'High': df['High'][keep], 'Low': df['Low'][keep],
+            }))
+        return self._frame.bars(start, end)
@@ -2,6 +2,7 @@ import sys
 import pandas as pd
 import numpy as np
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 from ta.trend import MACD
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
@@ -9,6 +10,11 @@ from datetime import datetime, time
 import warnings
 warnings.filterwarnings('ignore')
 
+import intrabar
+from ohlc_csv import load_ohlc_csv
+from bar_engine import LONG, SHORT, EXIT_TP
+from chart_render import decimate_minmax, panel_pixels
+
 # --------------------------- PARAMETERS ---------------------------
 INPUT_CSV = sys.argv[1] if len(sys.argv) > 1 else "data.csv"
 
@@ -17,6 +23,12 @@ TIME_COL_ONLY = "Time"
 CLOSE_COL = "Close"
 HIGH_COL = "High"
 LOW_COL = "Low"
+DATE_FORMAT = "%Y/%m/%d"  # Explicit Date format (Time is HH:MM:SS)
+
+# Period loaded from the CSV: DATE_FROM <= bar time < DATE_TO (None = unbounded)
+DATE_FROM = "2024-01-01"
+DATE_TO = "2026-01-01"
+CSV_CACHE = True  # Keep the parsed period in a {INPUT_CSV}.cache.npz sidecar for instant reloads
 
 # MACD params
 FAST = 12
@@ -39,9 +51,21 @@ SL = SL_PIPS * PIP
 # How to handle unresolved trades: "exclude", "eod_as_loss", "eod_as_win"
 RESOLVE_UNRESOLVED = "exclude"
 
+# Exit bars touching both TP and SL (booked TP by the scan): "off", "flag" or "resolve"
+AMBIGUOUS_MODE = "off"
+AMBIGUOUS_FALLBACK = "tp"  # Booked when flagged or the finer data can't decide: "tp" or "sl"
+FINE_CSV = None  # Finer Date/Time/High/Low CSV (e.g. m1 for m5 input) read by "resolve"
+
+# Bars scanned per step of the exit search (doubles each step, so far exits cost O(log n) steps)
+EXIT_SCAN_CHUNK = 256
+
 # Plot settings
 PLOT_ENABLED = True
 SHOW_PLOT = True  # Set to False if running headless
+PLOT_DPI = 150
+PLOT_INCHES = (16, 10)
+PLOT_PAGES = None  # None = one chart of the whole period, "month" = one page per month
+PLOT_WORKERS = 1  # Processes rendering month pages
 
 
 # --------------------------- UTILITIES ---------------------------
@@ -69,195 +93,291 @@ def compute_macd(df, close_col=CLOSE_COL):
         return df
 
 
-def get_daily_range(df_day, high_col, low_col):
-    """Get the high and low for the range period (07:00 - 08:29)"""
-    times = df_day["Time"].dt.time
-    range_mask = (times >= pd.to_datetime(RANGE_START).time()) & (times <= pd.to_datetime(RANGE_END).time())
-    range_df = df_day[range_mask].copy()
-    
-    if range_df.empty:
-        return None, None
-    
-    range_high = range_df[high_col].max()
-    range_low = range_df[low_col].min()
-    
-    return range_high, range_low
+def time_of_day(times):
+    """Time since midnight of every timestamp, as timedelta64[ns]"""
+    return (times - times.dt.normalize()).to_numpy()
 
 
-def find_breakout_entry(df_day, range_high, range_low, high_col, low_col, close_col):
-    """Find breakout entry in the trading window (08:30 - 09:00)"""
-    times = df_day["Time"].dt.time
-    window_mask = (times >= pd.to_datetime(WINDOW_START).time()) & (times <= pd.to_datetime(WINDOW_END).time())
-    window_df = df_day[window_mask].copy()
-    
-    if window_df.empty:
-        return None
-    
-    # Look for breakouts in chronological order
-    for idx, row in window_df.iterrows():
-        high = row[high_col]
-        low = row[low_col]
-        close = row[close_col]
-        
-        # High breakout -> SHORT signal
-        if high > range_high:
-            return {
-                'type': 'SHORT',
-                'entry_time': row['Time'],
-                'entry_price': close,  # Use close price for entry
-                'breakout_level': range_high,
-                'trigger': 'high_break'
-            }
-        
-        # Low breakout -> LONG signal  
-        if low < range_low:
-            return {
-                'type': 'LONG',
-                'entry_time': row['Time'],
-                'entry_price': close,  # Use close price for entry
-                'breakout_level': range_low,
-                'trigger': 'low_break'
-            }
-    
-    return None
+def day_offset(value):
+    """'HH:MM[:SS]' as timedelta64[ns] after midnight"""
+    value = str(value)
+    return pd.Timedelta(value if value.count(":") == 2 else value + ":00").to_timedelta64()
+
+
+def session_windows():
+    """(RANGE_START, RANGE_END, WINDOW_START, WINDOW_END) as currently configured"""
+    return RANGE_START, RANGE_END, WINDOW_START, WINDOW_END
+
+
+def breakout_bars(tod, day, n_days, highs, lows, windows):
+    """
+    Range of every day and the bar of its first breakout, from bar arrays
+    (time of day, day code 0..n_days-1, high, low) and the session windows
+    (range_start, range_end, window_start, window_end). Returns days, rows
+    (breakout bar of each of those days), short (high break) and the
+    per-day range_high / range_low arrays (NaN without range bars).
+    """
+    range_start, range_end, window_start, window_end = (day_offset(w) for w in windows)
+    in_range = (tod >= range_start) & (tod <= range_end)
+    in_window = (tod >= window_start) & (tod <= window_end)
+    
+    # Range per day (NaN where a day has no range bars)
+    ranges = pd.DataFrame({"day": day[in_range], "high": highs[in_range], "low": lows[in_range]})
+    ranges = ranges.groupby("day").agg(high=("high", "max"), low=("low", "min"))
+    range_high = np.full(n_days, np.nan)
+    range_low = np.full(n_days, np.nan)
+    range_high[ranges.index] = ranges["high"].to_numpy()
+    range_low[ranges.index] = ranges["low"].to_numpy()
+    has_range = np.zeros(n_days, dtype=bool)
+    has_range[ranges.index] = True
+    
+    # First window bar per day breaking either side
+    high_break = highs > range_high[day]
+    low_break = lows < range_low[day]
+    candidates = np.flatnonzero(in_window & has_range[day] & (high_break | low_break))
+    days, first = np.unique(day[candidates], return_index=True)
+    rows = candidates[first]
+    return {"days": days, "rows": rows, "short": high_break[rows],
+            "range_high": range_high, "range_low": range_low}
+
+
+def find_daily_breakouts(df, high_col, low_col, close_col, windows=None):
+    """
+    Every day's range (RANGE_START - RANGE_END) and its first breakout in the
+    trading window (WINDOW_START - WINDOW_END), in one pass over the frame.
+
+    A bar breaking above the range high is a SHORT signal and one breaking
+    below the range low a LONG signal; a bar doing both counts as a high
+    break. Returns one row per day with a breakout, in date order: date,
+    range_high, range_low, type, entry_time, entry_price, breakout_level,
+    trigger. df must be sorted by Time and have a date_local column.
+    """
+    day, dates = pd.factorize(df["date_local"])
+    found = breakout_bars(time_of_day(df["Time"]), day, len(dates),
+                          df[high_col].to_numpy(dtype=np.float64), df[low_col].to_numpy(dtype=np.float64),
+                          windows or session_windows())
+    days, rows, short = found["days"], found["rows"], found["short"]
+    range_high = found["range_high"][days]
+    range_low = found["range_low"][days]
+    return pd.DataFrame({
+        "date": dates[days],
+        "range_high": range_high,
+        "range_low": range_low,
+        "type": np.where(short, "SHORT", "LONG"),
+        "entry_time": df["Time"].iloc[rows].to_numpy(),
+        "entry_price": df[close_col].iloc[rows].to_numpy(),  # Use close price for entry
+        "breakout_level": np.where(short, range_high, range_low),
+        "trigger": np.where(short, "high_break", "low_break"),
+    })
 
 
-def plot_trades(df, results_df, out_file="trades_plot.png"):
-    """Plot price + MACD with trades marked"""
+def find_exit(highs, lows, start, direction, tp_price, sl_price, chunk=EXIT_SCAN_CHUNK):
+    """
+    (resolution, bar index) of the first bar from `start` on that reaches TP
+    or SL, TP winning a bar that reaches both; ("unresolved", None) if none
+    does. Scans growing chunks of the arrays, so the rest of the data is only
+    read as far as the exit.
+    """
+    n = len(highs)
+    while start < n:
+        end = min(start + chunk, n)
+        high = highs[start:end]
+        low = lows[start:end]
+        if direction == "LONG":
+            hit_tp, hit_sl = high >= tp_price, low <= sl_price
+        else:  # SHORT
+            hit_tp, hit_sl = low <= tp_price, high >= sl_price
+        hit = np.flatnonzero(hit_tp | hit_sl)
+        if len(hit):
+            k = hit[0]
+            return ("tp" if hit_tp[k] else "sl"), start + k
+        start = end
+        chunk *= 2
+    return "unresolved", None
+
+
+def trade_plot_data(df, results_df, close_col, dpi=PLOT_DPI):
+    """
+    What one trades chart draws, reduced to the plot's pixel width: close
+    and MACD series min/max-decimated, and the trades as flat arrays.
+    """
+    pixels = panel_pixels(dpi, columns=1, width_inches=PLOT_INCHES[0])
+    times = df["Time"].to_numpy(dtype="datetime64[ns]")
+    data = {"times": {}, "series": {}}
+    for name, column in (("close", close_col), ("macd", "macd"), ("signal", "macd_signal"), ("hist", "macd_hist")):
+        values = df[column].to_numpy(dtype=np.float64)
+        keep = decimate_minmax(values, pixels)
+        data["times"][name] = times[keep]
+        data["series"][name] = values[keep]
+    
+    entry = pd.to_datetime(results_df["entry_time"]).to_numpy(dtype="datetime64[ns]")
+    day = entry.astype("datetime64[D]")
+    long = (results_df["direction"] == "LONG").to_numpy()
+    tp = (results_df["resolution"] == "tp").to_numpy()
+    sl = (results_df["resolution"] == "sl").to_numpy()
+    entry_price = results_df["entry_price"].to_numpy(dtype=np.float64)
+    data.update(
+        spans=np.stack([day + day_offset(RANGE_START), day + day_offset(RANGE_END)], axis=1),
+        long=(entry[long], entry_price[long]),
+        short=(entry[~long], entry_price[~long]),
+        tp=(entry[tp], results_df["tp_price"].to_numpy(dtype=np.float64)[tp]),
+        sl=(entry[sl], results_df["sl_price"].to_numpy(dtype=np.float64)[sl]),
+        entries=(entry, long),
+        title=f"Breakout Strategy: Range {RANGE_START}-{RANGE_END}, Trade {WINDOW_START}-{WINDOW_END}",
+    )
+    return data
+
+
+def render_trade_plot(data, out_file, dpi=PLOT_DPI, show=False):
+    """Draw price + MACD with trades marked; spans, markers and entry lines are one collection each"""
+    if show:
+        fig = plt.figure(figsize=PLOT_INCHES)
+    else:
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        fig = Figure(figsize=PLOT_INCHES)
+        FigureCanvasAgg(fig)
+    ax1, ax2 = fig.subplots(2, 1)
+    times, series = data["times"], data["series"]
+    
+    # --- Price subplot ---
+    ax1.plot(times["close"], series["close"], label="Close Price", color="black", linewidth=0.8)
+    
+    # Range periods as shaded spans (full axis height)
+    if len(data["spans"]):
+        start = mdates.date2num(data["spans"][:, 0])
+        width = mdates.date2num(data["spans"][:, 1]) - start
+        ax1.broken_barh(list(zip(start, width)), (0, 1), transform=ax1.get_xaxis_transform(),
+                        alpha=0.1, color='yellow', label=f'Range Period ({RANGE_START[:5]}-{RANGE_END[:5]})')
+    
+    for key, color, marker, size, label in (
+            ("long", "green", "^", 100, "Long Entry (Low Break)"),
+            ("short", "red", "v", 100, "Short Entry (High Break)"),
+            ("tp", "blue", "*", 150, "Take Profit Hit"),
+            ("sl", "orange", "x", 150, "Stop Loss Hit")):
+        x, y = data[key]
+        if len(x):
+            ax1.scatter(x, y, color=color, marker=marker, s=size, label=label, zorder=5)
+    
+    ax1.set_title(data["title"], fontsize=14)
+    ax1.set_ylabel("Price")
+    ax1.legend(loc="upper left")
+    ax1.grid(True, alpha=0.3)
+    ax1.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d %H:%M'))
+    for label in ax1.get_xticklabels():
+        label.set_rotation(45)
+    
+    # --- MACD subplot (kept for reference) ---
+    ax2.plot(times["macd"], series["macd"], label="MACD", color="blue", linewidth=1)
+    ax2.plot(times["signal"], series["signal"], label="Signal", color="orange", linewidth=1)
+    ax2.fill_between(times["hist"], series["hist"], 0, step="mid", label="Histogram", color="grey", alpha=0.4)
+    ax2.axhline(y=0, color="black", linestyle="-", alpha=0.3)
+    
+    # Mark breakout points on MACD
+    entry, long = data["entries"]
+    if len(entry):
+        ax2.vlines(entry, 0, 1, transform=ax2.get_xaxis_transform(), colors=np.where(long, "green", "red"),
+                   linestyles="--", alpha=0.7, linewidth=2)
+    
+    ax2.set_title("MACD Indicator with Breakout Points", fontsize=14)
+    ax2.set_xlabel("Time")
+    ax2.set_ylabel("MACD Value")
+    ax2.legend(loc="upper left")
+    ax2.grid(True, alpha=0.3)
+    ax2.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d %H:%M'))
+    for label in ax2.get_xticklabels():
+        label.set_rotation(45)
+    
+    fig.tight_layout()
+    fig.savefig(out_file, dpi=dpi, bbox_inches='tight')
+    if show:
+        plt.show()
+    return out_file
+
+
+def plot_trades(df, results_df, out_file="trades_plot.png", pages=None, workers=None):
+    """
+    Plot price + MACD with trades marked. pages="month" writes one
+    {out_file stem}_YYYY-MM page per month, rendered by `workers` processes.
+    Returns the files written.
+    """
+    pages = PLOT_PAGES if pages is None else pages
+    workers = workers or PLOT_WORKERS
     if df.empty or results_df.empty:
         print("No data to plot")
-        return
+        return []
     
     # Determine the close column name
     close_col = CLOSE_COL if CLOSE_COL in df.columns else next((c for c in df.columns if c.startswith(CLOSE_COL)), CLOSE_COL)
-    high_col = HIGH_COL if HIGH_COL in df.columns else next((c for c in df.columns if c.startswith(HIGH_COL)), HIGH_COL)
-    low_col = LOW_COL if LOW_COL in df.columns else next((c for c in df.columns if c.startswith(LOW_COL)), LOW_COL)
     
     try:
-        fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(16, 10))
-        
-        # Convert time to datetime for better plotting
-        df_plot = df.copy()
-        if 'Time' in df_plot.columns:
-            df_plot['Time'] = pd.to_datetime(df_plot['Time'])
-        
-        # --- Price subplot ---
-        ax1.plot(df_plot["Time"], df_plot[close_col], label="Close Price", color="black", linewidth=0.8)
-        
-        # Plot range levels and breakout points
-        entry_long_plotted = False
-        entry_short_plotted = False
-        tp_plotted = False
-        sl_plotted = False
-        range_plotted = False
-        
-        # Group by date to show daily ranges
-        df_plot['date_local'] = df_plot['Time'].dt.date
-        
-        for _, trade in results_df.iterrows():
-            entry_time = pd.to_datetime(trade["entry_time"])
-            trade_date = entry_time.date()
-            
-            # Get data for this day to show range
-            day_data = df_plot[df_plot['date_local'] == trade_date]
-            if not day_data.empty:
-                # Show range period (07:00-08:29) as shaded area
-                range_start_time = pd.to_datetime(f"{trade_date} {RANGE_START}")
-                range_end_time = pd.to_datetime(f"{trade_date} {RANGE_END}")
-                
-                if not range_plotted:
-                    ax1.axvspan(range_start_time, range_end_time, alpha=0.1, color='yellow', 
-                               label='Range Period (07:00-08:29)')
-                    range_plotted = True
-                else:
-                    ax1.axvspan(range_start_time, range_end_time, alpha=0.1, color='yellow')
-                
-                # Show range high/low levels
-                #ax1.axhline(y=trade["range_high"], color="blue", linestyle=":", alpha=0.5)
-                #ax1.axhline(y=trade["range_low"], color="red", linestyle=":", alpha=0.5)
-            
-            if trade["direction"] == "LONG":
-                color = "green"
-                marker = "^"
-                if not entry_long_plotted:
-                    label = "Long Entry (Low Break)"
-                    entry_long_plotted = True
-                else:
-                    label = None
-            else:
-                color = "red"
-                marker = "v"
-                if not entry_short_plotted:
-                    label = "Short Entry (High Break)"
-                    entry_short_plotted = True
-                else:
-                    label = None
-            
-            # Entry point
-            ax1.scatter(entry_time, trade["entry_price"], color=color, marker=marker, 
-                       s=100, label=label, zorder=5)
-            
-            # TP and SL levels (horizontal lines for reference)
-            #ax1.axhline(y=trade["tp_price"], color="blue", linestyle="--", alpha=0.3)
-            #ax1.axhline(y=trade["sl_price"], color="red", linestyle="--", alpha=0.3)
-            
-            # Mark resolution if available
-            if trade["resolution"] == "tp":
-                if not tp_plotted:
-                    ax1.scatter(entry_time, trade["tp_price"], color="blue", marker="*", 
-                               s=150, label="Take Profit Hit", zorder=5)
-                    tp_plotted = True
-                else:
-                    ax1.scatter(entry_time, trade["tp_price"], color="blue", marker="*", 
-                               s=150, zorder=5)
-            elif trade["resolution"] == "sl":
-                if not sl_plotted:
-                    ax1.scatter(entry_time, trade["sl_price"], color="orange", marker="x", 
-                               s=150, label="Stop Loss Hit", zorder=5)
-                    sl_plotted = True
-                else:
-                    ax1.scatter(entry_time, trade["sl_price"], color="orange", marker="x", 
-                               s=150, zorder=5)
-        
-        ax1.set_title(f"Breakout Strategy: Range {RANGE_START}-{RANGE_END}, Trade {WINDOW_START}-{WINDOW_END}", fontsize=14)
-        ax1.set_ylabel("Price")
-        ax1.legend(loc="upper left")
-        ax1.grid(True, alpha=0.3)
-        ax1.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d %H:%M'))
-        plt.setp(ax1.xaxis.get_majorticklabels(), rotation=45)
-        
-        # --- MACD subplot (kept for reference) ---
-        ax2.plot(df_plot["Time"], df_plot["macd"], label="MACD", color="blue", linewidth=1)
-        ax2.plot(df_plot["Time"], df_plot["macd_signal"], label="Signal", color="orange", linewidth=1)
-        ax2.bar(df_plot["Time"], df_plot["macd_hist"], label="Histogram", color="grey", alpha=0.4, width=0.0001)
-        ax2.axhline(y=0, color="black", linestyle="-", alpha=0.3)
-        
-        # Mark breakout points on MACD
-        for _, trade in results_df.iterrows():
-            entry_time = pd.to_datetime(trade["entry_time"])
-            color = "green" if trade["direction"] == "LONG" else "red"
-            ax2.axvline(x=entry_time, color=color, linestyle="--", alpha=0.7, linewidth=2)
-        
-        ax2.set_title("MACD Indicator with Breakout Points", fontsize=14)
-        ax2.set_xlabel("Time")
-        ax2.set_ylabel("MACD Value")
-        ax2.legend(loc="upper left")
-        ax2.grid(True, alpha=0.3)
-        ax2.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d %H:%M'))
-        plt.setp(ax2.xaxis.get_majorticklabels(), rotation=45)
-        
-        plt.tight_layout()
-        plt.savefig(out_file, dpi=150, bbox_inches='tight')
-        print(f"✓ Plot saved to {out_file}")
-        
-        if SHOW_PLOT:
-            plt.show()
+        if pages != "month":
+            render_trade_plot(trade_plot_data(df, results_df, close_col), out_file, show=SHOW_PLOT)
+            print(f"✓ Plot saved to {out_file}")
+            return [out_file]
+        
+        # One page per month: slice the (sorted) bars and the trades entered that month
+        times = df["Time"].to_numpy(dtype="datetime64[ns]")
+        months = times.astype("datetime64[M]")
+        entry_months = pd.to_datetime(results_df["entry_time"]).to_numpy(dtype="datetime64[ns]").astype("datetime64[M]")
+        out = Path(out_file)
+        jobs = []
+        for month in np.unique(months):
+            lo, hi = np.searchsorted(months, [month, month + 1])
+            data = trade_plot_data(df.iloc[lo:hi], results_df[entry_months == month], close_col)
+            jobs.append((data, str(out.with_name(f"{out.stem}_{month}{out.suffix}"))))
+        
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                files = list(pool.map(render_trade_plot, *zip(*jobs)))
         else:
-            plt.close()
+            files = [render_trade_plot(data, page) for data, page in jobs]
+        print(f"✓ {len(files)} monthly plots saved to {out.with_name(out.stem + '_*' + out.suffix)}")
+        return files
             
     except Exception as e:
         print(f"Error creating plot: {e}")
         plt.close()
+        return []
+
+
+def resolve_ambiguous_exits(results_df, df, high_col, low_col, mode="off", fallback="tp", fine_csv=None):
+    """Re-decide resolved trades whose exit bar touched both levels (see intrabar); adds an 'ambiguous' column"""
+    if mode not in intrabar.AMBIGUITY_MODES:
+        raise ValueError(f"Unknown AMBIGUOUS_MODE {mode!r} (use one of {intrabar.AMBIGUITY_MODES})")
+    if mode == "off" or results_df.empty:
+        return results_df
+    results_df = results_df.copy()
+    results_df["ambiguous"] = intrabar.AMBIGUOUS_NONE
+    rows = np.flatnonzero(results_df["exit_time"].notnull().to_numpy())
+    if not len(rows):
+        return results_df
+    
+    times = df["Time"].to_numpy(dtype="datetime64[ns]")
+    exit_times = pd.to_datetime(results_df["exit_time"].iloc[rows]).to_numpy(dtype="datetime64[ns]")
+    exit_bar = np.searchsorted(times, exit_times)
+    entry_times = pd.to_datetime(results_df["entry_time"].iloc[rows]).to_numpy(dtype="datetime64[ns]")
+    side = np.where(results_df["direction"].iloc[rows] == "LONG", LONG, SHORT)
+    source = intrabar.CsvSource(fine_csv, DATE_COL, TIME_COL_ONLY) if mode == "resolve" and fine_csv else None
+    reason, exit_price, status = intrabar.resolve_exits(
+        side, entry_times, times[exit_bar],
+        df[high_col].to_numpy(dtype=np.float64)[exit_bar], df[low_col].to_numpy(dtype=np.float64)[exit_bar],
+        results_df["tp_price"].to_numpy(dtype=np.float64)[rows], results_df["sl_price"].to_numpy(dtype=np.float64)[rows],
+        pd.Timedelta(np.median(np.diff(times[:1000]))), source=source, fallback=fallback)
+    
+    for k in np.flatnonzero(status != intrabar.AMBIGUOUS_NONE):
+        i = results_df.index[rows[k]]
+        tp = reason[k] == EXIT_TP
+        results_df.at[i, "resolution"] = "tp" if tp else "sl"
+        results_df.at[i, "exit_price"] = exit_price[k]
+        results_df.at[i, "win"] = tp
+        results_df.at[i, "pips"] = TP_PIPS if tp else -SL_PIPS
+        results_df.at[i, "ambiguous"] = status[k]
+    flagged = int((status != intrabar.AMBIGUOUS_NONE).sum())
+    decided = int((status == intrabar.AMBIGUOUS_RESOLVED).sum())
+    print(f"Ambiguous exit bars: {flagged} ({decided} resolved from finer data, "
+          f"{flagged - decided} booked as {fallback.upper()})")
+    return results_df
 
 
 def validate_data(df):
@@ -278,31 +398,21 @@ def validate_data(df):
 
 
 # --------------------------- MAIN ---------------------------
-def run_backtest(input_csv):
-    """Main backtesting function"""
-    print(f"Starting backtest with file: {input_csv}")
-    
-    # Load and validate data
+def load_data(input_csv):
+    """
+    Load INPUT_CSV's DATE_FROM - DATE_TO period and compute MACD. Returns
+    (df, (high_col, low_col, close_col)), or (None, None) on failure.
+    """
+    # Read the header and validate columns
     try:
-        df = pd.read_csv(input_csv)
-        print(f"✓ Loaded {len(df)} rows from {input_csv}")
-        print(f"Columns: {list(df.columns)}")
-        
-        # Handle duplicate column names
-        df.columns = [f"{col}_{i}" if list(df.columns).count(col) > 1 else col 
-                     for i, col in enumerate(df.columns)]
-        
-        # Check for duplicate column names after fixing
-        if len(df.columns) != len(set(df.columns)):
-            print("Warning: Still have duplicate columns after fixing")
-            
+        available_cols = list(pd.read_csv(input_csv, nrows=0).columns)
+        print(f"Columns: {available_cols}")
     except Exception as e:
         print(f"Error loading CSV: {e}")
         return None, None
     
     # Update column references if they were renamed
     original_cols = [DATE_COL, TIME_COL_ONLY, CLOSE_COL, HIGH_COL, LOW_COL]
-    available_cols = list(df.columns)
     
     # Find the correct column names (in case of duplicates)
     date_col = DATE_COL if DATE_COL in available_cols else next((c for c in available_cols if c.startswith(DATE_COL)), None)
@@ -320,34 +430,19 @@ def run_backtest(input_csv):
     
     print(f"Using columns: Date={date_col}, Time={time_col}, Close={close_col}, High={high_col}, Low={low_col}")
     
-    # Combine Date + Time -> single datetime
-    print("Processing datetime columns...")
+    # Stream the CSV, keeping only DATE_FROM - DATE_TO; Date + Time -> single Time column
+    print(f"Loading {DATE_FROM or 'start'} - {DATE_TO or 'end'} from {input_csv}...")
     try:
-        df["DateTime"] = pd.to_datetime(
-            df[date_col].astype(str) + " " + df[time_col].astype(str),
-            errors="coerce"
-        )
-        
-        # Remove rows with invalid dates
-        initial_len = len(df)
-        df = df.dropna(subset=["DateTime"]).copy()
-        if len(df) < initial_len:
-            print(f"Warning: Removed {initial_len - len(df)} rows with invalid datetime")
-        
-        # Filter to 2024-2025 only
-        print("Filtering data to 2024-2025...")
-        df = df[df["DateTime"].dt.year.isin([2024, 2025])].copy()
-        print(f"✓ Filtered to 2024-2025: {len(df)} rows remaining")
-        
-        # Drop the original time column and rename DateTime
-        if time_col in df.columns:
-            df = df.drop(columns=[time_col])
-        df = df.rename(columns={"DateTime": "Time"})
-        df = df.sort_values("Time").reset_index(drop=True)
-        print(f"✓ Processed datetime, {len(df)} valid rows remaining")
-        
+        df, info = load_ohlc_csv(input_csv, date_col, time_col, DATE_FROM, DATE_TO,
+                                 date_format=DATE_FORMAT, cache=CSV_CACHE)
+        if info['cached']:
+            print(f"✓ Loaded {len(df)} rows from the cached sidecar")
+        else:
+            print(f"✓ Read {info['rows_read']} rows, {len(df)} in range")
+            if info['rows_invalid']:
+                print(f"Warning: Removed {info['rows_invalid']} rows with invalid datetime")
     except Exception as e:
-        print(f"Error processing datetime: {e}")
+        print(f"Error loading CSV: {e}")
         import traceback
         traceback.print_exc()
         return None, None
@@ -364,31 +459,43 @@ def run_backtest(input_csv):
     df = df.dropna(subset=["macd_diff"])
     print(f"✓ MACD computed, {len(df)} rows with valid MACD data")
     
+    df["date_local"] = df["Time"].dt.date
+    return df, (high_col, low_col, close_col)
+
+
+def run_backtest(input_csv):
+    """Main backtesting function"""
+    print(f"Starting backtest with file: {input_csv}")
+    
+    df, columns = load_data(input_csv)
+    if df is None:
+        return None, None
+    high_col, low_col, close_col = columns
+    
     # Group by date and find trades
     print(f"Scanning for breakout trades...")
     print(f"Range calculation: {RANGE_START} - {RANGE_END}")
     print(f"Trading window: {WINDOW_START} - {WINDOW_END}")
     
-    df["date_local"] = df["Time"].dt.date
     results = []
     
-    for date, group in df.groupby("date_local"):
-        # Get daily range (07:00 - 08:29)
-        range_high, range_low = get_daily_range(group, high_col, low_col)
-        
-        if range_high is None or range_low is None:
-            continue  # No range data for this day
-        
-        # Look for breakout in trading window (08:30 - 09:00)
-        breakout = find_breakout_entry(group, range_high, range_low, high_col, low_col, close_col)
-        
-        if breakout is None:
-            continue  # No breakout found
+    # Arrays for the forward exit search (df is sorted by Time)
+    times = df["Time"].to_numpy()
+    highs = df[high_col].to_numpy(dtype=np.float64)
+    lows = df[low_col].to_numpy(dtype=np.float64)
+    
+    # Daily ranges and first breakouts, all days at once
+    breakouts = find_daily_breakouts(df, high_col, low_col, close_col)
+    
+    for breakout in breakouts.itertuples(index=False):
+        date = breakout.date
+        range_high = breakout.range_high
+        range_low = breakout.range_low
         
         # Set up trade parameters
-        direction = breakout['type']
-        entry_time = breakout['entry_time']
-        entry_price = breakout['entry_price']
+        direction = breakout.type
+        entry_time = pd.Timestamp(breakout.entry_time)
+        entry_price = breakout.entry_price
         
         if direction == "LONG":
             tp_price = entry_price + TP
@@ -397,40 +504,14 @@ def run_backtest(input_csv):
             tp_price = entry_price - TP
             sl_price = entry_price + SL
         
-        # Scan forward for TP/SL resolution
-        resolution = "unresolved"
+        # Scan forward for TP/SL resolution, from the first bar after entry
+        start = np.searchsorted(times, np.datetime64(entry_time), side="right")
+        resolution, exit_idx = find_exit(highs, lows, start, direction, tp_price, sl_price)
         exit_time = None
         exit_price = None
-        
-        # Look at all future data points after entry
-        future_data = df[df["Time"] > entry_time].copy()
-        
-        for idx, future_row in future_data.iterrows():
-            high = future_row[high_col]
-            low = future_row[low_col]
-            
-            if direction == "LONG":
-                if high >= tp_price:
-                    resolution = "tp"
-                    exit_time = future_row["Time"]
-                    exit_price = tp_price
-                    break
-                elif low <= sl_price:
-                    resolution = "sl"
-                    exit_time = future_row["Time"]
-                    exit_price = sl_price
-                    break
-            else:  # SHORT
-                if low <= tp_price:
-                    resolution = "tp"
-                    exit_time = future_row["Time"]
-                    exit_price = tp_price
-                    break
-                elif high >= sl_price:
-                    resolution = "sl"
-                    exit_time = future_row["Time"]
-                    exit_price = sl_price
-                    break
+        if exit_idx is not None:
+            exit_time = df["Time"].iloc[exit_idx]
+            exit_price = tp_price if resolution == "tp" else sl_price
         
         # Handle unresolved trades
         if resolution == "unresolved" and RESOLVE_UNRESOLVED == "eod_as_loss":
@@ -453,8 +534,8 @@ def run_backtest(input_csv):
             "entry_time": entry_time,
             "entry_price": entry_price,
             "direction": direction,
-            "breakout_level": breakout['breakout_level'],
-            "trigger": breakout['trigger'],
+            "breakout_level": breakout.breakout_level,
+            "trigger": breakout.trigger,
             "tp_price": tp_price,
             "sl_price": sl_price,
             "exit_time": exit_time,
@@ -471,6 +552,9 @@ def run_backtest(input_csv):
         print("No trades found in the specified time window")
         return results_df, df
     
+    results_df = resolve_ambiguous_exits(results_df, df, high_col, low_col,
+                                         AMBIGUOUS_MODE, AMBIGUOUS_FALLBACK, FINE_CSV)
+    
     # Calculate statistics
     total_trades = len(results_df)
     resolved = results_df[results_df["win"].notnull()]
@@ -0,0 +1,247 @@
+"""
+Parameter sweep for macd_backtest: session windows x TP/SL pairs on one load.
+
+The CSV is loaded and MACD computed once (macd_backtest.load_data); the bar
+arrays the strategy needs are copied into shared memory for the worker
+processes (param_sweep.SharedBarArrays). Each worker finds the daily ranges
+and first breakouts once per session window (macd_backtest.breakout_bars)
+and reuses them for every TP/SL pair of that window, so a point costs only
+the forward exit searches of its trades.
+
+Points follow macd_backtest.run_backtest's rules, including
+RESOLVE_UNRESOLVED; the intra-bar AMBIGUOUS_MODE is not applied.
+
+    python macd_sweep.py data5.csv --tp 5,10,15 --sl 10,25 --range-start 07:00,07:30 --workers 8
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import macd_backtest
+from macd_backtest import breakout_bars, find_exit, time_of_day, day_offset
+from param_sweep import SharedBarArrays, attach_shared, build_grid
+
+WINDOW_PARAMS = ('range_start', 'range_end', 'window_start', 'window_end')
+SWEEP_PARAMS = WINDOW_PARAMS + ('tp_pips', 'sl_pips')
+STAT_COLUMNS = ('trades', 'resolved', 'wins', 'losses', 'unresolved',
+                'win_rate', 'expectancy_pips', 'total_pips')
+HEATMAP_VALUES = ('win_rate', 'expectancy_pips')
+
+
+def sweep_arrays(df, high_col, low_col, close_col):
+    """Bar arrays of a load_data frame: times, time of day, day code, high, low, close"""
+    day, _ = pd.factorize(df["date_local"])
+    return {
+        'times': df["Time"].to_numpy(dtype='datetime64[ns]'),
+        'tod': time_of_day(df["Time"]),
+        'day': day.astype(np.int32),
+        'high': df[high_col].to_numpy(dtype=np.float64),
+        'low': df[low_col].to_numpy(dtype=np.float64),
+        'close': df[close_col].to_numpy(dtype=np.float64),
+    }
+
+
+def evaluate_point(arrays, params, settings, breakout_cache=None):
+    """STAT_COLUMNS values of one parameter point"""
+    windows = tuple(params[name] for name in WINDOW_PARAMS)
+    if breakout_cache is not None and windows in breakout_cache:
+        found = breakout_cache[windows]
+    else:
+        found = breakout_bars(arrays['tod'], arrays['day'], settings['n_days'],
+                              arrays['high'], arrays['low'], windows)
+        if breakout_cache is not None:
+            breakout_cache[windows] = found
+
+    pip = settings['pip']
+    tp_dist = params['tp_pips'] * pip
+    sl_dist = params['sl_pips'] * pip
+    times, highs, lows = arrays['times'], arrays['high'], arrays['low']
+    rows = found['rows']
+    starts = np.searchsorted(times, times[rows], side='right')
+    wins = losses = unresolved = 0
+    for k in range(len(rows)):
+        entry_price = arrays['close'][rows[k]]
+        if found['short'][k]:
+            direction, tp_price, sl_price = "SHORT", entry_price - tp_dist, entry_price + sl_dist
+        else:
+            direction, tp_price, sl_price = "LONG", entry_price + tp_dist, entry_price - sl_dist
+        resolution, _ = find_exit(highs, lows, starts[k], direction, tp_price, sl_price)
+        if resolution == "unresolved" and settings['resolve_unresolved'] == "eod_as_loss":
+            resolution = "sl"
+        elif resolution == "unresolved" and settings['resolve_unresolved'] == "eod_as_win":
+            resolution = "tp"
+        if resolution == "tp":
+            wins += 1
+        elif resolution == "sl":
+            losses += 1
+        else:
+            unresolved += 1
+
+    resolved = wins + losses
+    total_pips = wins * params['tp_pips'] - losses * params['sl_pips']
+    return (len(rows), resolved, wins, losses, unresolved,
+            wins / resolved * 100 if resolved else np.nan,
+            total_pips / resolved if resolved else np.nan,
+            total_pips)
+
+
+# --------------------------- WORKER SIDE ---------------------------
+_worker = {}
+
+
+def _init_worker(spec, settings):
+    """Process pool initializer: attach the shared bar arrays and reset the breakout cache"""
+    arrays, handles = attach_shared(spec)
+    _worker.clear()
+    _worker.update(arrays=arrays, handles=handles, settings=settings, breakouts={})
+
+
+def _run_point(params):
+    return evaluate_point(_worker['arrays'], params, _worker['settings'], _worker['breakouts'])
+
+
+# --------------------------- DRIVER ---------------------------
+def complete_params(points):
+    """Fill parameters missing from each point with macd_backtest's current settings; drop inverted windows"""
+    defaults = dict(zip(WINDOW_PARAMS, macd_backtest.session_windows()))
+    defaults.update(tp_pips=macd_backtest.TP_PIPS, sl_pips=macd_backtest.SL_PIPS)
+    completed = []
+    for point in points:
+        unknown = set(point) - set(SWEEP_PARAMS)
+        if unknown:
+            raise ValueError(f"Unknown sweep parameters: {sorted(unknown)}")
+        params = {**defaults, **point}
+        if day_offset(params['range_start']) > day_offset(params['range_end']):
+            continue
+        if day_offset(params['window_start']) > day_offset(params['window_end']):
+            continue
+        completed.append(params)
+    return completed
+
+
+def run_macd_sweep(input_csv, points, workers=None, sort_by='expectancy_pips', chunksize=None):
+    """
+    Evaluate every {param: value} point (see param_sweep.build_grid) on one
+    load of input_csv. Parameters left out take macd_backtest's current
+    values. Returns a DataFrame ranked by sort_by (descending), or None if
+    the CSV can't be loaded.
+    """
+    points = complete_params(points)
+    if not points:
+        raise ValueError("No valid parameter points to evaluate")
+
+    df, columns = macd_backtest.load_data(input_csv)
+    if df is None:
+        return None
+    arrays = sweep_arrays(df, *columns)
+    settings = {
+        'pip': macd_backtest.PIP,
+        'resolve_unresolved': macd_backtest.RESOLVE_UNRESOLVED,
+        'n_days': int(arrays['day'].max()) + 1 if len(df) else 0,
+    }
+    del df
+
+    workers = workers or os.cpu_count() or 1
+    # Group points sharing a session window so worker breakout caches hit
+    points.sort(key=lambda p: tuple(day_offset(p[name]) for name in WINDOW_PARAMS))
+    chunksize = chunksize or max(1, len(points) // (workers * 4))
+
+    print(f"🧪 MACD BACKTEST SWEEP: {len(points)} points on {workers} workers")
+    start = time.perf_counter()
+    if workers == 1:
+        cache = {}
+        stats = [evaluate_point(arrays, p, settings, cache) for p in points]
+    else:
+        with SharedBarArrays(arrays) as shared:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(shared.spec, settings)) as pool:
+                stats = list(pool.map(_run_point, points, chunksize=chunksize))
+    elapsed = time.perf_counter() - start
+    print(f"   Completed in {elapsed:.1f}s ({len(points) / max(elapsed, 1e-9):.1f} points/s)")
+
+    results = pd.DataFrame(points, columns=list(SWEEP_PARAMS))
+    for j, name in enumerate(STAT_COLUMNS):
+        results[name] = [row[j] for row in stats]
+    results = results.sort_values(sort_by, ascending=False, kind='stable', na_position='last')
+    results = results.reset_index(drop=True)
+    results.insert(0, 'rank', np.arange(1, len(results) + 1))
+    return results
+
+
+def heatmap_table(results, value='win_rate'):
+    """value per session window (rows) and TP/SL pair (columns, 'tp/sl' pips)"""
+    clock = {name: results[name].map(lambda v: str(pd.Timedelta(day_offset(v)))[-8:]) for name in WINDOW_PARAMS}
+    frame = results.assign(
+        session=clock['range_start'] + '-' + clock['range_end'] + ' / '
+                + clock['window_start'] + '-' + clock['window_end'],
+        tp_sl=results['tp_pips'].astype(str) + '/' + results['sl_pips'].astype(str),
+    )
+    table = frame.pivot_table(index='session', columns='tp_sl', values=value, aggfunc='first', sort=False)
+    pairs = results[['tp_pips', 'sl_pips']].drop_duplicates().sort_values(['tp_pips', 'sl_pips'])
+    table = table[[f"{tp}/{sl}" for tp, sl in pairs.itertuples(index=False)]]
+    table.columns.name = 'tp/sl pips'
+    return table.sort_index()
+
+
+def save_sweep(results, input_csv, out_dir=None):
+    """Write {stem}_sweep.csv and one {stem}_heatmap_{value}.csv per HEATMAP_VALUES; returns the paths"""
+    out_dir = Path(out_dir) if out_dir else Path(input_csv).parent
+    stem = Path(input_csv).stem
+    paths = [out_dir / f"{stem}_sweep.csv"]
+    results.to_csv(paths[0], index=False)
+    for value in HEATMAP_VALUES:
+        paths.append(out_dir / f"{stem}_heatmap_{value}.csv")
+        heatmap_table(results, value).to_csv(paths[-1], float_format='%.2f')
+    return paths
+
+
+def _number(value):
+    number = float(value)
+    return int(number) if number.is_integer() else number
+
+
+def _list(value, cast=str):
+    return [cast(v) for v in value.split(',')] if value else None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep macd_backtest session windows and TP/SL pairs")
+    parser.add_argument('input_csv')
+    parser.add_argument('--range-start', help="Comma-separated HH:MM[:SS] values")
+    parser.add_argument('--range-end')
+    parser.add_argument('--window-start')
+    parser.add_argument('--window-end')
+    parser.add_argument('--tp', help="Comma-separated TP pips")
+    parser.add_argument('--sl', help="Comma-separated SL pips")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--sort-by', default='expectancy_pips', choices=STAT_COLUMNS)
+    parser.add_argument('--out-dir', default=None, help="Default: next to the input CSV")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    macd_backtest.PLOT_ENABLED = False
+    space = {
+        'range_start': _list(args.range_start), 'range_end': _list(args.range_end),
+        'window_start': _list(args.window_start), 'window_end': _list(args.window_end),
+        'tp_pips': _list(args.tp, _number), 'sl_pips': _list(args.sl, _number),
+    }
+    space = {name: values for name, values in space.items() if values}
+    results = run_macd_sweep(args.input_csv, build_grid(space), args.workers, args.sort_by)
+    if results is None:
+        return 1
+    print(results.head(10).to_string(index=False))
+    for path in save_sweep(results, args.input_csv, args.out_dir):
+        print(f"✓ Saved {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
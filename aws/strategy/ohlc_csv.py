@@ -0,0 +1,141 @@
+"""
+Chunked loader for Date/Time OHLC CSVs (macd_backtest's input layout).
+
+The CSV is streamed in chunks. Each chunk's Date and Time columns are parsed
+with an explicit format, one parse per distinct string (a file holds a few
+thousand dates and at most 86,400 times of day), and rows outside the
+requested [start, end) range are dropped before the next chunk is read, so
+only the requested period is ever held in memory.
+
+The parsed result is cached in a sidecar next to the CSV ({csv}.cache.npz,
+one uncompressed array per column). The sidecar is reused while the CSV's
+size and modification time, the date range and the parse settings match,
+and rewritten otherwise.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+DATE_FORMAT = '%Y/%m/%d'
+CHUNK_ROWS = 1_000_000
+CACHE_SUFFIX = '.cache.npz'
+CACHE_VERSION = 1
+TIME_COLUMN = 'Time'  # Parsed timestamps replace the time-of-day column under this name
+
+
+def _parse_unique(values, parse):
+    """Apply parse once per distinct string of values"""
+    codes, uniques = pd.factorize(values)
+    parsed = parse(pd.Index(uniques).astype(str))
+    out = np.asarray(parsed)[codes]
+    out[codes < 0] = np.datetime64('NaT') if out.dtype.kind == 'M' else np.timedelta64('NaT')
+    return out
+
+
+def parse_datetimes(dates, times, date_format=DATE_FORMAT):
+    """datetime64[ns] from separate date and HH:MM:SS time strings; NaT where either doesn't parse"""
+    day = _parse_unique(dates, lambda u: pd.to_datetime(u, format=date_format, errors='coerce'))
+    offset = _parse_unique(times, lambda u: pd.to_timedelta(u, errors='coerce'))
+    return day.astype('datetime64[ns]') + offset.astype('timedelta64[ns]')
+
+
+def _bound(value):
+    return None if value is None else np.datetime64(pd.Timestamp(value), 'ns')
+
+
+def cache_path(csv_path):
+    return csv_path + CACHE_SUFFIX
+
+
+def _cache_key(csv_path, date_col, time_col, start, end, date_format):
+    stat = os.stat(csv_path)
+    return {
+        'version': CACHE_VERSION,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'date_col': date_col,
+        'time_col': time_col,
+        'start': None if start is None else str(start),
+        'end': None if end is None else str(end),
+        'date_format': date_format,
+    }
+
+
+def _read_cache(path, key):
+    """The cached frame if the sidecar exists and was written for key, else None"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as data:
+            meta = json.loads(str(data['__meta__']))
+            if meta['key'] != key:
+                return None
+            columns = {}
+            for name, kind in zip(meta['columns'], meta['kinds']):
+                values = data[name]
+                columns[name] = values.astype(object) if kind == 'O' else values
+    except (OSError, ValueError, KeyError):
+        return None
+    return pd.DataFrame(columns)
+
+
+def _write_cache(path, key, df):
+    arrays = {}
+    kinds = []
+    for name in df.columns:
+        values = df[name].to_numpy()
+        kinds.append(values.dtype.kind)
+        arrays[name] = values.astype(str) if values.dtype.kind == 'O' else values
+    meta = json.dumps({'key': key, 'columns': list(df.columns), 'kinds': kinds})
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, __meta__=np.array(meta), **arrays)
+    os.replace(tmp_path, path)
+
+
+def load_ohlc_csv(csv_path, date_col='Date', time_col='Time', start=None, end=None,
+                  date_format=DATE_FORMAT, chunk_rows=CHUNK_ROWS, cache=True):
+    """
+    Rows of csv_path with start <= Date + Time < end (either bound may be
+    None), sorted by time. time_col is replaced by a datetime64 TIME_COLUMN
+    at the end of the columns; rows whose date or time doesn't parse are
+    dropped. Returns (frame, info) where info has rows_read, rows_invalid
+    and cached.
+    """
+    key = _cache_key(csv_path, date_col, time_col, start, end, date_format) if cache else None
+    if cache:
+        df = _read_cache(cache_path(csv_path), key)
+        if df is not None:
+            return df, {'rows_read': None, 'rows_invalid': None, 'cached': True}
+
+    lo, hi = _bound(start), _bound(end)
+    parts = []
+    rows_read = rows_invalid = 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_rows):
+        rows_read += len(chunk)
+        stamps = parse_datetimes(chunk[date_col].to_numpy(), chunk[time_col].to_numpy(), date_format)
+        keep = ~np.isnat(stamps)
+        rows_invalid += int((~keep).sum())
+        if lo is not None:
+            keep &= stamps >= lo
+        if hi is not None:
+            keep &= stamps < hi
+        if not keep.any():
+            continue
+        chunk = chunk[keep].drop(columns=[time_col])
+        chunk[TIME_COLUMN] = stamps[keep]
+        parts.append(chunk)
+
+    if parts:
+        df = pd.concat(parts)
+    else:
+        columns = [c for c in pd.read_csv(csv_path, nrows=0).columns if c != time_col]
+        df = pd.DataFrame(columns=columns + [TIME_COLUMN])
+    df = df.sort_values(TIME_COLUMN).reset_index(drop=True)
+
+    if cache:
+        _write_cache(cache_path(csv_path), key, df)
+    return df, {'rows_read': rows_read, 'rows_invalid': rows_invalid, 'cached': False}
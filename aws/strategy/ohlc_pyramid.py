@@ -0,0 +1,216 @@
+"""
+Multi-timeframe OHLC pyramid built from m1 candles.
+
+Each level is aggregated from the level below it (m1 -> m5 -> m15 -> H1 ->
+H4 -> D1), so every bar is touched once per level instead of once per
+resample. Levels keep a parent index into the next level up, and index(tf)
+maps every m1 bar straight to its bar on any timeframe, so a higher-timeframe
+value is a single array gather instead of a floor + merge + ffill.
+
+Bars are bucketed on epoch minutes, which gives the same bins as
+DataFrame.resample(...).dropna() for timeframes that divide a day. Pyramids
+can be saved next to the candle store and are keyed by a fingerprint of the
+m1 data, so a changed download is never served a stale pyramid.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+# (label, minutes); labels follow FXCM's periodicity names
+TIMEFRAMES = (('m5', 5), ('m15', 15), ('H1', 60), ('H4', 240), ('D1', 1440))
+BASE_TIMEFRAME = 'm1'
+OHLC_SUFFIXES = ('Open', 'High', 'Low', 'Close')
+NS_PER_MINUTE = 60_000_000_000
+# Mid and bid/ask columns of a prepared CompleteFXSystem frame
+PYRAMID_COLUMNS = ('Open', 'High', 'Low', 'Close',
+                   'BidOpen', 'BidHigh', 'BidLow', 'BidClose',
+                   'AskOpen', 'AskHigh', 'AskLow', 'AskClose')
+PYRAMID_DIR = '_pyramids'  # Under the candle store root
+
+
+def _aggregation(column):
+    """first/max/min/last by column suffix (BidOpen, AskHigh, Close, ...)"""
+    for suffix, how in zip(OHLC_SUFFIXES, ('first', 'max', 'min', 'last')):
+        if column.endswith(suffix):
+            return how
+    raise ValueError(f"Don't know how to aggregate column {column!r}")
+
+
+def _aggregate(keys, columns):
+    """Group consecutive equal keys; returns (bar_keys, parent, {column: bar values})"""
+    boundary = np.empty(len(keys), dtype=bool)
+    boundary[:1] = True
+    np.not_equal(keys[1:], keys[:-1], out=boundary[1:])
+    starts = np.flatnonzero(boundary)
+    ends = np.append(starts[1:], len(keys)) - 1
+    parent = (np.cumsum(boundary) - 1).astype(np.int32)
+
+    out = {}
+    for name, values in columns.items():
+        how = _aggregation(name)
+        if how == 'first':
+            out[name] = values[starts]
+        elif how == 'last':
+            out[name] = values[ends]
+        elif how == 'max':
+            out[name] = np.maximum.reduceat(values, starts)
+        else:
+            out[name] = np.minimum.reduceat(values, starts)
+    return keys[starts], parent, out
+
+
+def data_fingerprint(times, columns):
+    """Content hash of m1 timestamps and price columns"""
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(times).view(np.int64).tobytes())
+    for name in sorted(columns):
+        digest.update(name.encode('utf-8'))
+        digest.update(np.ascontiguousarray(columns[name], dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+class OHLCPyramid:
+    def __init__(self, levels, base_parent, fingerprint=None):
+        """
+        levels: {label: {'minutes', 'start' (epoch minutes), 'parent', 'columns'}}
+        in ascending timeframe order; base_parent maps m1 bars to the first level.
+        """
+        self.levels = levels
+        self.base_parent = base_parent
+        self.fingerprint = fingerprint
+        self._index = {}
+
+    @classmethod
+    def build(cls, times, columns, timeframes=TIMEFRAMES, fingerprint=None):
+        """Aggregate sorted m1 bars (datetime64 times, {column: float array}) up every timeframe"""
+        minutes = np.asarray(times).astype('datetime64[ns]').view(np.int64) // NS_PER_MINUTE
+        if len(minutes) > 1 and (np.diff(minutes) < 0).any():
+            raise ValueError("m1 bars must be sorted by time")
+        for (_, small), (label, big) in zip(timeframes, timeframes[1:]):
+            if big % small:
+                raise ValueError(f"{label} ({big} min) is not a multiple of the level below ({small} min)")
+
+        columns = {name: np.asarray(values, dtype=np.float64) for name, values in columns.items()}
+        levels = {}
+        base_parent = None
+        prev = None
+        # Each level is built from the bars of the level below
+        start, values = minutes, columns
+        for label, tf in timeframes:
+            keys = start // tf
+            bar_keys, parent, values = _aggregate(keys, values)
+            if prev is None:
+                base_parent = parent
+            else:
+                levels[prev]['parent'] = parent
+            start = bar_keys * tf
+            levels[label] = {'minutes': tf, 'start': start, 'parent': None, 'columns': values}
+            prev = label
+        return cls(levels, base_parent, fingerprint)
+
+    @classmethod
+    def from_frame(cls, df, columns=None, time_col='DateTime'):
+        """Build from an m1 frame; columns defaults to every *Open/High/Low/Close column"""
+        if columns is None:
+            columns = [c for c in df.columns if c != time_col and c.endswith(OHLC_SUFFIXES)
+                       and pd.api.types.is_numeric_dtype(df[c])]
+        times = df[time_col].to_numpy(dtype='datetime64[ns]')
+        data = {c: df[c].to_numpy(dtype=np.float64) for c in columns}
+        return cls.build(times, data, fingerprint=data_fingerprint(times, data))
+
+    @property
+    def timeframes(self):
+        return list(self.levels)
+
+    def index(self, tf):
+        """int32 array mapping every m1 bar to its bar on timeframe tf"""
+        if tf not in self._index:
+            labels = self.timeframes
+            if tf not in labels:
+                raise KeyError(f"Unknown timeframe {tf!r} (have {labels})")
+            pos = labels.index(tf)
+            if pos == 0:
+                self._index[tf] = self.base_parent
+            else:
+                below = labels[pos - 1]
+                self._index[tf] = self.levels[below]['parent'][self.index(below)]
+        return self._index[tf]
+
+    def bars(self, tf):
+        """OHLC bars for timeframe tf as a DataFrame (DateTime + price columns)"""
+        level = self.levels[tf]
+        df = pd.DataFrame(level['columns'], copy=False)
+        df.insert(0, 'DateTime', (level['start'] * NS_PER_MINUTE).view('datetime64[ns]'))
+        return df
+
+    def lookup(self, tf, values):
+        """Broadcast per-bar values of timeframe tf onto the m1 bars"""
+        return np.asarray(values)[self.index(tf)]
+
+    # --------------------------- PERSISTENCE ---------------------------
+    def save(self, path):
+        """Write the pyramid as .npy columns plus meta.json (replacing any previous copy)"""
+        tmp_path = path + '.tmp'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        meta = {'fingerprint': self.fingerprint, 'levels': []}
+        np.save(os.path.join(tmp_path, f"{BASE_TIMEFRAME}_parent.npy"), self.base_parent)
+        for label, level in self.levels.items():
+            level_dir = os.path.join(tmp_path, label)
+            os.makedirs(level_dir)
+            np.save(os.path.join(level_dir, 'start.npy'), level['start'])
+            if level['parent'] is not None:
+                np.save(os.path.join(level_dir, 'parent.npy'), level['parent'])
+            for name, values in level['columns'].items():
+                np.save(os.path.join(level_dir, f"{name}.npy"), values)
+            meta['levels'].append({'label': label, 'minutes': level['minutes'],
+                                   'bars': len(level['start']), 'columns': list(level['columns'])})
+        with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=1)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, fingerprint=None):
+        """
+        Load a saved pyramid; returns None if missing, built from different
+        data, or removed (pruned by another process) while being read.
+        """
+        try:
+            with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if fingerprint is not None and meta['fingerprint'] != fingerprint:
+                return None
+
+            levels = {}
+            top = meta['levels'][-1]['label']  # Every level but the top one has a parent index
+            for info in meta['levels']:
+                level_dir = os.path.join(path, info['label'])
+                has_parent = info['label'] != top
+                levels[info['label']] = {
+                    'minutes': info['minutes'],
+                    'start': np.load(os.path.join(level_dir, 'start.npy')),
+                    'parent': np.load(os.path.join(level_dir, 'parent.npy')) if has_parent else None,
+                    'columns': {name: np.load(os.path.join(level_dir, f"{name}.npy")) for name in info['columns']},
+                }
+            base_parent = np.load(os.path.join(path, f"{BASE_TIMEFRAME}_parent.npy"))
+        except (OSError, ValueError, KeyError):
+            return None
+        return cls(levels, base_parent, meta['fingerprint'])
+
+
+def prune_pyramids(root, keep=4):
+    """Delete all but the `keep` most recently written pyramids under root"""
+    if not os.path.isdir(root):
+        return []
+    paths = [os.path.join(root, name) for name in os.listdir(root)
+             if os.path.exists(os.path.join(root, name, 'meta.json'))]
+    paths.sort(key=lambda p: os.path.getmtime(os.path.join(p, 'meta.json')), reverse=True)
+    for path in paths[keep:]:
+        shutil.rmtree(path, ignore_errors=True)
+    return paths[keep:]
@@ -0,0 +1,284 @@
+"""
+Parallel parameter sweep for the Range Breakout + MACD strategy.
+
+The prepared bar arrays (prices, minute-of-day, day codes) are copied once
+into shared memory; every worker process attaches to them instead of
+receiving a pickled copy of the DataFrame. Each grid point recomputes only
+what depends on its parameters (MACD spans, session range) and runs the
+array engine from bar_engine.
+"""
+
+import datetime
+import itertools
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from bar_engine import run_breakout_engine, minute_of_day
+from session_ranges import SessionRangeIndex
+from indicators import MACD
+from trade_ledger import STAT_FIELDS, COUNT_FIELDS, engine_pips, trade_stats
+
+SWEEP_PARAMS = ('range_start', 'range_end', 'sl_pips', 'tp_pips',
+                'macd_fast', 'macd_slow', 'macd_signal')
+
+
+def to_minutes(value):
+    """Accept datetime.time, 'HH:MM' strings or minutes and return minutes after midnight"""
+    if isinstance(value, datetime.time):
+        return minute_of_day(value)
+    if isinstance(value, str):
+        hour, minute = value.split(':')[:2]
+        return int(hour) * 60 + int(minute)
+    return int(value)
+
+
+def build_grid(space):
+    """Cartesian product of a {param: [values]} dict as a list of param dicts"""
+    keys = list(space)
+    return [dict(zip(keys, combo)) for combo in itertools.product(*(space[k] for k in keys))]
+
+
+def sample_grid(space, n_samples, seed=None):
+    """Random sample of n_samples distinct points from a {param: [values]} dict"""
+    rng = random.Random(seed)
+    keys = list(space)
+    total = int(np.prod([len(space[k]) for k in keys]))
+    if n_samples >= total:
+        return build_grid(space)
+
+    seen = set()
+    points = []
+    while len(points) < n_samples:
+        combo = tuple(rng.choice(space[k]) for k in keys)
+        if combo not in seen:
+            seen.add(combo)
+            points.append(dict(zip(keys, combo)))
+    return points
+
+
+def system_bar_arrays(system):
+    """Extract the arrays the engine needs from a prepared CompleteFXSystem (either frame layout)"""
+    day_codes, _ = system.day_index()
+    return {
+        'close': system.prices('Close'),
+        'high': system.prices('High'),
+        'low': system.prices('Low'),
+        'mod': system.minutes_of_day().astype(np.int32),
+        'day': day_codes.astype(np.int32),
+    }
+
+
+class SharedBarArrays:
+    """Owns shared-memory copies of the bar arrays for the lifetime of a sweep"""
+
+    def __init__(self, arrays):
+        self.blocks = []
+        self.spec = {}
+        for name, arr in arrays.items():
+            arr = np.ascontiguousarray(arr)
+            shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+            view = np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)
+            view[:] = arr
+            self.blocks.append(shm)
+            self.spec[name] = (shm.name, arr.shape, arr.dtype.str)
+
+    def close(self):
+        for shm in self.blocks:
+            shm.close()
+            shm.unlink()
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# --------------------------- WORKER SIDE ---------------------------
+_worker = {}
+
+
+def attach_shared(spec):
+    """Attach to shared arrays created by SharedBarArrays; returns (arrays, handles)"""
+    arrays = {}
+    handles = []
+    for name, (shm_name, shape, dtype) in spec.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        handles.append(shm)
+        arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+    return arrays, handles
+
+
+def _init_worker(spec, settings):
+    """Process pool initializer: attach shared arrays and reset the per-worker caches"""
+    arrays, handles = attach_shared(spec)
+    _worker.clear()
+    _worker.update(arrays=arrays, handles=handles, settings=settings, macd={}, ranges={},
+                   index=range_index(arrays))
+
+
+def macd_signals(close, fast, slow, signal):
+    """MACD crossover signals, identical to CompleteFXSystem.calculate_macd"""
+    out = MACD(fast, slow, signal).update_many(close)
+    return out['buy'], out['sell']
+
+
+def summarize_trades(out, pip_value, row=None):
+    """Statistics row (STAT_FIELDS order) for one engine run"""
+    return trade_stats(engine_pips(out, pip_value), out['side'], out['reason'], out=row)[0]
+
+
+def range_index(arrays):
+    """Session-range index over the bar arrays, built once per process"""
+    return SessionRangeIndex(arrays['day'], arrays['mod'], arrays['high'], arrays['low'])
+
+
+def run_point(arrays, params, settings, macd_cache=None, range_cache=None, index=None, rows=None):
+    """
+    Run the engine for one parameter set and return its raw trade arrays.
+
+    Indicators and session ranges are computed over the full series (and
+    cached), so restricting the run to rows=(lo, hi) keeps their warm-up
+    history. Trade indices in the output are absolute row numbers.
+    """
+    macd_key = (params['macd_fast'], params['macd_slow'], params['macd_signal'])
+    if macd_cache is not None and macd_key in macd_cache:
+        buy, sell = macd_cache[macd_key]
+    else:
+        buy, sell = macd_signals(arrays['close'], *macd_key)
+        if macd_cache is not None:
+            macd_cache[macd_key] = (buy, sell)
+
+    start_min = to_minutes(params['range_start'])
+    end_min = to_minutes(params['range_end'])
+    range_key = (start_min, end_min)
+    if range_cache is not None and range_key in range_cache:
+        range_high, range_low = range_cache[range_key]
+    else:
+        index = index if index is not None else range_index(arrays)
+        range_high, range_low = index.per_bar(arrays['day'], start_min, end_min)
+        if range_cache is not None:
+            range_cache[range_key] = (range_high, range_low)
+
+    lo, hi = rows if rows is not None else (0, len(arrays['close']))
+    pip_value = settings['pip_value']
+    out = run_breakout_engine(
+        close=arrays['close'][lo:hi], high=arrays['high'][lo:hi], low=arrays['low'][lo:hi],
+        mod=arrays['mod'][lo:hi], day=arrays['day'][lo:hi],
+        range_high=range_high[lo:hi], range_low=range_low[lo:hi],
+        buy_signal=buy[lo:hi], sell_signal=sell[lo:hi],
+        window_start=end_min, window_end=settings['window_end'],
+        sl_dist=params['sl_pips'] * pip_value,
+        tp_dist=params['tp_pips'] * pip_value,
+        close_at_end=rows is not None,
+    )
+    out['entry_idx'] += lo
+    out['exit_idx'] += lo
+    return out
+
+
+def evaluate_point(arrays, params, settings, macd_cache=None, range_cache=None, index=None, rows=None):
+    """Run one parameter set over the bar arrays (or a row slice) and return its STAT_FIELDS row"""
+    out = run_point(arrays, params, settings, macd_cache, range_cache, index, rows)
+    return summarize_trades(out, settings['pip_value'])
+
+
+def _run_point(params):
+    """Worker entry point for one grid point; returns its STAT_FIELDS row"""
+    return evaluate_point(_worker['arrays'], params, _worker['settings'],
+                          _worker['macd'], _worker['ranges'], _worker['index'])
+
+
+def _run_slice(task):
+    """Worker entry point for one (key, params, rows) task on a row slice"""
+    key, params, rows = task
+    stats = evaluate_point(_worker['arrays'], params, _worker['settings'],
+                           _worker['macd'], _worker['ranges'], _worker['index'], rows)
+    return key, stats
+
+
+# --------------------------- DRIVER ---------------------------
+def complete_params(points, system):
+    """Fill parameters missing from each point with the system's current values"""
+    defaults = {name: getattr(system, name) for name in SWEEP_PARAMS}
+    completed = []
+    for point in points:
+        unknown = set(point) - set(SWEEP_PARAMS)
+        if unknown:
+            raise ValueError(f"Unknown sweep parameters: {sorted(unknown)}")
+        params = {**defaults, **point}
+        # Skip inverted session windows and degenerate MACD settings
+        if to_minutes(params['range_start']) > to_minutes(params['range_end']):
+            continue
+        if params['macd_fast'] >= params['macd_slow']:
+            continue
+        completed.append(params)
+    return completed
+
+
+def run_sweep(system, points, workers=None, sort_by='total_pips', chunksize=None):
+    """
+    Evaluate every parameter point on the system's prepared data across a process pool.
+
+    points is a list of {param: value} dicts (see build_grid / sample_grid); any
+    parameter left out takes the system's current value. Returns a DataFrame
+    ranked by sort_by (descending).
+    """
+    if system.df is None:
+        raise ValueError("System has no prepared data; run prepare_data_for_backtest() first")
+
+    points = complete_params(points, system)
+    if not points:
+        raise ValueError("No valid parameter points to evaluate")
+
+    workers = workers or os.cpu_count() or 1
+    settings = {
+        'pip_value': system.pip_value,
+        'window_end': minute_of_day(system.trade_window_end),
+    }
+    # Group points sharing MACD spans / session windows so worker caches hit
+    points.sort(key=lambda p: (p['macd_fast'], p['macd_slow'], p['macd_signal'],
+                               to_minutes(p['range_start']), to_minutes(p['range_end'])))
+    chunksize = chunksize or max(1, len(points) // (workers * 4))
+
+    print(f"🧪 PARAMETER SWEEP: {len(points)} points on {workers} workers")
+    start = time.perf_counter()
+
+    # One float64 row of statistics per point, filled in place
+    arrays = system_bar_arrays(system)
+    stats = np.empty((len(points), len(STAT_FIELDS)), dtype=np.float64)
+    if workers == 1:
+        macd_cache, range_cache, index = {}, {}, range_index(arrays)
+        for k, p in enumerate(points):
+            out = run_point(arrays, p, settings, macd_cache, range_cache, index)
+            summarize_trades(out, settings['pip_value'], row=stats[k])
+    else:
+        with SharedBarArrays(arrays) as shared:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(shared.spec, settings)) as pool:
+                for k, row in enumerate(pool.map(_run_point, points, chunksize=chunksize)):
+                    stats[k] = row
+
+    elapsed = time.perf_counter() - start
+    print(f"   Completed in {elapsed:.1f}s ({len(points) / max(elapsed, 1e-9):.1f} points/s)")
+
+    return sweep_frame(points, stats, sort_by)
+
+
+def sweep_frame(points, stats, sort_by='total_pips'):
+    """Ranked DataFrame from parameter points and their STAT_FIELDS matrix"""
+    order = np.argsort(-stats[:, STAT_FIELDS.index(sort_by)], kind='stable')
+    columns = {name: [points[k][name] for k in order] for name in SWEEP_PARAMS}
+    for j, name in enumerate(STAT_FIELDS):
+        column = stats[order, j]
+        columns[name] = column.astype(np.int64) if name in COUNT_FIELDS else column
+    results = pd.DataFrame(columns)
+    results.insert(0, 'rank', np.arange(1, len(results) + 1))
+    return results
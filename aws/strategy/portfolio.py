@@ -0,0 +1,215 @@
+"""
+Multi-symbol portfolio backtest for the Range Breakout + MACD strategy.
+
+Each symbol is downloaded (through the shared week cache), prepared and
+backtested with the array engine in its own worker process, using that
+symbol's pip size. The per-symbol trade streams are then merged into one
+time-ordered book: a trade is only taken if fewer than max_concurrent
+positions (and fewer than max_per_symbol on its symbol) are open at its
+entry time. Accepted trades form the portfolio equity curve, booked at exit
+time in risk units (1R = the stop loss).
+
+The workers download concurrently, so each gets 1/workers of the
+download_rate_limit and the host sees the configured rate overall. Workers
+share the store's saved OHLC pyramids and don't prune them; the parent prunes
+once after the basket, keeping at least one pyramid per symbol. A symbol
+whose worker raises is reported as failed; the rest of the basket still runs.
+"""
+
+import contextlib
+import heapq
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from instruments import pip_size
+
+# CompleteFXSystem attributes a portfolio run may override for every symbol
+SYSTEM_SETTINGS = ('range_start', 'range_end', 'trade_window_end', 'sl_pips', 'tp_pips',
+                   'macd_fast', 'macd_slow', 'macd_signal', 'use_cache', 'cache_dir',
+                   'use_store', 'store_dir', 'download_workers', 'download_rate_limit', 'base_url',
+                   'compact', 'price_dtype', 'pyramid_keep')
+
+
+def backtest_symbol(symbol, periodicity, start_date, end_date, settings, rate_share=1):
+    """
+    Worker: download, prepare and backtest one symbol; returns (symbol, trades_df, log).
+    The download rate limit is divided by rate_share (the number of concurrent workers).
+    """
+    from fxcm import CompleteFXSystem
+
+    fx = CompleteFXSystem()
+    fx.pip_value = pip_size(symbol)
+    for name, value in settings.items():
+        setattr(fx, name, value)
+    if fx.download_rate_limit and rate_share > 1:
+        fx.download_rate_limit = fx.download_rate_limit / rate_share
+    fx.pyramid_keep = None  # Pruning here would delete other workers' pyramids; run_portfolio prunes once
+
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        data_file = fx.download_and_clean_data(symbol, periodicity, start_date, end_date)
+        if not data_file or not fx.prepare_data_for_backtest():
+            return symbol, None, log.getvalue()
+        results = fx.run_backtest(engine='numpy')
+
+    if not results:
+        return symbol, pd.DataFrame(), log.getvalue()
+
+    trades = results['trades_df'].copy()
+    trades.insert(0, 'symbol', symbol)
+    trades['pip_size'] = fx.pip_value
+    trades['r_multiple'] = trades['pips'] / fx.sl_pips
+    return symbol, trades, log.getvalue()
+
+
+def prune_shared_pyramids(settings, n_symbols):
+    """Prune the store's saved pyramids once for the basket, keeping at least one per symbol"""
+    from fxcm import CompleteFXSystem
+    from ohlc_pyramid import PYRAMID_DIR, prune_pyramids
+
+    fx = CompleteFXSystem()
+    for name, value in settings.items():
+        setattr(fx, name, value)
+    if fx.use_store and fx.pyramid_keep is not None:
+        prune_pyramids(os.path.join(fx.store_dir, PYRAMID_DIR), keep=max(fx.pyramid_keep, n_symbols))
+
+
+def apply_position_limits(trades, max_concurrent=None, max_per_symbol=1):
+    """
+    Mark which trades are taken under the concurrency limits.
+
+    Trades are visited in entry order; positions whose exit_time is at or
+    before a new entry are released first.
+    """
+    trades = trades.sort_values(['entry_time', 'symbol'], kind='mergesort').reset_index(drop=True)
+    accepted = np.zeros(len(trades), dtype=bool)
+    open_positions = []  # heap of (exit_time, symbol)
+    per_symbol = {}
+    peak_open = 0
+
+    entries = trades['entry_time'].to_numpy()
+    exits = trades['exit_time'].to_numpy()
+    symbols = trades['symbol'].to_numpy()
+    for i in range(len(trades)):
+        while open_positions and open_positions[0][0] <= entries[i]:
+            _, released = heapq.heappop(open_positions)
+            per_symbol[released] -= 1
+
+        if max_concurrent is not None and len(open_positions) >= max_concurrent:
+            continue
+        if max_per_symbol is not None and per_symbol.get(symbols[i], 0) >= max_per_symbol:
+            continue
+
+        accepted[i] = True
+        heapq.heappush(open_positions, (exits[i], symbols[i]))
+        per_symbol[symbols[i]] = per_symbol.get(symbols[i], 0) + 1
+        peak_open = max(peak_open, len(open_positions))
+
+    trades['accepted'] = accepted
+    return trades, peak_open
+
+
+def equity_curve(trades, risk_per_trade=1.0):
+    """Portfolio equity booked at exit time, in R and in % of starting equity"""
+    taken = trades[trades['accepted']].sort_values(['exit_time', 'symbol'], kind='mergesort')
+    curve = pd.DataFrame({
+        'exit_time': taken['exit_time'].to_numpy(),
+        'symbol': taken['symbol'].to_numpy(),
+        'r_multiple': taken['r_multiple'].to_numpy(),
+    })
+    curve['equity_r'] = curve['r_multiple'].cumsum()
+    curve['equity_pct'] = curve['equity_r'] * risk_per_trade
+    peak = np.maximum.accumulate(np.maximum(curve['equity_pct'].to_numpy(), 0.0))
+    curve['drawdown_pct'] = curve['equity_pct'].to_numpy() - peak
+    return curve
+
+
+def summarize_portfolio(trades, curve, peak_open):
+    """Per-symbol and total statistics for accepted trades"""
+    taken = trades[trades['accepted']]
+    rows = []
+    for symbol, group in taken.groupby('symbol'):
+        rows.append({
+            'symbol': symbol,
+            'trades': len(group),
+            'skipped': int(((trades['symbol'] == symbol) & ~trades['accepted']).sum()),
+            'win_rate': (group['pips'] > 0).mean() * 100,
+            'total_pips': group['pips'].sum(),
+            'total_r': group['r_multiple'].sum(),
+        })
+    per_symbol = pd.DataFrame(rows)
+    total = {
+        'trades': len(taken),
+        'skipped': int((~trades['accepted']).sum()),
+        'win_rate': (taken['pips'] > 0).mean() * 100 if len(taken) else 0.0,
+        'total_r': taken['r_multiple'].sum(),
+        'return_pct': curve['equity_pct'].iloc[-1] if len(curve) else 0.0,
+        'max_drawdown_pct': curve['drawdown_pct'].min() if len(curve) else 0.0,
+        'max_open_positions': peak_open,
+    }
+    return per_symbol, total
+
+
+def run_portfolio(symbols, periodicity='m1', start_date=None, end_date=None,
+                  max_concurrent=3, max_per_symbol=1, risk_per_trade=1.0,
+                  workers=None, settings=None):
+    """
+    Backtest a basket of symbols in parallel and merge them into one portfolio.
+
+    Returns a dict with 'trades' (every trade plus an 'accepted' flag),
+    'equity' (the accepted-trade equity curve), 'per_symbol', 'summary' and
+    'failed' (symbols whose worker raised).
+    """
+    settings = dict(settings or {})
+    unknown = set(settings) - set(SYSTEM_SETTINGS)
+    if unknown:
+        raise ValueError(f"Unknown portfolio settings: {sorted(unknown)}")
+
+    workers = workers or min(len(symbols), os.cpu_count() or 1)
+    print(f"🧺 PORTFOLIO BACKTEST: {', '.join(symbols)} ({periodicity}) on {workers} workers")
+    start = time.perf_counter()
+
+    frames = []
+    failed = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(backtest_symbol, symbol, periodicity, start_date, end_date, settings, workers)
+                   for symbol in symbols]
+        for symbol, future in zip(symbols, futures):
+            try:
+                _, trades, _ = future.result()
+            except Exception as e:
+                failed.append(symbol)
+                print(f"   ✗ {symbol}: failed ({type(e).__name__}: {e})")
+                continue
+            if trades is None:
+                print(f"   ⚠ {symbol}: no data")
+            else:
+                print(f"   ✓ {symbol}: {len(trades)} trades (pip {pip_size(symbol)})")
+                if len(trades):
+                    frames.append(trades)
+
+    prune_shared_pyramids(settings, len(symbols))
+
+    if not frames:
+        print("❌ No trades in any symbol!")
+        return None
+
+    trades, peak_open = apply_position_limits(pd.concat(frames, ignore_index=True),
+                                              max_concurrent, max_per_symbol)
+    curve = equity_curve(trades, risk_per_trade)
+    per_symbol, summary = summarize_portfolio(trades, curve, peak_open)
+
+    print(f"   Completed in {time.perf_counter() - start:.1f}s")
+    print(f"   Trades taken: {summary['trades']} (skipped {summary['skipped']} over position limits)")
+    print(f"   Return: {summary['return_pct']:+.1f}% at {risk_per_trade}% risk/trade, "
+          f"max drawdown {summary['max_drawdown_pct']:.1f}%")
+
+    if failed:
+        print(f"   ⚠ Failed symbols: {', '.join(failed)}")
+
+    return {'trades': trades, 'equity': curve, 'per_symbol': per_symbol, 'summary': summary, 'failed': failed}
@@ -0,0 +1,67 @@
+"""
+Lazy sequence dataset for trend_pred's LSTM.
+
+Instead of materializing every (SEQ_LEN, features) window, the features are
+kept once as a scaled float32 matrix and a sample is just the position of
+its last bar. SequenceDataset serves window k as a slice of that matrix (a
+strided view, no copy); the DataLoader copies only when it stacks a batch.
+Memory is one float32 feature matrix plus an int64 per sample, whatever
+SEQ_LEN is.
+
+The scaler is fit on the rows covered by the training windows only, so no
+statistics leak from the test period.
+"""
+
+import numpy as np
+import pandas as pd
+import torch
+from torch.utils.data import Dataset
+from sklearn.preprocessing import StandardScaler
+
+CHUNK_ROWS = 1_000_000  # Rows scaled per step (bounds the float64 intermediate)
+
+
+def sequence_ends(times, labels, seq_len, start_hour, end_hour):
+    """
+    Last-bar positions of the usable windows: a 5-minute mark between
+    start_hour and end_hour (inclusive) with a label other than -1. As in the
+    original loop, the final bar never ends a window.
+    """
+    labels = np.asarray(labels)
+    end = np.arange(seq_len - 1, len(labels) - 1)
+    stamps = pd.DatetimeIndex(np.asarray(times)[end])
+    keep = ((stamps.hour >= start_hour) & (stamps.hour <= end_hour)
+            & (stamps.minute % 5 == 0) & (labels[end] != -1))
+    return end[np.asarray(keep)]
+
+
+def scale_features(features, train_ends, seq_len, chunk_rows=CHUNK_ROWS):
+    """
+    Fit a StandardScaler on the rows the training windows cover and return
+    (scaler, float32 scaled copy of every row).
+    """
+    if not len(train_ends):
+        raise ValueError("No training sequences to fit the scaler on")
+    lo = train_ends[0] - seq_len + 1
+    hi = train_ends[-1] + 1
+    scaler = StandardScaler().fit(features[lo:hi])
+    scaled = np.empty(features.shape, dtype=np.float32)
+    for start in range(0, len(features), chunk_rows):
+        scaled[start:start + chunk_rows] = scaler.transform(features[start:start + chunk_rows])
+    return scaler, scaled
+
+
+class SequenceDataset(Dataset):
+    def __init__(self, features, labels, ends, seq_len):
+        """Windows of seq_len rows of features ending at each of ends, labeled by labels[end]"""
+        self.features = torch.as_tensor(features)  # Shares memory with a float32 ndarray
+        self.labels = torch.as_tensor(np.asarray(labels)[ends], dtype=torch.long)
+        self.ends = np.asarray(ends, dtype=np.int64)
+        self.seq_len = seq_len
+
+    def __len__(self):
+        return len(self.ends)
+
+    def __getitem__(self, k):
+        end = int(self.ends[k]) + 1
+        return self.features[end - self.seq_len:end], self.labels[k]
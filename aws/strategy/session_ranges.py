@@ -0,0 +1,107 @@
+"""
+Session-range index: per-day high/low for any intraday window in one pass.
+
+Bars are scattered once into a (days x 1440) minute grid of highs and lows.
+A window query is then a vectorized reduction over a column slice of the
+grid, and windows sharing a start minute reuse one running max/min along the
+day axis, so a sweep over range_start/range_end never rescans the bar data.
+"""
+
+import numpy as np
+
+MINUTES_PER_DAY = 1440
+
+
+class SessionRangeIndex:
+    def __init__(self, day, mod, high, low, n_days=None):
+        """
+        day: per-bar day code (0..n_days-1), mod: per-bar minute of day,
+        high/low: per-bar prices.
+        """
+        day = np.asarray(day, dtype=np.int64)
+        mod = np.asarray(mod, dtype=np.int64)
+        high = np.asarray(high)
+        low = np.asarray(low)
+        self.n_days = int(n_days if n_days is not None else (day.max() + 1 if len(day) else 0))
+
+        dtype = np.result_type(high.dtype, low.dtype, np.float32)
+        self.grid_high = np.full((self.n_days, MINUTES_PER_DAY), -np.inf, dtype=dtype)
+        self.grid_low = np.full((self.n_days, MINUTES_PER_DAY), np.inf, dtype=dtype)
+        self.grid_count = np.zeros((self.n_days, MINUTES_PER_DAY), dtype=np.int32)
+
+        keys = day * MINUTES_PER_DAY + mod
+        flat_high = self.grid_high.reshape(-1)
+        flat_low = self.grid_low.reshape(-1)
+        flat_count = self.grid_count.reshape(-1)
+        if len(keys) < 2 or (np.diff(keys) > 0).all():
+            # Sorted, one bar per minute (the m1 case): plain scatter
+            flat_high[keys] = high
+            flat_low[keys] = low
+            flat_count[keys] = 1
+        else:
+            np.maximum.at(flat_high, keys, high)
+            np.minimum.at(flat_low, keys, low)
+            np.add.at(flat_count, keys, 1)
+
+        # Prefix bar counts per day: "any bar in window" without a rescan
+        self.count_prefix = np.zeros((self.n_days, MINUTES_PER_DAY + 1), dtype=np.int32)
+        np.cumsum(self.grid_count, axis=1, out=self.count_prefix[:, 1:])
+        self._cache = {}
+
+    @classmethod
+    def from_frame(cls, df, day_codes):
+        """Build from a prepared CompleteFXSystem frame and its factorized day codes"""
+        mod = df['Hour'].to_numpy() * 60 + df['Minute'].to_numpy()
+        return cls(day_codes, mod, df['High'].to_numpy(), df['Low'].to_numpy())
+
+    def _check(self, start_min, end_min):
+        if not (0 <= start_min <= end_min < MINUTES_PER_DAY):
+            raise ValueError(f"Invalid session window: {start_min}-{end_min} minutes")
+
+    def bar_counts(self, start_min, end_min):
+        """Number of bars per day inside the inclusive window"""
+        self._check(start_min, end_min)
+        return self.count_prefix[:, end_min + 1] - self.count_prefix[:, start_min]
+
+    def query(self, start_min, end_min):
+        """
+        Per-day (high, low) over the inclusive [start_min, end_min] window.
+
+        Days without a bar in the window get NaN.
+        """
+        key = (start_min, end_min)
+        if key not in self._cache:
+            self._cache.update(self.query_many([key]))
+        return self._cache[key]
+
+    def query_many(self, windows):
+        """{(start_min, end_min): (high, low)} for several windows, sharing work per start minute"""
+        by_start = {}
+        for start_min, end_min in windows:
+            self._check(start_min, end_min)
+            by_start.setdefault(start_min, set()).add(end_min)
+
+        results = {}
+        for start_min, ends in by_start.items():
+            last = max(ends)
+            if len(ends) == 1:
+                span_high = self.grid_high[:, start_min:last + 1].max(axis=1)
+                span_low = self.grid_low[:, start_min:last + 1].min(axis=1)
+                running = {last: (span_high, span_low)}
+            else:
+                # Running max/min from the shared start answers every end minute at once
+                run_high = np.maximum.accumulate(self.grid_high[:, start_min:last + 1], axis=1)
+                run_low = np.minimum.accumulate(self.grid_low[:, start_min:last + 1], axis=1)
+                running = {end: (run_high[:, end - start_min], run_low[:, end - start_min]) for end in ends}
+
+            for end_min, (day_high, day_low) in running.items():
+                has_bar = self.bar_counts(start_min, end_min) > 0
+                day_high = np.where(has_bar, day_high, np.nan)
+                day_low = np.where(has_bar, day_low, np.nan)
+                results[(start_min, end_min)] = (day_high, day_low)
+        return results
+
+    def per_bar(self, day, start_min, end_min):
+        """Broadcast a window's per-day high/low onto bars via their day codes"""
+        day_high, day_low = self.query(start_min, end_min)
+        return day_high[day], day_low[day]
@@ -0,0 +1,102 @@
+"""
+Deterministic synthetic m1 bid/ask candles for benchmarks and offline runs.
+
+Prices follow a seeded log random walk whose volatility follows the FX
+sessions (quiet Asia, busy London and the London/New York overlap). Spreads
+widen around the daily rollover, the market is closed from Friday 22:00 to
+Sunday 22:00 UTC and reopens with a weekend gap, and a small share of minutes
+is missing (single quiet minutes plus the occasional feed outage). The price
+keeps moving through missing minutes, so a gap shows up as a jump.
+
+The same seed and date range always give the same candles.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Volatility multiplier per UTC hour
+SESSION_VOLATILITY = np.array([
+    0.6, 0.6, 0.6, 0.7, 0.7, 0.7, 0.8,   # 00-06 Asia
+    1.3, 1.4, 1.3, 1.2, 1.1,             # 07-11 London
+    1.6, 1.7, 1.6, 1.5,                  # 12-15 London / New York overlap
+    1.1, 1.0, 0.9, 0.8, 0.7,             # 16-20 New York
+    0.4, 0.4, 0.5,                       # 21-23 rollover
+])
+ROLLOVER_HOURS = (21, 22, 23)  # Spreads widen while liquidity is thin
+WEEK_CLOSE_HOUR = 22  # Friday close / Sunday open, UTC
+
+
+def market_open(times):
+    """True for minutes inside the FX trading week (Sunday 22:00 to Friday 22:00 UTC)"""
+    times = pd.DatetimeIndex(times)
+    weekday = times.dayofweek.to_numpy()
+    hour = times.hour.to_numpy()
+    return ~((weekday == 5) |
+             ((weekday == 4) & (hour >= WEEK_CLOSE_HOUR)) |
+             ((weekday == 6) & (hour < WEEK_CLOSE_HOUR)))
+
+
+def synthetic_m1(start='2024-01-01', months=1, seed=0, base_price=1.08, pip=0.0001,
+                 vol_pips=0.9, spread_pips=0.8, missing_rate=0.002, outages_per_month=1.0,
+                 weekend_gap_pips=8.0):
+    """
+    m1 bid/ask candles from start for `months` calendar months, as a frame
+    with a datetime64 DateTime column and Bid/Ask Open/High/Low/Close columns
+    (the layout of a cleaned FXCM download). vol_pips is the typical one-minute
+    move in a volatility-1.0 hour.
+    """
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp(start)
+    times = pd.date_range(start, start + pd.DateOffset(months=months), freq='1min', inclusive='left')
+    times = times[market_open(times)]
+    n = len(times)
+    hour = times.hour.to_numpy()
+    decimals = int(round(-np.log10(pip))) + 1
+
+    # Log random walk with session volatility and a jump at every weekend reopen
+    sigma = vol_pips * pip / base_price * SESSION_VOLATILITY[hour]
+    steps = rng.standard_normal(n) * sigma
+    minutes = times.asi8 // 60_000_000_000
+    reopen = np.flatnonzero(np.diff(minutes) > 24 * 60) + 1
+    steps[reopen] += rng.standard_normal(len(reopen)) * weekend_gap_pips * pip / base_price
+    close = base_price * np.exp(np.cumsum(steps))
+    open_ = np.empty(n)
+    open_[0] = base_price
+    open_[1:] = close[:-1]
+    wick = np.abs(rng.standard_normal((2, n))) * 0.5 * sigma * base_price
+    high = np.maximum(open_, close) + wick[0]
+    low = np.minimum(open_, close) - wick[1]
+
+    spread = np.full(n, spread_pips * pip)
+    spread[np.isin(hour, ROLLOVER_HOURS)] *= 3
+    spread = np.round(spread, decimals)
+
+    # Missing candles: quiet single minutes (more likely in thin hours) and feed outages
+    keep = rng.random(n) >= missing_rate / SESSION_VOLATILITY[hour]
+    for _ in range(rng.poisson(outages_per_month * months)):
+        first = rng.integers(0, n)
+        keep[first:first + rng.integers(5, 90)] = False
+    keep[0] = True
+
+    frame = pd.DataFrame({'DateTime': times[keep]})
+    for name, values in (('Open', open_), ('High', high), ('Low', low), ('Close', close)):
+        bid = np.round(values[keep] - spread[keep] / 2, decimals)
+        frame['Bid' + name] = bid
+    frame['BidHigh'] = frame[['BidOpen', 'BidHigh', 'BidClose']].max(axis=1)
+    frame['BidLow'] = frame[['BidOpen', 'BidLow', 'BidClose']].min(axis=1)
+    for name in ('Open', 'High', 'Low', 'Close'):
+        frame['Ask' + name] = np.round(frame['Bid' + name].to_numpy() + spread[keep], decimals)
+    return frame
+
+
+def write_ohlc_csv(frame, path, side='Bid'):
+    """Save candles in macd_backtest's layout (Date YYYY/MM/DD, Time HH:MM:SS, Open/High/Low/Close)"""
+    times = pd.DatetimeIndex(frame['DateTime'])
+    out = pd.DataFrame({
+        'Date': times.strftime('%Y/%m/%d'),
+        'Time': times.strftime('%H:%M:%S'),
+    })
+    for name in ('Open', 'High', 'Low', 'Close'):
+        out[name] = frame[side + name].to_numpy()
+    out.to_csv(path, index=False)
+    return path
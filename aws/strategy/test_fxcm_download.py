@@ -0,0 +1,123 @@
+"""
+Offline tests for WeekDownloader against the stub FXCM server.
+
+    python -m pytest -q test_fxcm_download.py
+"""
+
+import gzip
+import threading
+import time
+
+import pytest
+
+from fxcm_download import RateLimiter, WeekDownloader
+from fxcm_stub_server import StubCandleServer
+
+WEEK_CSV = "DateTime,BidOpen,BidHigh,BidLow,BidClose\n01/06/2025 00:00:00.000,1.1,1.2,1.0,1.15\n"
+MANY_WEEKS = [(2024, week) for week in range(1, 13)]
+
+
+@pytest.fixture
+def server():
+    with StubCandleServer() as stub:
+        for week in (1, 2, 3):
+            stub.add_week('EURUSD', 'm1', 2025, week, WEEK_CSV)
+        for year, week in MANY_WEEKS:
+            stub.add_week('EURUSD', 'm1', year, week, WEEK_CSV)
+        yield stub
+
+
+def downloader(server, **kwargs):
+    settings = dict(max_workers=1, rate_limit=0, max_retries=3, backoff=0, max_backoff=0, timeout=5)
+    settings.update(kwargs)
+    return WeekDownloader(server.base_url, **settings)
+
+
+def test_missing_week_is_none(server):
+    dl = downloader(server)
+    assert dl.fetch_week('EURUSD', 'm1', 2025, 9) is None
+    assert dl.stats['not_found'] == 1
+    assert dl.stats['retries'] == 0
+
+
+@pytest.mark.parametrize('mode', [503, 'drop'])
+def test_transient_failures_are_retried(server, mode):
+    server.fail('m1/EURUSD/2025/1.csv.gz', 2, mode)
+    dl = downloader(server)
+    data = dl.fetch_week('EURUSD', 'm1', 2025, 1)
+    assert gzip.decompress(data).decode('utf-8') == WEEK_CSV
+    assert dl.stats['retries'] == 2
+    assert dl.stats['failed'] == 0
+
+
+def test_gives_up_after_max_retries(server):
+    server.fail('m1/EURUSD/2025/1.csv.gz', 10, 503)
+    dl = downloader(server, max_retries=2)
+    assert dl.fetch_week('EURUSD', 'm1', 2025, 1) is None
+    assert dl.stats['requests'] == 3
+    assert dl.stats['failed'] == 1
+
+
+def test_truncated_payload_is_retried_then_dropped(server):
+    payload = gzip.compress(WEEK_CSV.encode('utf-8'))
+    server.add_file('m1/EURUSD/2025/4.csv.gz', payload[:len(payload) // 2])
+    dl = downloader(server, max_retries=2)
+    assert dl.fetch_week('EURUSD', 'm1', 2025, 4) is None
+    assert dl.stats['requests'] == 3
+    assert dl.stats['failed'] == 1
+
+
+def test_keep_alive_reuses_connection(server):
+    dl = downloader(server)
+    results = dl.fetch_weeks('EURUSD', 'm1', [(2025, 1), (2025, 2), (2025, 3)])
+    assert all(data is not None for data in results.values())
+    assert dl.stats['connections'] == 1
+    assert server.counts['connections'] == 1
+    assert server.counts['requests'] == 3
+
+
+def test_worker_pool_fetches_every_week(server):
+    server.latency = 0.05
+    dl = downloader(server, max_workers=4)
+    start = time.perf_counter()
+    results = dl.fetch_weeks('EURUSD', 'm1', MANY_WEEKS)
+    elapsed = time.perf_counter() - start
+    assert list(results) == MANY_WEEKS
+    assert all(gzip.decompress(data).decode('utf-8') == WEEK_CSV for data in results.values())
+    assert server.counts['requests'] == len(MANY_WEEKS)
+    # One keep-alive connection per worker thread, reused for its later weeks
+    assert 1 < dl.stats['connections'] <= 4
+    assert server.counts['connections'] == dl.stats['connections']
+    assert elapsed < len(MANY_WEEKS) * server.latency  # Requests overlapped (one at a time takes longer)
+
+
+def test_rate_limit_bounds_requests_per_second(server):
+    rate = 20.0
+    dl = downloader(server, max_workers=4, rate_limit=rate)
+    start = time.perf_counter()
+    results = dl.fetch_weeks('EURUSD', 'm1', MANY_WEEKS)
+    elapsed = time.perf_counter() - start
+    assert all(data is not None for data in results.values())
+    # n requests spaced 1/rate apart take at least (n - 1)/rate, however many workers ask
+    assert elapsed >= (len(MANY_WEEKS) - 1) / rate * 0.95
+
+
+def test_rate_limiter_spaces_concurrent_callers():
+    limiter = RateLimiter(50.0)
+    stamps = []
+    lock = threading.Lock()
+
+    def call():
+        limiter.wait('host')
+        with lock:
+            stamps.append(time.monotonic())
+
+    threads = [threading.Thread(target=call) for _ in range(10)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Ten callers get slots 1/rate apart, so the last returns at least 9 intervals in
+    assert len(stamps) == 10
+    assert max(stamps) - start >= 9 * limiter.interval
@@ -0,0 +1,276 @@
+"""
+Columnar trade ledger and single-pass trade statistics.
+
+TradeLedger keeps one preallocated NumPy array per trade field (growing by
+doubling) instead of a list of per-trade dicts; derived columns such as
+result, duration and range size are only materialised by to_frame().
+
+trade_stats() computes every headline statistic, the drawdown and the
+per-hour breakdown in one loop over the trades (JIT-compiled when numba is
+installed) and writes them into a flat float64 row laid out as STAT_FIELDS,
+so a parameter sweep can keep all of its results in one 2-D array.
+"""
+
+import numpy as np
+import pandas as pd
+
+from bar_engine import LONG, EXIT_TP, EXIT_SL, EXIT_EOD, EXIT_REASONS
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    njit = None
+    NUMBA_AVAILABLE = False
+
+REASON_CODES = {name: code for code, name in EXIT_REASONS.items()}
+
+STAT_FIELDS = (
+    'total_trades', 'winning_trades', 'losing_trades', 'win_rate',
+    'total_pips', 'avg_pips', 'avg_win_pips', 'avg_loss_pips', 'profit_factor',
+    'expectancy_pips', 'payoff_ratio', 'max_drawdown_pips',
+    'long_trades', 'short_trades', 'tp_exits', 'sl_exits', 'eod_exits',
+)
+COUNT_FIELDS = ('total_trades', 'winning_trades', 'losing_trades', 'long_trades',
+                'short_trades', 'tp_exits', 'sl_exits', 'eod_exits')
+STAT_INDEX = {name: k for k, name in enumerate(STAT_FIELDS)}
+
+
+def _stats_kernel(pips, side, reason, hour, out, hourly):
+    """
+    One pass over the trades. Fills out (laid out as STAT_FIELDS) and
+    hourly (24 x 3: trades, wins, pips per entry hour, skipped if hour is empty).
+    """
+    n = len(pips)
+    wins = 0
+    longs = 0
+    tp = 0
+    sl = 0
+    eod = 0
+    total = 0.0
+    win_sum = 0.0
+    loss_sum = 0.0
+    equity = 0.0
+    peak = 0.0
+    drawdown = 0.0
+    per_hour = len(hour) > 0
+
+    for i in range(n):
+        p = pips[i]
+        total += p
+        if p > 0:
+            wins += 1
+            win_sum += p
+        else:
+            loss_sum += p
+        if side[i] == LONG:
+            longs += 1
+        r = reason[i]
+        if r == EXIT_TP:
+            tp += 1
+        elif r == EXIT_SL:
+            sl += 1
+        elif r == EXIT_EOD:
+            eod += 1
+
+        # Running equity from zero; drawdown is measured from the highest point so far
+        equity += p
+        if equity > peak:
+            peak = equity
+        if peak - equity > drawdown:
+            drawdown = peak - equity
+
+        if per_hour:
+            h = hour[i]
+            hourly[h, 0] += 1
+            if p > 0:
+                hourly[h, 1] += 1
+            hourly[h, 2] += p
+
+    losses = n - wins
+    avg_win = win_sum / wins if wins else 0.0
+    avg_loss = loss_sum / losses if losses else 0.0
+    out[0] = n
+    out[1] = wins
+    out[2] = losses
+    out[3] = wins / n * 100 if n else 0.0
+    out[4] = total
+    out[5] = total / n if n else 0.0
+    out[6] = avg_win
+    out[7] = avg_loss
+    out[8] = win_sum / -loss_sum if loss_sum < 0 else np.inf
+    out[9] = (wins * avg_win + losses * avg_loss) / n if n else 0.0
+    out[10] = avg_win / -avg_loss if avg_loss < 0 else np.inf
+    out[11] = drawdown
+    out[12] = longs
+    out[13] = n - longs
+    out[14] = tp
+    out[15] = sl
+    out[16] = eod
+
+
+if NUMBA_AVAILABLE:
+    _compiled_stats = njit(cache=True, nogil=True)(_stats_kernel)
+else:
+    _compiled_stats = None
+
+
+def trade_stats(pips, side, reason, hour=None, out=None):
+    """
+    Statistics row (STAT_FIELDS order) for one set of trades, and the 24 x 3
+    per-hour table if entry hours are given. out may be a preallocated row,
+    e.g. one row of a sweep's result matrix.
+    """
+    pips = np.ascontiguousarray(pips, dtype=np.float64)
+    side = np.ascontiguousarray(side, dtype=np.int8)
+    reason = np.ascontiguousarray(reason, dtype=np.int8)
+    hour = np.zeros(0, dtype=np.int64) if hour is None else np.ascontiguousarray(hour, dtype=np.int64)
+    if out is None:
+        out = np.empty(len(STAT_FIELDS), dtype=np.float64)
+    hourly = np.zeros((24, 3), dtype=np.float64)
+    if _compiled_stats is not None:
+        _compiled_stats(pips, side, reason, hour, out, hourly)
+    else:
+        _stats_kernel(pips.tolist(), side.tolist(), reason.tolist(), hour.tolist(), out, hourly)
+    return out, hourly
+
+
+def stats_dict(row):
+    """STAT_FIELDS row -> {name: value}, with counts as ints"""
+    return {name: int(row[k]) if name in COUNT_FIELDS else float(row[k])
+            for k, name in enumerate(STAT_FIELDS)}
+
+
+def hourly_frame(hourly):
+    """Per-entry-hour breakdown (hours with trades only)"""
+    hours = np.flatnonzero(hourly[:, 0])
+    trades = hourly[hours, 0]
+    return pd.DataFrame({
+        'entry_hour': hours,
+        'trades': trades.astype(np.int64),
+        'win_rate': hourly[hours, 1] / trades * 100,
+        'total_pips': hourly[hours, 2],
+        'avg_pips': hourly[hours, 2] / trades,
+    })
+
+
+def engine_pips(out, pip_value):
+    """Pips per trade from run_breakout_engine output"""
+    return np.where(out['side'] == LONG,
+                    out['exit_price'] - out['entry_price'],
+                    out['entry_price'] - out['exit_price']) / pip_value
+
+
+class TradeLedger:
+    FIELDS = (
+        ('entry_time', np.int64), ('exit_time', np.int64), ('side', np.int8),
+        ('entry_price', np.float64), ('exit_price', np.float64), ('pips', np.float64),
+        ('reason', np.int8), ('day_high', np.float64), ('day_low', np.float64),
+        ('trend_up', np.bool_), ('ambiguous', np.int8),
+    )
+
+    def __init__(self, pip_value, capacity=256):
+        self.pip_value = pip_value
+        self.n = 0
+        self.columns = {name: np.empty(capacity, dtype=dtype) for name, dtype in self.FIELDS}
+
+    def __len__(self):
+        return self.n
+
+    def _reserve(self, extra):
+        capacity = len(self.columns['pips'])
+        if self.n + extra <= capacity:
+            return
+        capacity = max(self.n + extra, capacity * 2)
+        for name, values in self.columns.items():
+            grown = np.empty(capacity, dtype=values.dtype)
+            grown[:self.n] = values[:self.n]
+            self.columns[name] = grown
+
+    def append(self, entry_time, exit_time, side, entry_price, exit_price, pips,
+               reason, day_high, day_low, trend_up):
+        """Record one trade (times as Timestamps, side LONG/SHORT, reason 'TP'/'SL'/'EOD' or code)"""
+        self._reserve(1)
+        i = self.n
+        c = self.columns
+        c['entry_time'][i] = pd.Timestamp(entry_time).value
+        c['exit_time'][i] = pd.Timestamp(exit_time).value
+        c['side'][i] = side
+        c['entry_price'][i] = entry_price
+        c['exit_price'][i] = exit_price
+        c['pips'][i] = pips
+        c['reason'][i] = REASON_CODES.get(reason, reason)
+        c['day_high'][i] = day_high
+        c['day_low'][i] = day_low
+        c['trend_up'][i] = trend_up
+        c['ambiguous'][i] = 0
+        self.n += 1
+
+    def extend_from_engine(self, out, times, range_high, range_low, trend_up):
+        """Record every trade of a run_breakout_engine result (bar-level arrays indexed by its exit/entry idx)"""
+        entry_idx, exit_idx = out['entry_idx'], out['exit_idx']
+        k = len(entry_idx)
+        self._reserve(k)
+        times = np.asarray(times, dtype='datetime64[ns]').view(np.int64)
+        sl = slice(self.n, self.n + k)
+        c = self.columns
+        c['entry_time'][sl] = times[entry_idx]
+        c['exit_time'][sl] = times[exit_idx]
+        c['side'][sl] = out['side']
+        c['entry_price'][sl] = out['entry_price']
+        c['exit_price'][sl] = out['exit_price']
+        c['pips'][sl] = engine_pips(out, self.pip_value)
+        c['reason'][sl] = out['reason']
+        c['day_high'][sl] = np.asarray(range_high)[exit_idx]
+        c['day_low'][sl] = np.asarray(range_low)[exit_idx]
+        c['trend_up'][sl] = np.asarray(trend_up)[exit_idx]
+        c['ambiguous'][sl] = 0
+        self.n += k
+
+    def set_exits(self, rows, reason, exit_price, ambiguous):
+        """Rewrite the exit of the given trades (intra-bar resolution); pips follow the new price"""
+        c = self.columns
+        c['reason'][rows] = reason
+        c['exit_price'][rows] = exit_price
+        c['ambiguous'][rows] = ambiguous
+        direction = np.where(c['side'][rows] == LONG, 1.0, -1.0)
+        c['pips'][rows] = direction * (c['exit_price'][rows] - c['entry_price'][rows]) / self.pip_value
+
+    def column(self, name):
+        return self.columns[name][:self.n]
+
+    def entry_hours(self):
+        return (self.column('entry_time') // 3_600_000_000_000) % 24
+
+    def stats(self):
+        """(STAT_FIELDS row, 24 x 3 per-hour table) for the recorded trades"""
+        return trade_stats(self.column('pips'), self.column('side'), self.column('reason'), self.entry_hours())
+
+    def to_frame(self):
+        """Trades as the classic per-trade DataFrame (one row per trade, derived columns included)"""
+        entry_ns = self.column('entry_time')
+        exit_ns = self.column('exit_time')
+        entry_time = pd.to_datetime(entry_ns)
+        pips = self.column('pips')
+        day_high = self.column('day_high')
+        day_low = self.column('day_low')
+        frame = pd.DataFrame({
+            'entry_time': entry_time,
+            'exit_time': pd.to_datetime(exit_ns),
+            'position': np.where(self.column('side') == LONG, 'long', 'short').astype(object),
+            'entry_price': self.column('entry_price'),
+            'exit_price': self.column('exit_price'),
+            'pips': pips,
+            'result': np.where(pips > 0, 'win', 'loss').astype(object),
+            'exit_reason': np.array([EXIT_REASONS[r] for r in self.column('reason').tolist()], dtype=object),
+            'day_high': day_high,
+            'day_low': day_low,
+            'range_size_pips': (day_high - day_low) / self.pip_value,
+            'entry_hour': entry_time.hour.to_numpy(dtype=np.int64),
+            'entry_minute': entry_time.minute.to_numpy(dtype=np.int64),
+            'trade_duration_minutes': ((exit_ns - entry_ns) / 1e9 / 60).astype(np.int64),
+            'trend_direction': np.where(self.column('trend_up'), 'UP', 'DOWN').astype(object),
+        })
+        if self.column('ambiguous').any():
+            frame['ambiguous_exit'] = self.column('ambiguous')
+        return frame
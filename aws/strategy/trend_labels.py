@@ -0,0 +1,88 @@
+"""
+Vectorized forward-looking labels for trend_pred.
+
+Both labelers compare every bar with a window of the bars after it, using
+sliding-window views of the future series instead of a Python loop, and
+work through the rows in chunks so memory stays bounded on multi-million
+row files. Labels follow trend_pred's encoding: 1 = up, 0 = down, -1 = no
+label (skipped when building sequences).
+
+- consistency_labels:    the next n closes all above (below) the close
+- triple_barrier_labels: take-profit above / stop-loss below the close or
+                         the time limit, whichever is reached first
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+CHUNK_ROWS = 500_000  # Bars labeled per step (window matrices are CHUNK_ROWS x window)
+
+
+def _future_windows(values, width, fill=np.nan):
+    """(n, width) view whose row i is values[i+1:i+1+width], padded with fill past the end"""
+    padded = np.concatenate([values[1:], np.full(width, fill)])
+    return sliding_window_view(padded, width)[:len(values)]
+
+
+def consistency_labels(closes, consistency_n, threshold=0.0, chunk_rows=CHUNK_ROWS):
+    """
+    1 where the next consistency_n closes are all > close + threshold, 0 where
+    they are all < close - threshold, else -1. The last consistency_n bars
+    (no full window) are -1; NaN closes never satisfy either side.
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    n = len(closes)
+    labels = np.full(n, -1, dtype=int)
+    labeled = max(n - consistency_n, 0)
+    if consistency_n == 0:
+        labels[:] = 1  # An empty future is trivially all above
+        return labels
+    if not labeled:
+        return labels
+
+    future = sliding_window_view(closes[1:], consistency_n)  # Row i = closes[i+1:i+1+n]
+    for lo in range(0, labeled, chunk_rows):
+        hi = min(lo + chunk_rows, labeled)
+        window = future[lo:hi]
+        # min/max propagate NaN, and NaN comparisons are False, as with np.all over the window
+        up = window.min(axis=1) > closes[lo:hi] + threshold
+        down = window.max(axis=1) < closes[lo:hi] - threshold
+        labels[lo:hi] = np.where(up, 1, np.where(down, 0, -1))
+    return labels
+
+
+def first_touch(hit, horizon):
+    """Offset of the first True per row of a boolean window matrix, horizon where there is none"""
+    return np.where(hit.any(axis=1), hit.argmax(axis=1), horizon)
+
+
+def triple_barrier_labels(close, high, low, tp, sl, horizon, time_sign=False, chunk_rows=CHUNK_ROWS):
+    """
+    For each bar, watch the next `horizon` bars: 1 if a high reaches close + tp
+    first, 0 if a low reaches close - sl first, -1 if neither does (or both on
+    the same bar). With time_sign, bars hitting neither barrier are labeled by
+    the sign of the close `horizon` bars later instead (-1 if flat or past the
+    end). tp and sl are price distances.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    n = len(close)
+    labels = np.full(n, -1, dtype=int)
+    if not n or horizon < 1:
+        return labels
+    highs = _future_windows(np.asarray(high, dtype=np.float64), horizon)
+    lows = _future_windows(np.asarray(low, dtype=np.float64), horizon)
+
+    untouched = np.zeros(n, dtype=bool)
+    for lo in range(0, n, chunk_rows):
+        hi = min(lo + chunk_rows, n)
+        entry = close[lo:hi, None]
+        up = first_touch(highs[lo:hi] >= entry + tp, horizon)
+        down = first_touch(lows[lo:hi] <= entry - sl, horizon)
+        labels[lo:hi] = np.where(up < down, 1, np.where(down < up, 0, -1))
+        untouched[lo:hi] = (up == horizon) & (down == horizon)
+
+    if time_sign:
+        rows = np.flatnonzero(untouched[:max(n - horizon, 0)])
+        change = close[rows + horizon] - close[rows]
+        labels[rows] = np.where(change > 0, 1, np.where(change < 0, 0, -1))
+    return labels
@@ -2,11 +2,13 @@ import pandas as pd
 import numpy as np
 import torch
 import torch.nn as nn
-from torch.utils.data import DataLoader, TensorDataset
-from sklearn.preprocessing import StandardScaler
+from torch.utils.data import DataLoader
 import ta
 import plotly.graph_objects as go
 
+from trend_labels import consistency_labels, triple_barrier_labels
+from sequence_dataset import SequenceDataset, scale_features, sequence_ends
+
 # ------------------------- TOGGLES / HYPERPARAMS -------------------------
 CSV_FILE = "Data1min_1.csv"        # your 1-min CSV (Date,Time,Open,High,Low,Close[,Volume])
 SEQ_LEN = 20                 # how many past bars the LSTM sees
@@ -16,6 +18,11 @@ BATCH_SIZE = 64
 EPOCHS = 30
 LR = 0.001
 THRESHOLD = 0.0              # optional additional price threshold (leave 0 if using strict consistency)
+LABEL_MODE = "consistency"   # "consistency" or "triple_barrier"
+BARRIER_TP = 0.0005          # triple barrier: up label when a high reaches close + BARRIER_TP first
+BARRIER_SL = 0.0005          # triple barrier: down label when a low reaches close - BARRIER_SL first
+BARRIER_HORIZON = 30         # triple barrier: bars before the time barrier
+BARRIER_TIME_SIGN = False    # triple barrier: label time-barrier exits by return sign (else skip them)
 START_HOUR, END_HOUR = 8, 17 # prediction window inclusive
 MAX_PLOT_BARS = 500         # how many 1-min bars to show on plot (reduce if laggy)
 
@@ -75,88 +82,58 @@ df = df.dropna().reset_index(drop=True)
 # Label as DOWN if next CONSISTENCY_N closes are all < current close
 # Else label = -1 (uncertain) and will be skipped.
 def make_consistency_labels(df, consistency_n=CONSISTENCY_N, threshold=THRESHOLD):
-    closes = df["close"].values
-    n = len(closes)
-    labels = np.full(n, -1, dtype=int)
-    for i in range(n - consistency_n):
-        future = closes[i+1:i+1+consistency_n]
-        # require all future > current + threshold --> UP
-        if np.all(future > closes[i] + threshold):
-            labels[i] = 1
-        # require all future < current - threshold --> DOWN
-        elif np.all(future < closes[i] - threshold):
-            labels[i] = 0
-        else:
-            labels[i] = -1
     # last consistency_n positions remain -1 (no label)
-    return labels
+    return consistency_labels(df["close"].values, consistency_n, threshold)
+
+# Triple barrier: UP/DOWN by whichever of close + tp / close - sl is touched first
+# within horizon bars; time-barrier exits are -1 (or labeled by return sign)
+def make_triple_barrier_labels(df, tp=BARRIER_TP, sl=BARRIER_SL, horizon=BARRIER_HORIZON,
+                               time_sign=BARRIER_TIME_SIGN):
+    return triple_barrier_labels(df["close"].values, df["high"].values, df["low"].values,
+                                 tp, sl, horizon, time_sign)
 
-df["label_consistency"] = make_consistency_labels(df, CONSISTENCY_N, THRESHOLD)
+if LABEL_MODE == "triple_barrier":
+    df["label"] = make_triple_barrier_labels(df)
+else:
+    df["label"] = make_consistency_labels(df, CONSISTENCY_N, THRESHOLD)
 
 # ------------------------- BUILD SEQUENCES (only keep seqs that end on 5-min & trading hours) -------------------------
 # Allowed end times: minute % 5 == 0 AND hour in [START_HOUR..END_HOUR]
-feature_cols = [c for c in df.columns if c not in ("time","label_consistency")]
+feature_cols = [c for c in df.columns if c not in ("time","label")]
 # ensure stable ordering
 feature_cols = [c for c in ["open","high","low","close","return","hl_range","rsi","macd","atr","bb_width"] if c in df.columns] \
                + [c for c in df.columns if c.startswith("ret_lag_")]
 feature_cols = [c for c in feature_cols if c in df.columns]  # final clean
 
-X_seqs = []
-y_seqs = []
-times_seqs = []
-closes_seqs = []
-
-vals = df[feature_cols].values
-labels = df["label_consistency"].values
+features = df[feature_cols].to_numpy(dtype=np.float64)
+labels = df["label"].values
 times = df["time"].values
 closes = df["close"].values
 
-for i in range(len(vals) - SEQ_LEN):
-    end_idx = i + SEQ_LEN - 1
-    t = pd.Timestamp(times[end_idx])
-    # only keep sequences whose end is a 5-min interval inside trading window
-    if not (START_HOUR <= t.hour <= END_HOUR and t.minute % 5 == 0):
-        continue
-    label = labels[end_idx]
-    if label == -1:
-        continue
-    seq = vals[i:i+SEQ_LEN]
-    X_seqs.append(seq)
-    y_seqs.append(label)
-    times_seqs.append(times[end_idx])
-    closes_seqs.append(closes[end_idx])
-
-if len(X_seqs) == 0:
-    raise ValueError("No sequences produced — check SEQ_LEN, CONSISTENCY_N, data density, and trading hours.")
+# Windows are identified by the index of their last bar; nothing is copied here
+ends = sequence_ends(times, labels, SEQ_LEN, START_HOUR, END_HOUR)
 
-X_seqs = np.array(X_seqs)        # shape (N, SEQ_LEN, feats)
-y_seqs = np.array(y_seqs)        # shape (N,)
-times_seqs = np.array(times_seqs)
-closes_seqs = np.array(closes_seqs)
-
-# ------------------------- SCALE FEATURES (fit on full sequences input data) -------------------------
-# We'll scale per-feature across all sequence rows and timesteps
-n_samples, seq_len, n_feats = X_seqs.shape
-X_reshaped = X_seqs.reshape(-1, n_feats)  # (N*SEQ_LEN, feats)
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X_reshaped).reshape(n_samples, seq_len, n_feats)
+if len(ends) == 0:
+    raise ValueError("No sequences produced — check SEQ_LEN, CONSISTENCY_N, data density, and trading hours.")
 
 # ------------------------- TRAIN/TEST SPLIT (time-ordered) -------------------------
-split_idx = int(len(X_scaled) * TRAIN_TEST_SPLIT)
-X_train = X_scaled[:split_idx]
-y_train = y_seqs[:split_idx]
-X_test = X_scaled[split_idx:]
-y_test = y_seqs[split_idx:]
-times_test = times_seqs[split_idx:]
-closes_test = closes_seqs[split_idx:]
+split_idx = int(len(ends) * TRAIN_TEST_SPLIT)
+train_ends = ends[:split_idx]
+test_ends = ends[split_idx:]
+y_test = labels[test_ends]
+times_test = times[test_ends]
+closes_test = closes[test_ends]
+
+# ------------------------- SCALE FEATURES (fit on the training range only) -------------------------
+# One float32 matrix of scaled features; the datasets serve windows as views into it
+n_feats = features.shape[1]
+scaler, scaled = scale_features(features, train_ends, SEQ_LEN)
 
-print(f"Sequences total: {len(X_scaled)}, train: {len(X_train)}, test: {len(X_test)}")
+print(f"Sequences total: {len(ends)}, train: {len(train_ends)}, test: {len(test_ends)}")
 
 # create torch datasets
-train_ds = TensorDataset(torch.tensor(X_train, dtype=torch.float32),
-                         torch.tensor(y_train, dtype=torch.long))
-test_ds = TensorDataset(torch.tensor(X_test, dtype=torch.float32),
-                        torch.tensor(y_test, dtype=torch.long))
+train_ds = SequenceDataset(scaled, labels, train_ends, SEQ_LEN)
+test_ds = SequenceDataset(scaled, labels, test_ends, SEQ_LEN)
 train_loader = DataLoader(train_ds, batch_size=BATCH_SIZE, shuffle=True)
 test_loader = DataLoader(test_ds, batch_size=BATCH_SIZE, shuffle=False)
 
@@ -0,0 +1,175 @@
+"""
+Walk-forward optimization for the Range Breakout + MACD strategy.
+
+The prepared data is cut into rolling folds of train_days trading days
+followed by test_days out-of-sample days. Every (fold, parameter point) pair
+is evaluated on its train slice across the parameter sweep's process pool;
+the best point of each fold is then run on that fold's test slice, and the
+out-of-sample trades of all folds are stitched into one trade list.
+
+MACD signals and session ranges are computed once over the whole series and
+shared by every fold, so each test slice sees the same indicator warm-up the
+live system would have had. Trades are closed at the end of each slice.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from bar_engine import minute_of_day, LONG, EXIT_REASONS
+import param_sweep
+from param_sweep import (SharedBarArrays, complete_params, run_point, summarize_trades,
+                         system_bar_arrays, range_index, to_minutes)
+from trade_ledger import STAT_INDEX, engine_pips, stats_dict, trade_stats
+
+
+def make_folds(day, train_days, test_days, step_days=None):
+    """
+    Rolling (train_rows, test_rows) row ranges over bars with monotonic day codes.
+
+    Folds advance by step_days (default test_days), so consecutive test slices
+    tile the data without overlap.
+    """
+    step_days = step_days or test_days
+    n_days = int(day[-1]) + 1 if len(day) else 0
+    folds = []
+    first = 0
+    while first + train_days + test_days <= n_days:
+        bounds = np.searchsorted(day, [first, first + train_days, first + train_days + test_days])
+        folds.append({
+            'fold': len(folds),
+            'train_rows': (int(bounds[0]), int(bounds[1])),
+            'test_rows': (int(bounds[1]), int(bounds[2])),
+        })
+        first += step_days
+    return folds
+
+
+def best_point(scores, objective='total_pips', min_trades=1):
+    """Index of the best row of a (points x STAT_FIELDS) matrix with at least min_trades trades, or None"""
+    eligible = scores[:, STAT_INDEX['total_trades']] >= min_trades
+    if not eligible.any():
+        return None
+    values = np.where(eligible, scores[:, STAT_INDEX[objective]], -np.inf)
+    return int(np.argmax(values))
+
+
+def run_walk_forward(system, points, train_days=60, test_days=20, step_days=None,
+                     objective='total_pips', min_trades=5, workers=None, chunksize=None):
+    """
+    Walk-forward optimize over the system's prepared data.
+
+    Returns a dict with 'folds' (one row per fold: chosen parameters plus
+    in-sample and out-of-sample statistics), 'trades' (stitched out-of-sample
+    trades) and 'summary' (statistics over all out-of-sample trades).
+    """
+    if system.df is None:
+        raise ValueError("System has no prepared data; run prepare_data_for_backtest() first")
+
+    points = complete_params(points, system)
+    if not points:
+        raise ValueError("No valid parameter points to evaluate")
+
+    arrays = system_bar_arrays(system)
+    folds = make_folds(arrays['day'], train_days, test_days, step_days)
+    if not folds:
+        raise ValueError(f"Not enough data for one {train_days}+{test_days} day fold")
+
+    workers = workers or os.cpu_count() or 1
+    settings = {
+        'pip_value': system.pip_value,
+        'window_end': minute_of_day(system.trade_window_end),
+    }
+    points.sort(key=lambda p: (p['macd_fast'], p['macd_slow'], p['macd_signal'],
+                               to_minutes(p['range_start']), to_minutes(p['range_end'])))
+    # Point-major order keeps each worker chunk on one MACD / session setting
+    tasks = [((f['fold'], k), p, f['train_rows']) for k, p in enumerate(points) for f in folds]
+    chunksize = chunksize or max(1, len(tasks) // (workers * 4))
+
+    print(f"🚶 WALK-FORWARD: {len(folds)} folds ({train_days} train / {test_days} test days), "
+          f"{len(points)} points on {workers} workers")
+    start = time.perf_counter()
+
+    # (folds x points x STAT_FIELDS) in-sample statistics
+    macd_cache, range_cache, index = {}, {}, range_index(arrays)
+    scores = np.empty((len(folds), len(points), len(STAT_INDEX)), dtype=np.float64)
+    if workers == 1:
+        for (fold, k), params, rows in tasks:
+            out = run_point(arrays, params, settings, macd_cache, range_cache, index, rows)
+            summarize_trades(out, settings['pip_value'], row=scores[fold, k])
+    else:
+        with SharedBarArrays(arrays) as shared:
+            with ProcessPoolExecutor(max_workers=workers, initializer=param_sweep._init_worker,
+                                     initargs=(shared.spec, settings)) as pool:
+                for (fold, k), row in pool.map(param_sweep._run_slice, tasks, chunksize=chunksize):
+                    scores[fold, k] = row
+
+    # Out-of-sample runs are one per fold; do them here with the shared caches
+    times = system.df['DateTime'].to_numpy()
+    fold_rows = []
+    trade_frames = []
+    oos_runs = []
+    for f in folds:
+        train_lo, train_hi = f['train_rows']
+        test_lo, test_hi = f['test_rows']
+        row = {
+            'fold': f['fold'],
+            'train_start': times[train_lo], 'train_end': times[train_hi - 1],
+            'test_start': times[test_lo], 'test_end': times[test_hi - 1],
+        }
+        k = best_point(scores[f['fold']], objective, min_trades)
+        if k is None:
+            print(f"   ⚠ Fold {f['fold']}: no point with {min_trades}+ train trades, skipped")
+            fold_rows.append(row)
+            continue
+
+        params = points[k]
+        out = run_point(arrays, params, settings, macd_cache, range_cache, index, f['test_rows'])
+        row.update(params)
+        row.update({f"is_{name}": value for name, value in stats_dict(scores[f['fold'], k]).items()})
+        oos_stats = stats_dict(summarize_trades(out, settings['pip_value']))
+        row.update({f"oos_{name}": value for name, value in oos_stats.items()})
+        fold_rows.append(row)
+        trade_frames.append(oos_trades(out, times, f['fold'], params, settings['pip_value']))
+        oos_runs.append(out)
+
+    elapsed = time.perf_counter() - start
+    print(f"   Completed in {elapsed:.1f}s ({len(tasks) / max(elapsed, 1e-9):.1f} fold-points/s)")
+
+    folds_df = pd.DataFrame(fold_rows)
+    trades = pd.concat(trade_frames, ignore_index=True) if trade_frames else pd.DataFrame()
+    summary = summarize_oos(oos_runs, settings['pip_value'])
+    print(f"   Out-of-sample: {summary['total_trades']} trades, {summary['total_pips']:.1f} pips, "
+          f"win rate {summary['win_rate']:.1f}%, max drawdown {summary['max_drawdown_pips']:.1f} pips")
+
+    return {'folds': folds_df, 'trades': trades, 'summary': summary}
+
+
+def oos_trades(out, times, fold, params, pip_value):
+    """Trade frame for one fold's out-of-sample engine output"""
+    side = out['side']
+    pips = engine_pips(out, pip_value)
+    trades = pd.DataFrame({
+        'fold': fold,
+        'entry_time': times[out['entry_idx']],
+        'exit_time': times[out['exit_idx']],
+        'position': np.where(side == LONG, 'long', 'short').astype(object),
+        'entry_price': out['entry_price'],
+        'exit_price': out['exit_price'],
+        'exit_reason': [EXIT_REASONS[r] for r in out['reason'].tolist()],
+        'pips': pips,
+    })
+    for name in ('sl_pips', 'tp_pips', 'macd_fast', 'macd_slow', 'macd_signal'):
+        trades[name] = params[name]
+    return trades
+
+
+def summarize_oos(runs, pip_value):
+    """Statistics over the stitched out-of-sample engine runs"""
+    pips = np.concatenate([engine_pips(out, pip_value) for out in runs]) if runs else np.zeros(0)
+    side = np.concatenate([out['side'] for out in runs]) if runs else np.zeros(0, dtype=np.int8)
+    reason = np.concatenate([out['reason'] for out in runs]) if runs else np.zeros(0, dtype=np.int8)
+    return stats_dict(trade_stats(pips, side, reason)[0])